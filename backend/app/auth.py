@@ -1,19 +1,97 @@
-from datetime import datetime, timedelta
+import asyncio
+import secrets
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from .cache import TTLCache
 from .config import settings
-from .database import get_db
+from .database import get_db, open_session, wrote_recently
+from .hashing import hashing_pool
 from .models import User
 from .schemas import TokenData
+from .tokens import revoked_sessions
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
+# Resolved principals keyed by (subject, token exp), so most authenticated
+# requests skip the users lookup entirely.
+user_cache = TTLCache(maxsize=settings.USER_CACHE_MAX_ENTRIES, ttl=settings.USER_CACHE_TTL_SECONDS)
+
+
+@dataclass(frozen=True)
+class UserPrincipal:
+    """Detached snapshot of the authenticated user's row."""
+    id: int
+    email: str
+    full_name: Optional[str]
+    location: Optional[str]
+    protein_goal: int
+    timezone: str
+    is_active: bool
+    created_at: datetime
+
+    @classmethod
+    def from_user(cls, user: User) -> "UserPrincipal":
+        return cls(
+            id=user.id,
+            email=user.email,
+            full_name=user.full_name,
+            location=user.location,
+            protein_goal=user.protein_goal,
+            timezone=user.timezone,
+            is_active=user.is_active,
+            created_at=user.created_at,
+        )
+
+
+def invalidate_cached_user(email: str) -> None:
+    """Drop cached principals for ``email``; call whenever the users row changes."""
+    user_cache.invalidate_group(email)
+
+
+# Each poll re-reads this much before the previous one, for changes that were
+# still committing (or stamped by a worker whose clock is behind)
+PROFILE_POLL_OVERLAP = timedelta(seconds=30)
+
+
+class ProfileChanges:
+    """Drops this worker's cached principals of users changed on other workers.
+
+    Every write to a users row moves ``updated_at``; like ``RevocationList``,
+    this polls for rows that moved, at most every USER_CACHE_POLL_SECONDS.
+    """
+
+    def __init__(self):
+        self._since: Optional[datetime] = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def sync(self, db: AsyncSession) -> None:
+        if time.monotonic() - self._checked_at < settings.USER_CACHE_POLL_SECONDS or self._lock.locked():
+            return
+        async with self._lock:
+            now = datetime.now(timezone.utc)
+            if self._since is not None:
+                # Rows inside the overlap are seen twice; dropping them again is harmless
+                result = await db.execute(select(User.email).where(User.updated_at >= self._since))
+                for email in result.scalars():
+                    invalidate_cached_user(email)
+            # Nothing is cached before the first poll, so it only sets the start
+            self._since = now - PROFILE_POLL_OVERLAP
+            self._checked_at = time.monotonic()
+
+
+profile_changes = ProfileChanges()
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
@@ -34,44 +112,102 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
-def get_user_by_email(db: Session, email: str) -> Optional[User]:
-    return db.query(User).filter(User.email == email).first()
+def decode_access_token(token: str) -> Optional[dict]:
+    """Claims of a valid, unexpired access token, or None."""
+    try:
+        return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return None
+
+
+async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
+    return await db.scalar(select(User).where(User.email == email))
 
 
-def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
-    user = get_user_by_email(db, email)
+async def authenticate_user(db: AsyncSession, email: str, password: str) -> Optional[User]:
+    user = await get_user_by_email(db, email)
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    if not await hashing_pool.run(verify_password, password, user.hashed_password):
         return None
     return user
 
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
+async def _authenticate(token: str, db: AsyncSession, use_cache: bool) -> UserPrincipal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-        token_data = TokenData(email=email)
-    except JWTError:
+    payload = decode_access_token(token)
+    if payload is None or payload.get("sub") is None:
         raise credentials_exception
+    await revoked_sessions.sync(db)
+    if payload.get("sid") in revoked_sessions:
+        raise credentials_exception
+    token_data = TokenData(email=payload["sub"])
+    
+    cache_key = (token_data.email, payload.get("exp"))
+    if use_cache:
+        await profile_changes.sync(db)
+        principal = user_cache.get(cache_key)
+        if principal is not None:
+            return principal
     
-    user = get_user_by_email(db, email=token_data.email)
+    user = await get_user_by_email(db, email=token_data.email)
     if user is None:
         raise credentials_exception
-    return user
+    principal = UserPrincipal.from_user(user)
+    user_cache.set(cache_key, principal, group=user.email, expires_at=payload.get("exp"))
+    return principal
+
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_db)
+) -> UserPrincipal:
+    return await _authenticate(token, db, use_cache=True)
+
+
+async def get_fresh_user(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_db)
+) -> UserPrincipal:
+    """``get_current_user`` read from the database, never the cache.
+
+    For writes that depend on the profile: log rollup days follow the
+    timezone, which may have just changed on another worker.
+    """
+    return await _authenticate(token, db, use_cache=False)
 
 
-async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
-    if not current_user.is_active:
+def _require_active(user: UserPrincipal) -> UserPrincipal:
+    if not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
-    return current_user
+    return user
+
+
+async def get_current_active_user(
+    current_user: UserPrincipal = Depends(get_current_user)
+) -> UserPrincipal:
+    return _require_active(current_user)
+
+
+async def get_fresh_active_user(
+    current_user: UserPrincipal = Depends(get_fresh_user)
+) -> UserPrincipal:
+    return _require_active(current_user)
+
+
+async def get_user_read_db(current_user: UserPrincipal = Depends(get_current_active_user)):
+    """Read session for the current user's data: the replica, or the primary
+    if they wrote within READ_YOUR_WRITES_SECONDS."""
+    async with open_session(read=not wrote_recently(current_user.id)) as db:
+        yield db
+
+
+async def require_admin_key(x_admin_key: Optional[str] = Header(None)) -> None:
+    if not settings.ADMIN_API_KEY:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if x_admin_key is None or not secrets.compare_digest(x_admin_key, settings.ADMIN_API_KEY):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid admin key")
@@ -0,0 +1,73 @@
+"""Small in-process caches."""
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Set
+
+
+class TTLCache:
+    """LRU cache whose entries also expire after a TTL.
+
+    Entries can be tagged with a ``group`` so that every key belonging to, for
+    example, one user can be dropped at once. Not thread-safe; use it from the
+    event loop only.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._groups: Dict[Hashable, Set[Hashable]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0 and self.ttl > 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        value, expires_at, _ = entry
+        if expires_at <= time.time():
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, group: Hashable = None, expires_at: float = None) -> None:
+        if not self.enabled:
+            return
+        deadline = time.time() + self.ttl
+        if expires_at is not None:
+            deadline = min(deadline, expires_at)
+        if key in self._data:
+            self._remove(key)
+        self._data[key] = (value, deadline, group)
+        if group is not None:
+            self._groups.setdefault(group, set()).add(key)
+        while len(self._data) > self.maxsize:
+            self._remove(next(iter(self._data)))
+
+    def invalidate_group(self, group: Hashable) -> None:
+        for key in self._groups.pop(group, ()):
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._groups.clear()
+
+    def _remove(self, key: Hashable) -> None:
+        _, _, group = self._data.pop(key)
+        if group is not None:
+            keys = self._groups.get(group)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._groups[group]
@@ -0,0 +1,190 @@
+"""Versioned in-process catalog snapshots.
+
+The food and store catalogs change only when they are seeded or imported, yet
+the endpoints reading them used to query the database on every request. Each
+worker now keeps immutable snapshots (the foods themselves, and a spatial
+index of store locations) and serves those reads from memory. Every write to a
+catalog bumps its row in ``catalog_versions`` in the same transaction; workers
+poll that row at most every ``CATALOG_POLL_SECONDS`` and rebuild when it moves,
+so a new catalog reaches all workers without a restart.
+"""
+import asyncio
+import time
+from bisect import bisect_right
+from typing import Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from .config import settings
+from .database import ON_CONFLICT_INSERTS, open_session
+from .geo import StoreIndex
+from .models import CatalogVersion, Food, Store
+from .search import FoodSearchIndex
+
+
+async def get_catalog_version(db: AsyncSession, name: str) -> int:
+    version = await db.scalar(select(CatalogVersion.version).where(CatalogVersion.name == name))
+    return version or 0
+
+
+def _version_bumps(dialect_name: str, name: str) -> list:
+    """Statements that increment ``name``'s counter, creating the row if needed.
+
+    One upsert where the dialect has ON CONFLICT, else UPDATE then INSERT
+    (the INSERT only runs if the UPDATE matched nothing).
+    """
+    table = CatalogVersion.__table__
+    insert = ON_CONFLICT_INSERTS.get(dialect_name)
+    if insert is not None:
+        stmt = insert(table).values(name=name, version=1)
+        return [stmt.on_conflict_do_update(index_elements=[table.c.name], set_={"version": table.c.version + 1})]
+    return [
+        update(table).where(table.c.name == name).values(version=table.c.version + 1),
+        table.insert().values(name=name, version=1),
+    ]
+
+
+async def bump_catalog_version(db: AsyncSession, name: str) -> None:
+    """Mark catalog ``name`` as changed. Does not commit, like the rollup helpers."""
+    for stmt in _version_bumps(db.bind.dialect.name, name):
+        if (await db.execute(stmt)).rowcount:
+            break
+
+
+def bump_catalog_version_sync(db: Session, name: str) -> None:
+    """``bump_catalog_version`` for sync sessions (command line tools, importer)."""
+    for stmt in _version_bumps(db.bind.dialect.name, name):
+        if db.execute(stmt).rowcount:
+            break
+
+
+class VersionedSnapshot:
+    """A worker's copy of one catalog, rebuilt when its version row moves.
+
+    ``build(db, version)`` loads the snapshot; the result must expose
+    ``.version``. While one request rebuilds, others keep getting the old
+    snapshot instead of queueing behind it.
+    """
+
+    def __init__(self, name: str, build: Callable[[AsyncSession, int], Awaitable]):
+        self.name = name
+        self._build = build
+        self.current = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _fresh(self) -> bool:
+        return self.current is not None and time.monotonic() - self._checked_at < settings.CATALOG_POLL_SECONDS
+
+    async def get(self, db: AsyncSession):
+        if self._fresh() or (self.current is not None and self._lock.locked()):
+            return self.current
+        async with self._lock:
+            if not self._fresh():
+                version = await get_catalog_version(db, self.name)
+                if self.current is None or self.current.version != version:
+                    self.current = await self._build(db, version)
+                self._checked_at = time.monotonic()
+        return self.current
+
+    def cached(self):
+        """The snapshot if its version was checked within the poll interval, else None."""
+        return self.current if self._fresh() else None
+
+    def expire(self) -> None:
+        """Re-check the version on the next request (call after committing a write)."""
+        self._checked_at = 0.0
+
+
+class CatalogFood(NamedTuple):
+    id: int
+    name: str
+    protein_per_100g: float
+    category: Optional[str]
+    is_vegan: bool
+    image_url: Optional[str]
+
+
+def _catalog_key(food: CatalogFood) -> Tuple[float, int]:
+    return (-food.protein_per_100g, -food.id)
+
+
+class FoodCatalog:
+    """Immutable snapshot of the foods table, highest protein first.
+
+    Holds the foods once, in catalog order, plus per-category views of the
+    same tuples, an id map and the name search index. Keyset cursors of
+    ``(protein_per_100g, id)`` become a bisect into the matching view.
+    """
+
+    def __init__(self, version: int, rows: Iterable[Tuple]):
+        self.version = version
+        self.foods = tuple(sorted((CatalogFood(*row) for row in rows), key=_catalog_key))
+        self.by_id: Dict[int, CatalogFood] = {food.id: food for food in self.foods}
+
+        by_category: Dict[str, List[CatalogFood]] = {}
+        for food in self.foods:
+            if food.category is not None:
+                by_category.setdefault(food.category, []).append(food)
+        self.categories = sorted(by_category)
+        self._views = {None: self.foods}
+        self._views.update((category, tuple(foods)) for category, foods in by_category.items())
+
+        self.search = FoodSearchIndex(food[:5] for food in self.foods)
+
+    def __len__(self) -> int:
+        return len(self.foods)
+
+    def page(
+        self,
+        limit: int,
+        after: Optional[Tuple[float, int]] = None,
+        category: Optional[str] = None,
+        vegan_only: bool = False,
+    ) -> List[CatalogFood]:
+        """Up to ``limit`` foods in catalog order, starting after the ``(protein, id)`` key."""
+        if limit <= 0:
+            return []
+        view = self._views.get(category, ())
+        start = 0
+        if after is not None:
+            protein, food_id = after
+            start = bisect_right(view, (-protein, -food_id), key=_catalog_key)
+        result = []
+        for i in range(start, len(view)):
+            food = view[i]
+            if vegan_only and not food.is_vegan:
+                continue
+            result.append(food)
+            if len(result) == limit:
+                break
+        return result
+
+
+async def _load_food_catalog(db: AsyncSession, version: int) -> FoodCatalog:
+    rows = (await db.execute(select(
+        Food.id, Food.name, Food.protein_per_100g, Food.category, Food.is_vegan, Food.image_url
+    ))).all()
+    # Sorting and indexing are CPU-bound; keep them off the event loop
+    return await run_in_threadpool(FoodCatalog, version, rows)
+
+
+food_catalog = VersionedSnapshot("foods", _load_food_catalog)
+
+
+async def _load_store_index(db: AsyncSession, version: int) -> StoreIndex:
+    rows = (await db.execute(select(Store.id, Store.latitude, Store.longitude))).all()
+    return await run_in_threadpool(StoreIndex, version, rows)
+
+
+store_index = VersionedSnapshot("stores", _load_store_index)
+
+
+async def warm_catalogs() -> None:
+    """Build both snapshots now instead of on the first catalog requests."""
+    async with open_session(read=True) as db:
+        for snapshot in (food_catalog, store_index):
+            await snapshot.get(db)
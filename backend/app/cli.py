@@ -0,0 +1,81 @@
+"""Maintenance commands.
+
+Run from the backend directory::
+
+    python -m app.cli rebuild-daily-totals [--user-id ID]
+    python -m app.cli import-prices FEED [--format csv|jsonl] [--batch-size N] [--create-missing]
+    python -m app.cli prune-refresh-tokens
+"""
+import argparse
+import sys
+import time
+
+from .config import settings
+from .database import SessionLocal
+from .importer import FORMATS, feed_format, import_prices, open_feed
+from .rollups import rebuild_daily_totals
+from .tokens import prune_refresh_tokens
+
+
+def _rebuild_daily_totals(args) -> None:
+    started = time.perf_counter()
+    with SessionLocal() as db:
+        written = rebuild_daily_totals(db, user_id=args.user_id, batch_size=args.batch_size)
+        db.commit()
+    print(f"Rebuilt {written} daily total rows in {time.perf_counter() - started:.2f}s")
+
+
+def _import_prices(args) -> None:
+    if args.feed == "-":
+        raw, name = sys.stdin.buffer, ""
+    else:
+        raw, name = open(args.feed, "rb"), args.feed
+    with raw, SessionLocal() as db:
+        report = import_prices(
+            db, open_feed(raw, name), args.format or feed_format(name),
+            batch_size=args.batch_size, create_missing=args.create_missing,
+        )
+    print(
+        f"Read {report.read} lines in {report.elapsed_seconds:.2f}s ({report.rows_per_second:.0f} rows/s): "
+        f"{report.upserted} prices upserted, {report.rejected} rejected, "
+        f"{report.created_foods} foods and {report.created_stores} stores created"
+    )
+    for line, reason in report.rejections[:args.show_rejections]:
+        print(f"  line {line}: {reason}")
+    if report.rejected > args.show_rejections:
+        print(f"  ... and {report.rejected - args.show_rejections} more")
+
+
+def _prune_refresh_tokens(args) -> None:
+    with SessionLocal() as db:
+        deleted = prune_refresh_tokens(db)
+        db.commit()
+    print(f"Deleted {deleted} expired refresh tokens")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="VegProtein maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    rebuild = commands.add_parser("rebuild-daily-totals", help="Backfill daily_protein_totals from protein_logs")
+    rebuild.add_argument("--user-id", type=int, help="Only rebuild this user's rows")
+    rebuild.add_argument("--batch-size", type=int, default=5000)
+    rebuild.set_defaults(func=_rebuild_daily_totals)
+
+    prices = commands.add_parser("import-prices", help="Upsert a CSV or JSON Lines store price feed")
+    prices.add_argument("feed", help="Feed file (.csv, .jsonl, optionally .gz), or - for stdin")
+    prices.add_argument("--format", choices=FORMATS, help="Defaults to a guess from the file name")
+    prices.add_argument("--batch-size", type=int, default=settings.PRICE_IMPORT_BATCH_SIZE)
+    prices.add_argument("--create-missing", action="store_true", help="Create unknown foods and stores")
+    prices.add_argument("--show-rejections", type=int, default=10, help="Rejected lines to print")
+    prices.set_defaults(func=_import_prices)
+
+    prune = commands.add_parser("prune-refresh-tokens", help="Delete expired refresh tokens")
+    prune.set_defaults(func=_prune_refresh_tokens)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,12 +4,106 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
+def _env_bool(name: str, default: str) -> bool:
+    return os.getenv(name, default).strip().lower() in ("1", "true", "yes", "on")
+
+
+def _async_database_url(url: str) -> str:
+    """Map a sync DATABASE_URL onto the matching async driver."""
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    if url.startswith("postgresql://") or url.startswith("postgres://"):
+        return "postgresql+asyncpg://" + url.split("://", 1)[1]
+    if url.startswith("postgresql+psycopg2://"):
+        return "postgresql+asyncpg://" + url.split("://", 1)[1]
+    return url
+
+
 class Settings:
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./vegprotein.db")
+    # Serve requests through AsyncSession (aiosqlite/asyncpg). When disabled the
+    # sync Session is used instead, with each call pushed to the threadpool.
+    DATABASE_ASYNC: bool = _env_bool("DATABASE_ASYNC", "true")
+    ASYNC_DATABASE_URL: str = os.getenv("ASYNC_DATABASE_URL") or _async_database_url(DATABASE_URL)
+    # Optional read replica for GET handlers. A user who just wrote reads from
+    # the primary for READ_YOUR_WRITES_SECONDS (longer than the replica's lag).
+    # The window is remembered by the worker that took the write, so the
+    # guarantee holds only with a single worker or sticky routing per user.
+    DATABASE_READ_URL: str = os.getenv("DATABASE_READ_URL", "")
+    ASYNC_DATABASE_READ_URL: str = os.getenv("ASYNC_DATABASE_READ_URL") or _async_database_url(DATABASE_READ_URL)
+    READ_YOUR_WRITES_SECONDS: float = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+    # Connection pools (one per engine, per worker process). Pre-ping and
+    # recycling apply to server databases only.
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT_SECONDS: float = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+    DB_POOL_RECYCLE_SECONDS: int = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+    DB_POOL_PRE_PING: bool = _env_bool("DB_POOL_PRE_PING", "true")
+    # SQLite: WAL journal (with synchronous=NORMAL) and how long a writer
+    # waits for the database lock before failing
+    SQLITE_WAL: bool = _env_bool("SQLITE_WAL", "true")
+    SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    # Open pooled connections, start the hashing workers and build the catalog
+    # snapshots before serving, so the first requests don't pay for them
+    STARTUP_WARMUP: bool = _env_bool("STARTUP_WARMUP", "false")
     SECRET_KEY: str = os.getenv("SECRET_KEY", "dev-secret-key-change-in-production")
     ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+    # Refresh tokens renew access tokens without the password; each works once
+    REFRESH_TOKEN_EXPIRE_DAYS: int = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+    # How often each worker picks up sessions revoked by other workers
+    REVOCATION_POLL_SECONDS: float = float(os.getenv("REVOCATION_POLL_SECONDS", "5"))
     CORS_ORIGINS: list = os.getenv("CORS_ORIGINS", "http://localhost:5173").split(",")
+    # Password hashing runs on a bounded pool ("thread" or "process"); requests
+    # beyond workers + queue limit get an immediate 503.
+    HASH_POOL_KIND: str = os.getenv("HASH_POOL_KIND", "thread")
+    HASH_POOL_WORKERS: int = int(os.getenv("HASH_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+    HASH_POOL_QUEUE_LIMIT: int = int(os.getenv("HASH_POOL_QUEUE_LIMIT", "32"))
+    # Per-worker cache of authenticated users. Profile changes invalidate it on
+    # the worker that made them; other workers see users.updated_at move
+    # within USER_CACHE_POLL_SECONDS.
+    USER_CACHE_TTL_SECONDS: int = int(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+    USER_CACHE_MAX_ENTRIES: int = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+    USER_CACHE_POLL_SECONDS: float = float(os.getenv("USER_CACHE_POLL_SECONDS", "5"))
+    # Each worker serves the food catalog from an in-memory snapshot and checks
+    # the catalog_versions row at most this often for changes from other workers.
+    CATALOG_POLL_SECONDS: float = float(os.getenv("CATALOG_POLL_SECONDS", "5"))
+    # Cache-Control max-age for catalog responses; they always carry an ETag,
+    # so with 0 clients revalidate every time and get a bodiless 304 if unchanged
+    CATALOG_CACHE_MAX_AGE_SECONDS: int = int(os.getenv("CATALOG_CACHE_MAX_AGE_SECONDS", "0"))
+    # Shared secret for the /api/admin endpoints (X-Admin-Key header); empty disables them
+    ADMIN_API_KEY: str = os.getenv("ADMIN_API_KEY", "")
+    PRICE_IMPORT_BATCH_SIZE: int = int(os.getenv("PRICE_IMPORT_BATCH_SIZE", "5000"))
+    # Token-bucket rate limits ("N/second", "N/minute" or "N/hour"; empty disables one).
+    # Route budgets are "METHOD /path=N/period" separated by ";", per user when
+    # signed in and per client IP otherwise.
+    RATE_LIMIT_ENABLED: bool = _env_bool("RATE_LIMIT_ENABLED", "true")
+    RATE_LIMIT_PER_IP: str = os.getenv("RATE_LIMIT_PER_IP", "600/minute")
+    RATE_LIMIT_PER_USER: str = os.getenv("RATE_LIMIT_PER_USER", "300/minute")
+    RATE_LIMIT_ROUTES: str = os.getenv(
+        "RATE_LIMIT_ROUTES",
+        "POST /api/auth/login=10/minute; POST /api/auth/token=10/minute; POST /api/auth/register=5/minute; "
+        "POST /api/auth/refresh=30/minute; GET /api/protein-logs/today=60/minute; "
+        "GET /api/protein-logs/export=20/hour",
+    )
+    # "memory" (per worker) or "sqlite:///path" to share buckets between the workers of a host
+    RATE_LIMIT_STORAGE: str = os.getenv("RATE_LIMIT_STORAGE", "memory")
+    # Load shedding: new requests get a 503 while this many are in progress in
+    # a worker, or while its event loop lags this far behind (0 disables either)
+    SHED_MAX_IN_FLIGHT: int = int(os.getenv("SHED_MAX_IN_FLIGHT", "256"))
+    SHED_LOOP_LAG_MS: float = float(os.getenv("SHED_LOOP_LAG_MS", "500"))
+    # /protein-logs/today/stream: heartbeat interval of idle streams, how often
+    # each worker checks for log writes made on other workers, and open
+    # streams allowed per worker
+    SSE_HEARTBEAT_SECONDS: float = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+    SSE_POLL_SECONDS: float = float(os.getenv("SSE_POLL_SECONDS", "5"))
+    SSE_MAX_STREAMS: int = int(os.getenv("SSE_MAX_STREAMS", "5000"))
+    # Rows /protein-logs/export fetches, encodes and sends at a time
+    EXPORT_BATCH_SIZE: int = int(os.getenv("EXPORT_BATCH_SIZE", "2000"))
+    # Statements slower than this are logged (vegprotein.sql logger) and counted
+    SLOW_QUERY_MS: float = float(os.getenv("SLOW_QUERY_MS", "200"))
+    # Server-Timing response header with app, database and serialization time
+    SERVER_TIMING: bool = _env_bool("SERVER_TIMING", "true")
 
 
 settings = Settings()
@@ -1,26 +1,325 @@
-from sqlalchemy import create_engine
+import time
+from contextlib import AsyncExitStack, ExitStack, asynccontextmanager
+from typing import Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy import exc as sa_exc
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from starlette.concurrency import run_in_threadpool
 
+from .cache import TTLCache
 from .config import settings
+from .instrumentation import track_queries
+from .metrics import Counter, Histogram
+
+POOL_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0)
+
+pool_wait_seconds = Histogram(
+    "vegprotein_db_pool_wait_seconds", "Time spent checking a connection out of the pool", POOL_WAIT_BUCKETS
+)
+pool_timeouts = Counter("vegprotein_db_pool_timeouts_total", "Checkouts that gave up after DB_POOL_TIMEOUT")
+pool_invalidations = Counter("vegprotein_db_pool_invalidations_total", "Pooled connections discarded as broken")
+
+
+class _TimedCheckout:
+    """Pool mixin recording how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except sa_exc.TimeoutError:
+            pool_timeouts.inc()
+            raise
+        finally:
+            pool_wait_seconds.observe(time.perf_counter() - started)
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
 
-# Support SQLite for development
-if settings.DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(
-        settings.DATABASE_URL,
-        connect_args={"check_same_thread": False}
+
+def _engine_options(url: str, is_async: bool) -> dict:
+    """Pool settings for ``url``; in-memory SQLite keeps SQLAlchemy's single-connection pool."""
+    parsed = make_url(url)
+    options = {}
+    if parsed.get_backend_name() == "sqlite":
+        if not is_async:
+            options["connect_args"] = {"check_same_thread": False}
+        if parsed.database in (None, "", ":memory:"):
+            return options
+    else:
+        # Drop connections the server or a proxy may have closed underneath us
+        options["pool_pre_ping"] = settings.DB_POOL_PRE_PING
+        options["pool_recycle"] = settings.DB_POOL_RECYCLE_SECONDS
+    options.update(
+        poolclass=TimedAsyncQueuePool if is_async else TimedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
     )
-else:
-    engine = create_engine(settings.DATABASE_URL)
+    return options
+
+
+def _sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """WAL lets readers run alongside the writer; busy_timeout makes writers queue, not fail."""
+    cursor = dbapi_connection.cursor()
+    if settings.SQLITE_WAL:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        # Durable across application crashes in WAL mode; only an OS crash can lose the last commits
+        cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.close()
+
+
+def _instrument(engine: Engine) -> None:
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", _sqlite_pragmas)
+    event.listen(engine, "invalidate", lambda *args: pool_invalidations.inc())
+    track_queries(engine)
+
+
+engine = create_engine(settings.DATABASE_URL, **_engine_options(settings.DATABASE_URL, is_async=False))
+_instrument(engine)
 
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 Base = declarative_base()
 
+# insert() constructs that support ON CONFLICT, by dialect name
+ON_CONFLICT_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+# Async engine used by the API when DATABASE_ASYNC is enabled. The sync engine
+# above stays around for schema creation and command line tools.
+if settings.DATABASE_ASYNC:
+    async_engine = create_async_engine(
+        settings.ASYNC_DATABASE_URL, **_engine_options(settings.ASYNC_DATABASE_URL, is_async=True)
+    )
+    _instrument(async_engine.sync_engine)
+    AsyncSessionLocal = async_sessionmaker(
+        bind=async_engine, autoflush=False, expire_on_commit=False
+    )
+else:
+    async_engine = None
+    AsyncSessionLocal = None
+
+# Optional read replica for GET handlers (see get_read_db). Without
+# DATABASE_READ_URL the read engines are simply the primary ones.
+if settings.DATABASE_READ_URL:
+    read_engine = create_engine(
+        settings.DATABASE_READ_URL, **_engine_options(settings.DATABASE_READ_URL, is_async=False)
+    )
+    _instrument(read_engine)
+else:
+    read_engine = engine
+ReadSessionLocal = sessionmaker(bind=read_engine, autoflush=False, autocommit=False)
+
+if settings.DATABASE_ASYNC and settings.DATABASE_READ_URL:
+    async_read_engine = create_async_engine(
+        settings.ASYNC_DATABASE_READ_URL, **_engine_options(settings.ASYNC_DATABASE_READ_URL, is_async=True)
+    )
+    _instrument(async_read_engine.sync_engine)
+    AsyncReadSessionLocal = async_sessionmaker(
+        bind=async_read_engine, autoflush=False, expire_on_commit=False
+    )
+else:
+    async_read_engine = async_engine
+    AsyncReadSessionLocal = AsyncSessionLocal
+
+# Users who wrote within READ_YOUR_WRITES_SECONDS; their reads stay on the
+# primary until the replica has had time to catch up. Per worker process:
+# another worker doesn't know about the write and may read the replica.
+recent_writers = TTLCache(maxsize=100_000, ttl=settings.READ_YOUR_WRITES_SECONDS)
+
+
+class ThreadedStreamResult:
+    """``AsyncResult.partitions`` over a sync result, each batch fetched in the threadpool."""
+
+    def __init__(self, result):
+        self.result = result
+
+    async def partitions(self, size: Optional[int] = None):
+        batches = self.result.partitions(size)
+        try:
+            while True:
+                rows = await run_in_threadpool(next, batches, None)
+                if rows is None:
+                    return
+                yield rows
+        finally:
+            await run_in_threadpool(self.result.close)
+
+
+class ThreadedSession:
+    """AsyncSession-compatible wrapper around a sync Session.
+
+    Lets the routers keep a single ``await db.execute(...)`` code path when
+    DATABASE_ASYNC is off: every call that talks to the database runs in the
+    threadpool instead of on the event loop.
+    """
 
-def get_db():
-    db = SessionLocal()
-    try:
+    def __init__(self, sync_session: Session):
+        self.sync_session = sync_session
+
+    @property
+    def bind(self):
+        return self.sync_session.bind
+
+    def add(self, instance) -> None:
+        self.sync_session.add(instance)
+
+    def add_all(self, instances) -> None:
+        self.sync_session.add_all(instances)
+
+    async def execute(self, statement, params=None, execution_options=None, **kw):
+        # Buffer rows in the worker thread, as AsyncSession does, so consuming
+        # the result on the event loop never touches the cursor.
+        options = dict(execution_options or {}, prebuffer_rows=True)
+        return await run_in_threadpool(
+            self.sync_session.execute, statement, params,
+            execution_options=options, **kw
+        )
+
+    async def stream(self, statement, params=None, execution_options=None, **kw):
+        """Unbuffered result, read with ``async for rows in result.partitions()``."""
+        options = dict(execution_options or {}, stream_results=True)
+        result = await run_in_threadpool(
+            self.sync_session.execute, statement, params,
+            execution_options=options, **kw
+        )
+        return ThreadedStreamResult(result)
+
+    async def scalar(self, statement, params=None, **kw):
+        return await run_in_threadpool(self.sync_session.scalar, statement, params, **kw)
+
+    async def scalars(self, statement, params=None, **kw):
+        result = await self.execute(statement, params, **kw)
+        return result.scalars()
+
+    async def get(self, entity, ident, **kw):
+        return await run_in_threadpool(self.sync_session.get, entity, ident, **kw)
+
+    async def delete(self, instance) -> None:
+        await run_in_threadpool(self.sync_session.delete, instance)
+
+    async def flush(self, objects=None) -> None:
+        await run_in_threadpool(self.sync_session.flush, objects)
+
+    async def refresh(self, instance, attribute_names=None) -> None:
+        await run_in_threadpool(self.sync_session.refresh, instance, attribute_names)
+
+    async def commit(self) -> None:
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self) -> None:
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def close(self) -> None:
+        await run_in_threadpool(self.sync_session.close)
+
+    async def run_sync(self, fn, *args, **kw):
+        return await run_in_threadpool(fn, self.sync_session, *args, **kw)
+
+
+@asynccontextmanager
+async def open_session(read: bool = False):
+    """A session on the primary, or on the read replica with ``read=True``."""
+    if AsyncSessionLocal is not None:
+        async with (AsyncReadSessionLocal if read else AsyncSessionLocal)() as db:
+            yield db
+    else:
+        db = ThreadedSession((ReadSessionLocal if read else SessionLocal)(expire_on_commit=False))
+        try:
+            yield db
+        finally:
+            await db.close()
+
+
+async def get_db():
+    async with open_session() as db:
         yield db
-    finally:
-        db.close()
 
+
+async def get_read_db():
+    """Session for read-only handlers: the replica when one is configured."""
+    async with open_session(read=True) as db:
+        yield db
+
+
+def mark_recent_write(user_id: int) -> None:
+    """Pin ``user_id``'s reads to the primary for READ_YOUR_WRITES_SECONDS."""
+    recent_writers.set(user_id, True)
+
+
+def wrote_recently(user_id: int) -> bool:
+    return recent_writers.get(user_id) is not None
+
+
+def _open_connections(engine: Engine, count: int) -> None:
+    with ExitStack() as stack:
+        for _ in range(count):
+            stack.enter_context(engine.connect())
+
+
+async def warm_pools() -> None:
+    """Fill each request engine's pool with DB_POOL_SIZE open connections."""
+    if async_engine is not None:
+        for pooled in dict.fromkeys((async_engine, async_read_engine)):
+            async with AsyncExitStack() as stack:
+                for _ in range(settings.DB_POOL_SIZE):
+                    await stack.enter_async_context(pooled.connect())
+    else:
+        for pooled in dict.fromkeys((engine, read_engine)):
+            await run_in_threadpool(_open_connections, pooled, settings.DB_POOL_SIZE)
+
+
+async def dispose_engines() -> None:
+    """Close every pooled connection (on shutdown: each open aiosqlite connection keeps a thread alive)."""
+    if async_engine is not None:
+        await async_engine.dispose()
+    if async_read_engine is not async_engine:
+        await async_read_engine.dispose()
+    engine.dispose()
+    if read_engine is not engine:
+        read_engine.dispose()
+
+
+def _pool_stats(engine: Engine) -> dict:
+    pool = engine.pool
+    stats = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update(
+            size=pool.size(),
+            max_overflow=pool._max_overflow,
+            open=pool.size() + pool.overflow(),
+            checked_out=pool.checkedout(),
+            idle=pool.checkedin(),
+            # Connections open beyond pool_size
+            overflow=max(pool.overflow(), 0),
+        )
+    return stats
+
+
+def pool_stats() -> dict:
+    """Connection pool usage for each engine, plus checkout wait times."""
+    stats = {"sync": _pool_stats(engine)}
+    if async_engine is not None:
+        stats["async"] = _pool_stats(async_engine.sync_engine)
+    if read_engine is not engine:
+        stats["read"] = _pool_stats(read_engine)
+    if async_read_engine is not async_engine:
+        stats["async_read"] = _pool_stats(async_read_engine.sync_engine)
+    stats.update(
+        timeouts_total=pool_timeouts.value,
+        invalidations_total=pool_invalidations.value,
+        wait_seconds=pool_wait_seconds.snapshot(),
+    )
+    return stats
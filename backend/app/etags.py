@@ -0,0 +1,193 @@
+"""Conditional GET for endpoints whose data carries a version.
+
+The frontend re-polls catalog lists and the day summary. For the routes in
+``ROUTES``, a request with ``If-None-Match`` gets its ETag worked out from
+the data's version before the handler runs:
+
+* catalog routes use the food or store catalog version, which each worker
+  already holds in memory (see ``catalog.py``), so a hit costs no query;
+* per-user routes use the user's ``log_version``, bumped by every log write,
+  plus the profile fields and local date the summaries depend on. The user
+  comes from the cached principal the handlers use (see ``auth.py``), so
+  the only query is the ``log_versions`` row, by primary key (on the primary
+  while the user's read-your-writes window is open, like the handlers).
+
+A request whose ``If-None-Match`` matches gets an empty 304 and the handler
+never runs. Per-user requests without ``If-None-Match`` have nothing to
+match, so their version is not looked up: the 200 goes out with an ETag made
+from its body instead. When that body ETag comes back, the version ETag
+differs, so the handler runs; if its body is unchanged the answer is still a
+304, carrying the version ETag so the next revalidation skips the handler.
+200 responses go out with the ETag and ``Cache-Control``.
+"""
+import hashlib
+import re
+from typing import Awaitable, Callable, List, Optional, Pattern, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .auth import _authenticate
+from .catalog import VersionedSnapshot, food_catalog, store_index
+from .config import settings
+from .database import open_session, wrote_recently
+from .metrics import Counter
+from .models import LogVersion
+from .timezones import local_today
+
+# A validator returns the state a response depends on, or None to skip caching
+Validator = Callable[[Scope], Awaitable[Optional[tuple]]]
+
+etag_checks = Counter("vegprotein_etag_checks_total", "Requests to ETag-enabled routes")
+etag_not_modified = Counter("vegprotein_etag_not_modified_total", "Requests answered 304 Not Modified")
+
+
+def _catalog(snapshot: VersionedSnapshot) -> Validator:
+    async def validate(scope: Scope) -> Optional[tuple]:
+        current = snapshot.cached()
+        if current is None:
+            async with open_session(read=True) as db:
+                current = await snapshot.get(db)
+        return (snapshot.name, current.version)
+    return validate
+
+
+async def _user_logs(scope: Scope) -> Optional[tuple]:
+    scheme, _, token = Headers(scope=scope).get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer":
+        return None
+    try:
+        # Usually cached: no query beyond the periodic revocation and profile polls
+        async with open_session() as db:
+            user = await _authenticate(token, db, use_cache=True)
+    except HTTPException:
+        # Let the handler produce the 401
+        return None
+    if not user.is_active:
+        return None
+    async with open_session(read=not wrote_recently(user.id)) as db:
+        log_version = await db.scalar(select(LogVersion.version).where(LogVersion.user_id == user.id))
+    return (user.id, log_version or 0, user.protein_goal, user.timezone, local_today(user.timezone).isoformat())
+
+
+CATALOG_CACHE_CONTROL = f"public, max-age={settings.CATALOG_CACHE_MAX_AGE_SECONDS}, must-revalidate"
+USER_CACHE_CONTROL = "private, no-cache"
+
+# (path pattern, validator, Cache-Control, whether the validator is cheap
+# enough to run without If-None-Match); patterns must match the whole path
+ROUTES: List[Tuple[Pattern, Validator, str, bool]] = [
+    (re.compile(pattern), validator, cache_control, always)
+    for pattern, validator, cache_control, always in [
+        (r"/api/foods/?", _catalog(food_catalog), CATALOG_CACHE_CONTROL, True),
+        (r"/api/foods/(categories|top-protein|\d+)", _catalog(food_catalog), CATALOG_CACHE_CONTROL, True),
+        (r"/api/stores/?", _catalog(store_index), CATALOG_CACHE_CONTROL, True),
+        (r"/api/stores/(nearby|\d+)", _catalog(store_index), CATALOG_CACHE_CONTROL, True),
+        (r"/api/protein-logs/?", _user_logs, USER_CACHE_CONTROL, False),
+        (r"/api/protein-logs/(today|weekly|range)", _user_logs, USER_CACHE_CONTROL, False),
+    ]
+]
+
+
+def make_etag(path: str, query_string: bytes, state: tuple) -> str:
+    digest = hashlib.blake2b(repr((path, query_string, state)).encode(), digest_size=12).hexdigest()
+    # Weak: the same data may be sent with different encodings
+    return f'W/"{digest}"'
+
+
+def body_etag(path: str, query_string: bytes, body: bytes) -> str:
+    return make_etag(path, query_string, (hashlib.blake2b(body, digest_size=16).hexdigest(),))
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison against an If-None-Match list."""
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+class ConditionalGetMiddleware:
+    """Answer If-None-Match with 304 for ``ROUTES`` before the handler runs."""
+
+    def __init__(self, app: ASGIApp, routes: List[Tuple[Pattern, Validator, str, bool]] = ROUTES):
+        self.app = app
+        self.routes = routes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+        for pattern, validator, cache_control, always in self.routes:
+            if pattern.fullmatch(scope["path"]):
+                break
+        else:
+            await self.app(scope, receive, send)
+            return
+
+        etag_checks.inc()
+        if_none_match = Headers(scope=scope).get("if-none-match")
+        headers = [(b"cache-control", cache_control.encode())]
+        if cache_control.startswith("private"):
+            headers.append((b"vary", b"Authorization"))
+
+        etag = None
+        if always or if_none_match:
+            state = await validator(scope)
+            if state is None:
+                await self.app(scope, receive, send)
+                return
+            etag = make_etag(scope["path"], scope["query_string"], state)
+            if if_none_match and etag_matches(if_none_match, etag):
+                await self._not_modified(send, etag, headers)
+                return
+            if always:
+                await self.app(scope, receive, self._tagging(send, etag, headers))
+                return
+
+        # Without a version ETag, or with one that didn't match: hold the 200
+        # until its body is complete, to ETag the body or 304 on it
+        start: Optional[Message] = None
+        chunks: List[bytes] = []
+
+        async def send_with_etag(message: Message) -> None:
+            nonlocal start
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                start = message
+                return
+            if start is None:
+                await send(message)
+                return
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            body = b"".join(chunks)
+            tag = body_etag(scope["path"], scope["query_string"], body)
+            if if_none_match and etag_matches(if_none_match, tag):
+                await self._not_modified(send, etag or tag, headers)
+                return
+            await send(dict(start, headers=list(start.get("headers", [])) + [(b"etag", (etag or tag).encode())] + headers))
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_with_etag)
+
+    @staticmethod
+    async def _not_modified(send: Send, etag: str, headers: List[Tuple[bytes, bytes]]) -> None:
+        etag_not_modified.inc()
+        await send({"type": "http.response.start", "status": 304, "headers": [(b"etag", etag.encode())] + headers})
+        await send({"type": "http.response.body", "body": b""})
+
+    @staticmethod
+    def _tagging(send: Send, etag: str, headers: List[Tuple[bytes, bytes]]) -> Send:
+        async def send_with_etag(message: Message) -> None:
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                message = dict(message, headers=list(message.get("headers", [])) + [(b"etag", etag.encode())] + headers)
+            await send(message)
+        return send_with_etag
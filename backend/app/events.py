@@ -0,0 +1,296 @@
+"""Live day summaries for ``GET /protein-logs/today/stream``.
+
+Each worker keeps its open streams in ``day_events``, by user. After a log
+write commits, the handler publishes the logs it added or deleted, tagged
+with the user's new ``log_version``. Every stream of that user applies them
+to its running totals and sends small ``log_added``/``log_deleted`` events;
+nothing is re-read. A stream that sees a version gap missed a write handled
+by another worker, so it re-reads the day and sends a fresh ``summary``.
+
+For writes on other workers with no local write after them, a task polls
+the ``log_version``, goal and timezone of every user with an open stream, in
+one query per SSE_POLL_SECONDS however many streams are open, and wakes only
+the streams whose user changed.
+
+An idle stream costs a small buffer and a parked coroutine, so a worker can
+hold thousands; SSE_MAX_STREAMS caps them. A stream that falls more than
+``BUFFER_EVENTS`` behind drops its backlog and resyncs instead.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import suppress
+from datetime import datetime, timezone
+from typing import AsyncIterator, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+import orjson
+from sqlalchemy import select
+
+from .auth import UserPrincipal
+from .config import settings
+from .database import open_session
+from .metrics import Counter, Gauge
+from .models import User
+from .rollups import join_log_version, user_log_version
+from .summaries import day_progress, log_entry, logs_between
+from .timezones import day_bounds, local_day, local_today
+from .tokens import revoked_sessions
+
+# Events a stream may fall behind by before it drops them and resyncs
+BUFFER_EVENTS = 100
+
+# Users per version poll query
+POLL_BATCH = 500
+
+# Reconnect delay the browser is told to use, in milliseconds
+RETRY_MS = 3000
+
+# Times a snapshot is re-read when a write lands in the middle of it
+SNAPSHOT_ATTEMPTS = 3
+
+# A queued item is RESYNC or (log_version, change); change is None for a
+# version seen by the poller, else (added logs, deleted logs)
+RESYNC = None
+
+open_streams = Gauge("vegprotein_sse_streams", "Open /today streams in this worker")
+stream_resyncs = Counter("vegprotein_sse_resyncs_total", "Stream summaries re-read after a missed or dropped change")
+
+logger = logging.getLogger("vegprotein.events")
+
+
+class Subscription:
+    __slots__ = ("user_id", "events", "_wakeup")
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self.events: Deque = deque()
+        self._wakeup = asyncio.Event()
+
+    def push(self, item) -> None:
+        if len(self.events) >= BUFFER_EVENTS:
+            # Too far behind to catch up with deltas
+            self.events.clear()
+            item = RESYNC
+        self.events.append(item)
+        self._wakeup.set()
+
+    async def wait(self, timeout: float) -> None:
+        """Until something is pushed, or ``timeout`` seconds."""
+        with suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(self._wakeup.wait(), max(0.0, timeout))
+        self._wakeup.clear()
+
+
+class DayEvents:
+    """Fan-out of log changes to the open streams of this worker."""
+
+    def __init__(self):
+        self._streams: Dict[int, Set[Subscription]] = {}
+        # user id -> (log_version, protein_goal, timezone) as last seen
+        self._seen: Dict[int, Tuple[int, int, str]] = {}
+        self._count = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def subscribe(self, user_id: int) -> Subscription:
+        subscription = Subscription(user_id)
+        self._streams.setdefault(user_id, set()).add(subscription)
+        self._count += 1
+        open_streams.set(self._count)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        streams = self._streams.get(subscription.user_id)
+        if streams is None or subscription not in streams:
+            return
+        streams.discard(subscription)
+        if not streams:
+            del self._streams[subscription.user_id]
+            self._seen.pop(subscription.user_id, None)
+        self._count -= 1
+        open_streams.set(self._count)
+
+    def _push(self, user_id: int, item) -> None:
+        for subscription in self._streams.get(user_id, ()):
+            subscription.push(item)
+
+    def publish(
+        self, user_id: int, log_version: Optional[int], added: Iterable[dict] = (), deleted: Iterable[dict] = ()
+    ) -> None:
+        """Send a committed write's logs (as ``log_entry`` dicts) to the user's streams."""
+        if log_version is None or user_id not in self._streams:
+            return
+        seen = self._seen.get(user_id)
+        if seen is not None and log_version > seen[0]:
+            self._seen[user_id] = (log_version,) + seen[1:]
+        self._push(user_id, (log_version, (list(added), list(deleted))))
+
+    def resync(self, user_id: int) -> None:
+        """Make the user's streams re-read their summary, e.g. after a profile change."""
+        if user_id in self._streams:
+            self._seen.pop(user_id, None)
+            self._push(user_id, RESYNC)
+
+    async def poll(self) -> None:
+        """Wake the streams of users changed by other workers."""
+        user_ids = list(self._streams)
+        for offset in range(0, len(user_ids), POLL_BATCH):
+            async with open_session() as db:
+                rows = (await db.execute(
+                    join_log_version(select(User.id, user_log_version, User.protein_goal, User.timezone))
+                    .where(User.id.in_(user_ids[offset:offset + POLL_BATCH]))
+                )).all()
+            for user_id, log_version, goal, tz_name in rows:
+                if user_id not in self._streams:
+                    continue
+                seen = self._seen.get(user_id)
+                self._seen[user_id] = (log_version, goal, tz_name)
+                if seen is not None and seen[1:] != (goal, tz_name):
+                    self._push(user_id, RESYNC)
+                elif seen is None or seen[0] != log_version:
+                    # Each stream compares it with the version it is at
+                    self._push(user_id, (log_version, None))
+
+    async def _poll_forever(self) -> None:
+        while True:
+            await asyncio.sleep(settings.SSE_POLL_SECONDS)
+            try:
+                await self.poll()
+            except Exception:
+                # The database being away must not end polling for good
+                logger.exception("polling stream users failed")
+
+    def start(self) -> None:
+        """Start polling for other workers' writes; call from the running loop (app startup)."""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._poll_forever())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+
+day_events = DayEvents()
+
+
+class DayState:
+    __slots__ = ("log_version", "day", "timezone", "goal", "total_protein", "log_count")
+
+    def __init__(self, log_version: int, day, tz_name: str, goal: int, total_protein: float, log_count: int):
+        self.log_version = log_version
+        self.day = day
+        self.timezone = tz_name
+        self.goal = goal
+        self.total_protein = total_protein
+        self.log_count = log_count
+
+    def totals(self) -> dict:
+        return day_progress(self.total_protein, self.log_count, self.goal)
+
+
+def _event(name: str, data: dict) -> bytes:
+    return b"event: " + name.encode() + b"\ndata: " + orjson.dumps(data, option=orjson.OPT_UTC_Z) + b"\n\n"
+
+
+async def _snapshot(user_id: int) -> Optional[Tuple[DayState, dict]]:
+    """The user's day as ``/today`` returns it, with the log_version it reflects."""
+    user_query = join_log_version(
+        select(user_log_version, User.protein_goal, User.timezone)
+    ).where(User.id == user_id)
+    async with open_session() as db:
+        for _ in range(SNAPSHOT_ATTEMPTS):
+            user = (await db.execute(user_query)).first()
+            if user is None:
+                return None
+            today = local_today(user.timezone)
+            logs = (await db.scalars(logs_between(user_id, today, today, user.timezone))).all()[::-1]
+            # Each statement may see newer commits (READ COMMITTED); only keep
+            # a read that no write landed in the middle of
+            if await db.scalar(user_query.with_only_columns(user_log_version)) == user.log_version:
+                break
+            await db.rollback()
+    state = DayState(
+        user.log_version, today, user.timezone, user.protein_goal, sum(log.protein_amount for log in logs), len(logs)
+    )
+    return state, {"date": today.isoformat(), **state.totals(), "logs": [log_entry(log) for log in logs]}
+
+
+def _apply(state: DayState, added: List[dict], deleted: List[dict]) -> List[bytes]:
+    chunks = []
+    for log in added:
+        if local_day(log["logged_at"], state.timezone) == state.day:
+            state.total_protein += log["protein_amount"]
+            state.log_count += 1
+            chunks.append(_event("log_added", {"log": log, **state.totals()}))
+    for log in deleted:
+        if local_day(log["logged_at"], state.timezone) == state.day:
+            state.total_protein = max(state.total_protein - log["protein_amount"], 0.0)
+            state.log_count -= 1
+            chunks.append(_event("log_deleted", {"id": log["id"], **state.totals()}))
+    return chunks
+
+
+def _seconds_to_midnight(state: DayState) -> float:
+    _, end = day_bounds(state.day, state.day, state.timezone)
+    return (end - datetime.now(timezone.utc)).total_seconds()
+
+
+async def today_stream(user: UserPrincipal, expires_at: float, session_id: Optional[str]) -> AsyncIterator[bytes]:
+    """Server-sent events for the user's day until their access token expires.
+
+    Sends ``summary`` first and after any resync (a missed change, a profile
+    change, midnight), ``log_added``/``log_deleted`` with the new totals as
+    logs change, and a comment as a heartbeat when idle.
+    """
+    # Subscribed before the first read, so no write can fall between them;
+    # changes the read already reflects are skipped by version
+    subscription = day_events.subscribe(user.id)
+    try:
+        yield f"retry: {RETRY_MS}\n\n".encode()
+        state = None
+        while True:
+            if state is None:
+                snapshot = await _snapshot(user.id)
+                if snapshot is None:
+                    return
+                state, summary = snapshot
+                yield _event("summary", summary)
+
+            # Closing makes the client reconnect with its current token
+            remaining = expires_at - time.time()
+            if remaining <= 0 or session_id in revoked_sessions:
+                return
+            await subscription.wait(min(settings.SSE_HEARTBEAT_SECONDS, remaining, _seconds_to_midnight(state)))
+            if local_today(state.timezone) != state.day:
+                state = None
+                continue
+            if not subscription.events:
+                yield b": ping\n\n"
+                continue
+
+            chunks = []
+            while subscription.events:
+                item = subscription.events.popleft()
+                if item is not RESYNC:
+                    log_version, change = item
+                    if log_version <= state.log_version:
+                        continue
+                    if change is not None and log_version == state.log_version + 1:
+                        state.log_version = log_version
+                        chunks.extend(_apply(state, *change))
+                        continue
+                # Dropped, missed or made elsewhere: read the day again
+                stream_resyncs.inc()
+                subscription.events.clear()
+                state = None
+                break
+            for chunk in chunks:
+                yield chunk
+    finally:
+        day_events.unsubscribe(subscription)
@@ -0,0 +1,120 @@
+"""Streaming export of a user's protein log history.
+
+``GET /protein-logs/export`` can cover years of logs, so rows are never
+collected: the query runs on a server-side cursor (``stream_results`` with
+``yield_per``) in a session of the export's own, which lives as long as the
+response body. Each batch of EXPORT_BATCH_SIZE rows is encoded and sent
+before the next is fetched, so memory stays flat and the first bytes leave
+as soon as the first batch is read. With gzip each batch is compressed and
+flushed as it goes.
+"""
+import csv
+import io
+import zlib
+from datetime import date
+from typing import AsyncIterator, Optional
+
+import orjson
+from sqlalchemy import Select, select
+
+from .config import settings
+from .database import open_session, wrote_recently
+from .models import ProteinLog
+from .timezones import as_utc, day_bounds
+
+FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+COLUMNS = ("id", "logged_at", "food_name", "protein_amount", "client_key")
+
+# zlib window bits for a gzip header and trailer
+GZIP_WBITS = 31
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """Whether an ``Accept-Encoding`` header allows gzip.
+
+    ``gzip;q=0`` refuses it; ``*`` stands for any coding not listed by name.
+    """
+    qualities = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qualities[coding.strip()] = q
+    q = qualities.get("gzip", qualities.get("x-gzip", qualities.get("*", 0.0)))
+    return q > 0
+
+
+def export_query(user_id: int, start: Optional[date], end: Optional[date], tz_name: str) -> Select:
+    """The user's logs on local days ``start``..``end`` (either may be open), oldest first."""
+    query = select(
+        ProteinLog.id, ProteinLog.logged_at, ProteinLog.food_name, ProteinLog.protein_amount, ProteinLog.client_key
+    ).where(ProteinLog.user_id == user_id)
+    if start is not None:
+        query = query.where(ProteinLog.logged_at >= day_bounds(start, start, tz_name)[0])
+    if end is not None:
+        query = query.where(ProteinLog.logged_at < day_bounds(end, end, tz_name)[1])
+    return query.order_by(ProteinLog.logged_at, ProteinLog.id)
+
+
+def _csv_encoder():
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+
+    def encode(rows) -> bytes:
+        writer.writerows(
+            (row.id, as_utc(row.logged_at).isoformat().replace("+00:00", "Z"), row.food_name, row.protein_amount,
+             row.client_key or "")
+            for row in rows
+        )
+        chunk = buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+        return chunk
+
+    return ",".join(COLUMNS).encode() + b"\n", encode
+
+
+def _ndjson_encoder():
+    def encode(rows) -> bytes:
+        return b"".join(
+            orjson.dumps({
+                "id": row.id,
+                "logged_at": as_utc(row.logged_at),
+                "food_name": row.food_name,
+                "protein_amount": row.protein_amount,
+                "client_key": row.client_key,
+            }, option=orjson.OPT_UTC_Z) + b"\n"
+            for row in rows
+        )
+
+    return b"", encode
+
+
+async def export_chunks(user_id: int, query: Select, export_format: str, gzip: bool) -> AsyncIterator[bytes]:
+    """The encoded export, one chunk per batch of rows."""
+    header, encode = _csv_encoder() if export_format == "csv" else _ndjson_encoder()
+    compressor = zlib.compressobj(wbits=GZIP_WBITS) if gzip else None
+
+    def out(chunk: bytes) -> bytes:
+        # Sync flush: the client gets each batch now rather than when zlib's buffer fills
+        return compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH) if compressor else chunk
+
+    if header:
+        yield out(header)
+    # The user's own reads stay on the primary right after they log
+    async with open_session(read=not wrote_recently(user_id)) as db:
+        result = await db.stream(query.execution_options(yield_per=settings.EXPORT_BATCH_SIZE))
+        async for rows in result.partitions():
+            yield out(encode(rows))
+    if compressor:
+        yield compressor.flush()
@@ -0,0 +1,143 @@
+"""Nearest-store lookups on the sphere.
+
+Stores are held in a KD-tree over their unit-sphere (x, y, z) coordinates.
+Straight-line (chord) distance between two points on the sphere grows with
+the great-circle distance, so the tree's Euclidean nearest neighbours are the
+true nearest stores anywhere on Earth, with no lat/lon distortion near the
+poles or the antimeridian. Distances are reported with the haversine formula.
+
+The tree keeps only ids and coordinates in flat arrays so millions of stores
+fit in a few tens of megabytes; callers load the matching rows by id.
+"""
+import heapq
+import math
+from array import array
+from typing import Iterable, List, Optional, Tuple
+
+EARTH_RADIUS_MILES = 3958.8
+
+# Points per leaf; small leaves mean fewer distance checks, more nodes
+LEAF_SIZE = 16
+
+
+def haversine_miles(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * math.asin(min(1.0, math.sqrt(a)))
+
+
+def to_unit_vector(lat: float, lon: float) -> Tuple[float, float, float]:
+    phi, lam = math.radians(lat), math.radians(lon)
+    cos_phi = math.cos(phi)
+    return cos_phi * math.cos(lam), cos_phi * math.sin(lam), math.sin(phi)
+
+
+def miles_to_chord(miles: float) -> float:
+    angle = min(math.pi, miles / EARTH_RADIUS_MILES)
+    return 2 * math.sin(angle / 2)
+
+
+class StoreIndex:
+    """Immutable KD-tree of ``(store_id, latitude, longitude)`` points.
+
+    Nodes are implicit: node ``n`` covers a contiguous slice of the point
+    arrays, split at its midpoint, with children ``2n`` and ``2n + 1``; only
+    each node's split axis and value are stored.
+    """
+
+    def __init__(self, version: int, points: Iterable[Tuple[int, Optional[float], Optional[float]]]):
+        self.version = version
+        ids, coords = [], ([], [], [])
+        for store_id, lat, lon in points:
+            if lat is None or lon is None:
+                continue
+            ids.append(store_id)
+            for axis, value in zip(coords, to_unit_vector(lat, lon)):
+                axis.append(value)
+
+        count = len(ids)
+        order = list(range(count))
+        # Internal nodes sit at most ``bit_length`` levels down; leave room for their children
+        nodes = 1 << (max(1, count // LEAF_SIZE).bit_length() + 2)
+        self._axes = bytearray(nodes)
+        self._splits = array("d", bytes(8 * nodes))
+        stack = [(1, 0, count)]
+        while stack:
+            node, lo, hi = stack.pop()
+            if hi - lo <= LEAF_SIZE:
+                continue
+            segment = order[lo:hi]
+            # Split on the widest axis, estimated from a sample of the node
+            sample = segment[::max(1, len(segment) // 256)]
+            axis = max(range(3), key=lambda a: max(coords[a][i] for i in sample) - min(coords[a][i] for i in sample))
+            values = coords[axis]
+            segment.sort(key=values.__getitem__)
+            order[lo:hi] = segment
+            mid = (lo + hi) // 2
+            self._axes[node] = axis
+            self._splits[node] = values[order[mid]]
+            stack.append((2 * node, lo, mid))
+            stack.append((2 * node + 1, mid, hi))
+
+        self.ids = array("q", (ids[i] for i in order))
+        self._coords = tuple(array("d", (axis[i] for i in order)) for axis in coords)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def nearest(
+        self, latitude: float, longitude: float, k: Optional[int], max_miles: Optional[float] = None
+    ) -> List[Tuple[int, float]]:
+        """Up to ``k`` ``(store_id, miles)`` pairs, closest first, within ``max_miles``.
+
+        With ``k`` None, every store within ``max_miles``.
+        """
+        if k is None:
+            k = len(self.ids)
+        if not self.ids or k <= 0:
+            return []
+        qx, qy, qz = to_unit_vector(latitude, longitude)
+        query = (qx, qy, qz)
+        xs, ys, zs = self._coords
+        axes, splits = self._axes, self._splits
+        # The radius is inclusive; the slack absorbs rounding in the chord, so
+        # a store exactly ``max_miles`` away is kept
+        limit = miles_to_chord(max_miles) ** 2 * (1 + 1e-9) if max_miles is not None else 5.0
+
+        best = []  # max-heap of (-squared chord, position)
+        kth = math.inf  # squared chord of the k-th best so far, once there are k
+        stack = [(0.0, 1, 0, len(self.ids))]
+        while stack:
+            gap, node, lo, hi = stack.pop()
+            if gap > limit or gap >= kth:
+                continue
+            if hi - lo <= LEAF_SIZE:
+                for i in range(lo, hi):
+                    dx, dy, dz = xs[i] - qx, ys[i] - qy, zs[i] - qz
+                    d = dx * dx + dy * dy + dz * dz
+                    if d <= limit and d < kth:
+                        if len(best) < k:
+                            heapq.heappush(best, (-d, i))
+                        else:
+                            heapq.heapreplace(best, (-d, i))
+                        if len(best) == k:
+                            kth = -best[0][0]
+                continue
+            mid = (lo + hi) // 2
+            diff = query[axes[node]] - splits[node]
+            if diff < 0:
+                near, far = (2 * node, lo, mid), (2 * node + 1, mid, hi)
+            else:
+                near, far = (2 * node + 1, mid, hi), (2 * node, lo, mid)
+            # Push the far side first so the near side is searched (and
+            # tightens ``kth``) before the far side's bound is checked
+            stack.append((max(gap, diff * diff),) + far)
+            stack.append((gap,) + near)
+
+        result = sorted((-neg_d, i) for neg_d, i in best)
+        return [
+            (self.ids[i], 2 * EARTH_RADIUS_MILES * math.asin(min(1.0, math.sqrt(d) / 2)))
+            for d, i in result
+        ]
@@ -0,0 +1,112 @@
+"""Bounded executor for password hashing.
+
+bcrypt deliberately burns 100-300 ms of CPU per call, so it must never run on
+the event loop. Calls go to a fixed-size pool; once ``workers + queue_limit``
+calls are outstanding new ones are rejected with a 503 straight away rather
+than joining an ever-growing backlog.
+"""
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+from fastapi import HTTPException, status
+
+from .config import settings
+from .metrics import Counter, Gauge, Histogram
+
+HASH_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0, 5.0)
+
+in_flight_gauge = Gauge("vegprotein_hash_in_flight", "Hashing calls currently running or queued")
+queue_depth_gauge = Gauge("vegprotein_hash_queue_depth", "Hashing calls waiting for a free worker")
+rejected_counter = Counter("vegprotein_hash_rejected_total", "Hashing calls rejected because the pool was full")
+hash_seconds = Histogram("vegprotein_hash_seconds", "Time spent hashing inside a worker", HASH_BUCKETS)
+wait_seconds = Histogram("vegprotein_hash_wait_seconds", "End-to-end hashing latency including queueing", HASH_BUCKETS)
+
+
+class HashingPoolFull(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many authentication requests, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+
+
+def _timed_call(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+class HashingPool:
+    def __init__(self, workers: int, queue_limit: int, kind: str = "thread"):
+        self.workers = max(1, workers)
+        self.queue_limit = max(0, queue_limit)
+        self.kind = kind
+        self.pending = 0
+        self._executor: Optional[Executor] = None
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.queue_limit
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="hashing")
+        return self._executor
+
+    async def run(self, fn, *args):
+        """Run ``fn(*args)`` on the pool; ``fn`` must be picklable for process pools."""
+        if self.pending >= self.capacity:
+            rejected_counter.inc()
+            raise HashingPoolFull()
+
+        self._track(+1)
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            result, elapsed = await loop.run_in_executor(self._get_executor(), _timed_call, fn, *args)
+            hash_seconds.observe(elapsed)
+            return result
+        finally:
+            wait_seconds.observe(time.perf_counter() - started)
+            self._track(-1)
+
+    def _track(self, delta: int) -> None:
+        self.pending += delta
+        in_flight_gauge.set(self.pending)
+        queue_depth_gauge.set(max(self.pending - self.workers, 0))
+
+    def stats(self) -> dict:
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "in_flight": self.pending,
+            "queue_depth": max(self.pending - self.workers, 0),
+            "rejected_total": rejected_counter.value,
+            "hash_seconds": hash_seconds.snapshot(),
+            "wait_seconds": wait_seconds.snapshot(),
+        }
+
+    async def warm_up(self) -> None:
+        """Start the workers now instead of on the first login (processes take a while to spawn)."""
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        await asyncio.gather(*(loop.run_in_executor(executor, int) for _ in range(self.workers)))
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+hashing_pool = HashingPool(
+    workers=settings.HASH_POOL_WORKERS,
+    queue_limit=settings.HASH_POOL_QUEUE_LIMIT,
+    kind=settings.HASH_POOL_KIND,
+)
@@ -0,0 +1,306 @@
+"""Bulk price feed import.
+
+Store price sheets arrive as CSV or JSON Lines files that can run to
+gigabytes, one price per line::
+
+    store,store_address,latitude,longitude,food,protein_per_100g,category,is_vegan,price,unit
+    Whole Foods Market,"1765 California St, San Francisco",37.7904,-122.4237,Tofu (Firm),17.3,Soy,true,2.99,per lb
+
+Only ``store``, ``food`` and ``price`` are required. Lines are parsed one at
+a time and written in batches, so memory stays flat however long the feed
+is. Food and store names resolve to ids through maps loaded once up front
+(names compare case- and whitespace-insensitively; stores by name and
+address, or by name alone when it is unambiguous). Each batch is upserted on
+``(food_id, store_id)`` and committed, along with the catalog version bump
+for any foods or stores it created: through a COPY into a temporary
+staging table on PostgreSQL with psycopg2, and a multi-row ``executemany``
+upsert elsewhere.
+"""
+import csv
+import gzip
+import io
+import json
+import math
+import time
+from dataclasses import dataclass, field
+from typing import BinaryIO, Dict, Iterator, List, Optional, TextIO, Tuple
+
+from sqlalchemy import func, select, text, update
+from sqlalchemy.orm import Session
+
+from .catalog import bump_catalog_version_sync
+from .config import settings
+from .database import ON_CONFLICT_INSERTS
+from .models import Food, FoodPrice, Store
+from .pricing import DEFAULT_UNIT
+
+FORMATS = ("csv", "jsonl")
+
+# Rejected lines beyond this many are counted but not kept
+MAX_REJECTION_SAMPLES = 100
+
+STAGING_TABLE = "food_price_feed"
+
+# Stores sharing a name with no address to tell them apart
+AMBIGUOUS = -1
+
+
+class RejectedLine(ValueError):
+    pass
+
+
+@dataclass
+class ImportReport:
+    read: int = 0
+    upserted: int = 0
+    rejected: int = 0
+    created_foods: int = 0
+    created_stores: int = 0
+    elapsed_seconds: float = 0.0
+    rows_per_second: float = 0.0
+    rejections: List[Tuple[int, str]] = field(default_factory=list)
+
+    def reject(self, line: int, reason: str) -> None:
+        self.rejected += 1
+        if len(self.rejections) < MAX_REJECTION_SAMPLES:
+            self.rejections.append((line, reason))
+
+
+def name_key(name: str) -> str:
+    return " ".join(name.split()).casefold()
+
+
+def feed_format(filename: str) -> str:
+    """Guess the format from a file name: JSON Lines for .jsonl/.ndjson, else CSV."""
+    name = filename.lower()
+    if name.endswith(".gz"):
+        name = name[:-3]
+    return "jsonl" if name.endswith((".jsonl", ".ndjson")) else "csv"
+
+
+def open_feed(raw: BinaryIO, filename: str = "") -> TextIO:
+    """Text stream over a binary feed, decompressing ``.gz`` files on the fly."""
+    if filename.lower().endswith(".gz"):
+        raw = gzip.GzipFile(fileobj=raw, mode="rb")
+    return io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+
+
+def iter_records(stream: TextIO, fmt: str) -> Iterator[Tuple[int, Optional[dict]]]:
+    """``(line number, record)`` pairs; the record is None when the line does not parse."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+        return
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield line_number, record if isinstance(record, dict) else None
+
+
+def _text(record: dict, name: str) -> Optional[str]:
+    value = record.get(name)
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _number(record: dict, name: str) -> Optional[float]:
+    value = record.get(name)
+    if value is None or value == "":
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise RejectedLine(f"{name} is not a number")
+    if not math.isfinite(number):
+        raise RejectedLine(f"{name} is not a number")
+    return number
+
+
+def _flag(record: dict, name: str, default: bool) -> bool:
+    value = record.get(name)
+    if value is None or value == "":
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "yes", "y", "t")
+
+
+class NameMaps:
+    """Food and store ids by normalized name, loaded once per import."""
+
+    def __init__(self, db: Session):
+        self.foods: Dict[str, int] = {}
+        for food_id, name in db.execute(select(Food.id, Food.name).order_by(Food.id)):
+            self.foods.setdefault(name_key(name), food_id)
+        self.stores: Dict[Tuple[str, str], int] = {}
+        self.store_names: Dict[str, int] = {}
+        for store_id, name, address in db.execute(select(Store.id, Store.name, Store.address).order_by(Store.id)):
+            self.add_store(store_id, name_key(name), name_key(address or ""))
+
+    def add_store(self, store_id: int, name: str, address: str) -> None:
+        self.stores.setdefault((name, address), store_id)
+        self.store_names[name] = AMBIGUOUS if name in self.store_names else store_id
+
+    def store_id(self, name: str, address: str) -> Optional[int]:
+        if address:
+            return self.stores.get((name, address))
+        store_id = self.store_names.get(name)
+        if store_id == AMBIGUOUS:
+            raise RejectedLine("store name matches several stores; add store_address")
+        return store_id
+
+
+def _resolve(db: Session, maps: NameMaps, record: dict, create_missing: bool, report: ImportReport) -> dict:
+    """Turn one feed record into a food_prices row, creating its food or store if allowed."""
+    food_name, store_name = _text(record, "food"), _text(record, "store")
+    if food_name is None or store_name is None:
+        raise RejectedLine("food and store are required")
+    price = _number(record, "price")
+    if price is None or price <= 0:
+        raise RejectedLine("price must be a positive number")
+    unit = _text(record, "unit") or DEFAULT_UNIT
+
+    food_key = name_key(food_name)
+    food_id = maps.foods.get(food_key)
+    if food_id is None:
+        protein = _number(record, "protein_per_100g")
+        if not create_missing or protein is None or protein < 0:
+            raise RejectedLine(f"unknown food {food_name!r}")
+        food_id = db.scalar(Food.__table__.insert().values(
+            name=food_name,
+            protein_per_100g=protein,
+            category=_text(record, "category"),
+            is_vegan=_flag(record, "is_vegan", True),
+        ).returning(Food.__table__.c.id))
+        maps.foods[food_key] = food_id
+        report.created_foods += 1
+
+    store_key, address = name_key(store_name), _text(record, "store_address")
+    store_id = maps.store_id(store_key, name_key(address or ""))
+    if store_id is None:
+        if not create_missing:
+            raise RejectedLine(f"unknown store {store_name!r}")
+        latitude, longitude = _number(record, "latitude"), _number(record, "longitude")
+        if (latitude is not None and not -90 <= latitude <= 90) or (longitude is not None and not -180 <= longitude <= 180):
+            raise RejectedLine("latitude or longitude out of range")
+        store_id = db.scalar(Store.__table__.insert().values(
+            name=store_name, address=address, latitude=latitude, longitude=longitude,
+        ).returning(Store.__table__.c.id))
+        maps.add_store(store_id, store_key, name_key(address or ""))
+        report.created_stores += 1
+
+    return {"food_id": food_id, "store_id": store_id, "price": price, "unit": unit}
+
+
+def _copy_upsert(db: Session, rows: List[dict]) -> None:
+    """PostgreSQL: COPY the batch into a temp table, then upsert from it in one statement."""
+    db.execute(text(
+        f"CREATE TEMPORARY TABLE IF NOT EXISTS {STAGING_TABLE} "
+        "(food_id integer, store_id integer, price double precision, unit text) ON COMMIT DELETE ROWS"
+    ))
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow((row["food_id"], row["store_id"], repr(row["price"]), row["unit"]))
+    buffer.seek(0)
+    cursor = db.connection().connection.dbapi_connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {STAGING_TABLE} (food_id, store_id, price, unit) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+    db.execute(text(
+        f"INSERT INTO food_prices (food_id, store_id, price, unit, updated_at) "
+        f"SELECT food_id, store_id, price, unit, now() FROM {STAGING_TABLE} "
+        "ON CONFLICT (food_id, store_id) DO UPDATE "
+        "SET price = excluded.price, unit = excluded.unit, updated_at = excluded.updated_at"
+    ))
+
+
+def _executemany_upsert(db: Session, rows: List[dict]) -> None:
+    table = FoodPrice.__table__
+    insert = ON_CONFLICT_INSERTS.get(db.bind.dialect.name)
+    if insert is None:
+        # No ON CONFLICT: update in place, insert what matched nothing
+        for row in rows:
+            matched = db.execute(update(table).where(
+                table.c.food_id == row["food_id"], table.c.store_id == row["store_id"]
+            ).values(price=row["price"], unit=row["unit"], updated_at=func.now())).rowcount
+            if not matched:
+                db.execute(table.insert().values(**row))
+        return
+    stmt = insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.food_id, table.c.store_id],
+        set_={"price": stmt.excluded.price, "unit": stmt.excluded.unit, "updated_at": func.now()},
+    )
+    db.execute(stmt, rows)
+
+
+def _uses_copy(db: Session) -> bool:
+    dialect = db.bind.dialect
+    return dialect.name == "postgresql" and dialect.driver == "psycopg2"
+
+
+def import_prices(
+    db: Session,
+    stream: TextIO,
+    fmt: str = "csv",
+    batch_size: int = settings.PRICE_IMPORT_BATCH_SIZE,
+    create_missing: bool = False,
+) -> ImportReport:
+    """Stream ``stream`` into food_prices, committing every ``batch_size`` rows.
+
+    Unknown foods and stores are rejected unless ``create_missing`` is set
+    (new foods also need ``protein_per_100g``). Within a batch the last price
+    for a food at a store wins.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(FORMATS)}")
+    started = time.perf_counter()
+    report = ImportReport()
+    maps = NameMaps(db)
+    upsert = _copy_upsert if _uses_copy(db) else _executemany_upsert
+
+    batch: Dict[Tuple[int, int], dict] = {}
+    # Foods and stores created by the batches committed so far
+    committed = {"foods": 0, "stores": 0}
+
+    def flush() -> None:
+        if batch:
+            upsert(db, list(batch.values()))
+            report.upserted += len(batch)
+            batch.clear()
+        # New foods and stores go out with their batch, so their catalog is
+        # bumped in the same transaction and readers never miss them
+        for name, created in (("foods", report.created_foods), ("stores", report.created_stores)):
+            if created > committed[name]:
+                bump_catalog_version_sync(db, name)
+                committed[name] = created
+        db.commit()
+
+    for line_number, record in iter_records(stream, fmt):
+        report.read += 1
+        if record is None:
+            report.reject(line_number, "line is not a valid record")
+            continue
+        try:
+            row = _resolve(db, maps, record, create_missing, report)
+        except RejectedLine as exc:
+            report.reject(line_number, str(exc))
+            continue
+        batch[row["food_id"], row["store_id"]] = row
+        if len(batch) >= batch_size:
+            flush()
+
+    flush()
+
+    report.elapsed_seconds = round(time.perf_counter() - started, 3)
+    report.rows_per_second = round(report.read / report.elapsed_seconds, 1) if report.elapsed_seconds else 0.0
+    return report
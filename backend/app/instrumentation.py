@@ -0,0 +1,221 @@
+"""Per-request performance instrumentation.
+
+``InstrumentationMiddleware`` starts a ``RequestStats`` for every HTTP request
+and keeps it in a context variable. SQLAlchemy cursor events add each
+statement's duration to it, on whichever engine or thread it runs (threadpool
+calls and SQLAlchemy's async greenlets carry the context along), and the
+wrapper ``instrument_routes`` puts around each endpoint notes when it
+returned. When the response starts the middleware has:
+
+* ``app``: wall time from the request arriving to the response starting;
+* ``db``: time inside database calls, and how many statements ran, so N+1
+  loops stand out as a route whose query count grows with its data;
+* ``serialize``: time from the endpoint returning to the response starting,
+  i.e. response model validation, JSON encoding and session cleanup.
+
+These go to per-route Prometheus histograms (``/metrics``) and, unless
+``SERVER_TIMING`` is off, a ``Server-Timing`` header that browser dev tools
+show next to the request. Statements slower than ``SLOW_QUERY_MS`` are logged
+to the ``vegprotein.sql`` logger whether or not they run inside a request.
+"""
+import asyncio
+import logging
+import time
+from contextvars import ContextVar
+from functools import wraps
+from typing import Optional
+
+from fastapi import FastAPI
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import settings
+from .metrics import Counter, Histogram, Labeled
+
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+# Longest statement text written to the slow query log
+SLOW_QUERY_LOG_CHARS = 1000
+
+# Route label for requests that matched no route (404s)
+UNMATCHED = "unmatched"
+
+requests_total = Labeled(
+    Counter, "vegprotein_http_requests_total", "HTTP requests by route and status", ("method", "route", "status")
+)
+request_seconds = Labeled(
+    Histogram, "vegprotein_http_request_seconds", "Time from request to response start", ("method", "route")
+)
+request_db_seconds = Labeled(
+    Histogram, "vegprotein_http_db_seconds", "Time spent in database calls per request", ("method", "route")
+)
+request_db_queries = Labeled(
+    Histogram, "vegprotein_http_db_queries", "Database statements per request", ("method", "route"),
+    buckets=QUERY_COUNT_BUCKETS,
+)
+request_serialize_seconds = Labeled(
+    Histogram, "vegprotein_http_serialize_seconds", "Time from the endpoint returning to response start",
+    ("method", "route"),
+)
+slow_queries = Counter("vegprotein_db_slow_queries_total", "Statements slower than SLOW_QUERY_MS")
+
+logger = logging.getLogger("vegprotein.sql")
+
+
+class RequestStats:
+    __slots__ = ("path", "started", "db_seconds", "queries", "endpoint_done")
+
+    def __init__(self, path: str):
+        self.path = path
+        self.started = time.perf_counter()
+        self.db_seconds = 0.0
+        self.queries = 0
+        self.endpoint_done: Optional[float] = None
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("vegprotein_request_stats", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    stats = _current.get()
+    if stats is not None:
+        stats.db_seconds += elapsed
+        stats.queries += 1
+    if elapsed * 1000 >= settings.SLOW_QUERY_MS:
+        slow_queries.inc()
+        # Statement text only: parameters may hold personal data
+        logger.warning(
+            "slow query: %.1f ms%s: %s",
+            elapsed * 1000,
+            f" ({stats.path})" if stats is not None else "",
+            " ".join(statement.split())[:SLOW_QUERY_LOG_CHARS],
+        )
+
+
+def _handle_error(exception_context) -> None:
+    # after_cursor_execute does not run for a failed statement
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_started"):
+        connection.info["query_started"].pop()
+
+
+def track_queries(engine: Engine) -> None:
+    """Time every statement ``engine`` runs (pass ``async_engine.sync_engine`` for async engines)."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+def _endpoint_done() -> None:
+    stats = _current.get()
+    if stats is not None:
+        stats.endpoint_done = time.perf_counter()
+
+
+def _timed_endpoint(call):
+    # FastAPI decided at startup whether to await the endpoint or run it in
+    # the threadpool, so the wrapper must be the same kind of function
+    if asyncio.iscoroutinefunction(call):
+        @wraps(call)
+        async def endpoint(**values):
+            try:
+                return await call(**values)
+            finally:
+                _endpoint_done()
+    else:
+        @wraps(call)
+        def endpoint(**values):
+            try:
+                return call(**values)
+            finally:
+                _endpoint_done()
+    endpoint.timed = True
+    return endpoint
+
+
+def instrument_routes(app: FastAPI) -> None:
+    """Record when each endpoint returns; call once all routers are included."""
+    for route in app.routes:
+        if isinstance(route, APIRoute) and not getattr(route.dependant.call, "timed", False):
+            route.dependant.call = _timed_endpoint(route.dependant.call)
+
+
+def route_label(scope: Scope) -> str:
+    """The matched route's path template, e.g. ``/api/foods/{food_id}``.
+
+    Requests answered before routing (ETag 304s) are matched here instead.
+    """
+    route = scope.get("route")
+    if route is None:
+        router = getattr(scope.get("app"), "router", None)
+        for candidate in getattr(router, "routes", ()):
+            match, _ = candidate.matches(scope)
+            if match == Match.FULL:
+                route = candidate
+                break
+    return getattr(route, "path", None) or UNMATCHED
+
+
+def _ms(seconds: float) -> str:
+    return f"{seconds * 1000:.1f}"
+
+
+def server_timing(stats: RequestStats, now: float, serialize: Optional[float]) -> str:
+    parts = [
+        f"app;dur={_ms(now - stats.started)}",
+        f'db;dur={_ms(stats.db_seconds)};desc="{stats.queries} {"query" if stats.queries == 1 else "queries"}"',
+    ]
+    if serialize is not None:
+        parts.append(f"serialize;dur={_ms(serialize)}")
+    return ", ".join(parts)
+
+
+class InstrumentationMiddleware:
+    """Time every HTTP request and record it per route; add it outermost."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope["path"])
+        token = _current.set(stats)
+        status = 500
+        responded: Optional[float] = None
+        serialize: Optional[float] = None
+
+        async def send_timed(message: Message) -> None:
+            nonlocal status, responded, serialize
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                responded = time.perf_counter()
+                if stats.endpoint_done is not None:
+                    serialize = responded - stats.endpoint_done
+                if settings.SERVER_TIMING:
+                    header = (b"server-timing", server_timing(stats, responded, serialize).encode())
+                    message = dict(message, headers=list(message.get("headers", [])) + [header])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_timed)
+        finally:
+            _current.reset(token)
+            ended = responded if responded is not None else time.perf_counter()
+            method, route = scope["method"], route_label(scope)
+            requests_total.labels(method, route, status).inc()
+            request_seconds.labels(method, route).observe(ended - stats.started)
+            request_db_seconds.labels(method, route).observe(stats.db_seconds)
+            request_db_queries.labels(method, route).observe(stats.queries)
+            if serialize is not None:
+                request_serialize_seconds.labels(method, route).observe(serialize)
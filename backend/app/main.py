@@ -1,12 +1,38 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
+from .catalog import warm_catalogs
 from .config import settings
-from .database import engine, Base
-from .routers import auth, users, protein_logs, foods, stores
+from .database import dispose_engines, pool_stats, warm_pools
+from .etags import ConditionalGetMiddleware
+from .events import day_events
+from .hashing import hashing_pool
+from .instrumentation import InstrumentationMiddleware, instrument_routes
+from .metrics import render_text
+from .ratelimit import RateLimitMiddleware, load_monitor, rate_limiter
+from .responses import APIJSONResponse
+from .routers import admin, auth, dashboard, users, protein_logs, foods, stores
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The schema is managed by Alembic (``alembic upgrade head`` before starting)
+    if settings.STARTUP_WARMUP:
+        await warm_pools()
+        await hashing_pool.warm_up()
+        await warm_catalogs()
+    load_monitor.start()
+    day_events.start()
+    yield
+    await day_events.stop()
+    await load_monitor.stop()
+    rate_limiter.buckets.close()
+    hashing_pool.shutdown()
+    await dispose_engines()
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -15,8 +41,17 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    default_response_class=APIJSONResponse,
+    lifespan=lifespan,
 )
 
+# ETags and 304s for versioned reads; added first so CORS wraps the 304s too
+app.add_middleware(ConditionalGetMiddleware)
+
+# Load shedding and rate limits, before the ETag lookups; inside CORS so
+# browsers can read the 429s and 503s
+app.add_middleware(RateLimitMiddleware)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -24,15 +59,21 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Server-Timing", "Retry-After"],
 )
 
+# Per-route timings, query counts and Server-Timing; outermost so it sees everything
+app.add_middleware(InstrumentationMiddleware)
+
 
 # Include routers
 app.include_router(auth.router, prefix="/api")
 app.include_router(users.router, prefix="/api")
 app.include_router(protein_logs.router, prefix="/api")
+app.include_router(dashboard.router, prefix="/api")
 app.include_router(foods.router, prefix="/api")
 app.include_router(stores.router, prefix="/api")
+app.include_router(admin.router, prefix="/api")
 
 
 @app.get("/")
@@ -47,3 +88,24 @@ async def root():
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
+
+
+@app.get("/health/hashing")
+async def hashing_stats():
+    """Password hashing pool: queue depth, rejections and latency."""
+    return hashing_pool.stats()
+
+
+@app.get("/health/pool")
+async def database_pool_stats():
+    """Database connection pools: connections in use, overflow and checkout wait times."""
+    return pool_stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """All metrics in the Prometheus text format."""
+    return PlainTextResponse(render_text(), media_type="text/plain; version=0.0.4")
+
+
+instrument_routes(app)
@@ -0,0 +1,168 @@
+"""Minimal in-process metrics: counters, gauges and histograms.
+
+Metrics are module-level objects updated from the event loop; ``snapshot()``
+returns a JSON-friendly view of everything registered and ``render_text()``
+the Prometheus text exposition format. ``Labeled`` keeps one child metric per
+combination of label values.
+"""
+from typing import Callable, Dict, List, Sequence, Tuple
+
+REGISTRY: List["Metric"] = []
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, register: bool = True):
+        self.name = name
+        self.documentation = documentation
+        if register:
+            REGISTRY.append(self)
+
+    def snapshot(self):
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, register: bool = True):
+        super().__init__(name, documentation, register)
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def snapshot(self):
+        return self.value
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, register: bool = True):
+        super().__init__(name, documentation, register)
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def snapshot(self):
+        return self.value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, buckets: Sequence[float] = DEFAULT_BUCKETS, register: bool = True
+    ):
+        super().__init__(name, documentation, register)
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def cumulative_counts(self) -> List[int]:
+        total, result = 0, []
+        for count in self.counts:
+            total += count
+            result.append(total)
+        return result
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "avg": round(self.sum / self.count, 6) if self.count else 0.0,
+            "buckets": {str(b): c for b, c in zip(self.buckets, self.cumulative_counts())},
+        }
+
+
+class Labeled(Metric):
+    """A family of ``metric_class`` metrics, one per combination of label values.
+
+    Keep label values to a small fixed set (route templates, not raw paths):
+    every new combination is kept for the life of the process.
+    """
+
+    def __init__(self, metric_class: type, name: str, documentation: str, labelnames: Sequence[str], **options):
+        super().__init__(name, documentation)
+        self.kind = metric_class.kind
+        self.labelnames = tuple(labelnames)
+        self.children: Dict[Tuple[str, ...], Metric] = {}
+        self._new_child: Callable[[], Metric] = lambda: metric_class(name, documentation, register=False, **options)
+
+    def labels(self, *values) -> Metric:
+        key = tuple(str(value) for value in values)
+        child = self.children.get(key)
+        if child is None:
+            child = self.children.setdefault(key, self._new_child())
+        return child
+
+    def snapshot(self):
+        return {",".join(key): child.snapshot() for key, child in sorted(self.children.items())}
+
+
+def snapshot(prefix: str = "") -> Dict[str, object]:
+    return {m.name: m.snapshot() for m in REGISTRY if m.name.startswith(prefix)}
+
+
+def _label_text(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        value = value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _number(value: float) -> str:
+    value = float(value)
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _samples(metric: Metric, names: Tuple[str, ...], values: Tuple[str, ...]) -> List[str]:
+    if not isinstance(metric, Histogram):
+        return [f"{metric.name}{_label_text(names, values)} {_number(metric.value)}"]
+    lines = []
+    for bound, count in zip(metric.buckets + (float("inf"),), metric.cumulative_counts() + [metric.count]):
+        labels = _label_text(names + ("le",), values + (_number(bound),))
+        lines.append(f"{metric.name}_bucket{labels} {count}")
+    labels = _label_text(names, values)
+    lines.append(f"{metric.name}_sum{labels} {_number(metric.sum)}")
+    lines.append(f"{metric.name}_count{labels} {metric.count}")
+    return lines
+
+
+def render_text() -> str:
+    """Every registered metric in the Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        if isinstance(metric, Labeled):
+            for key, child in sorted(metric.children.items()):
+                lines.extend(_samples(child, metric.labelnames, key))
+        else:
+            lines.extend(_samples(metric, (), ()))
+    return "\n".join(lines) + "\n"
@@ -1,4 +1,6 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Boolean, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
@@ -13,9 +15,11 @@ class User(Base):
     full_name = Column(String, nullable=True)
     location = Column(String, nullable=True)
     protein_goal = Column(Integer, default=120)
+    timezone = Column(String, nullable=False, default="UTC", server_default="UTC")
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Set client-side at full precision; workers poll it to drop cached profiles
+    updated_at = Column(DateTime(timezone=True), onupdate=lambda: datetime.now(timezone.utc), index=True)
 
     # Relationships
     protein_logs = relationship("ProteinLog", back_populates="user")
@@ -28,11 +32,52 @@ class ProteinLog(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     food_name = Column(String, nullable=False)
     protein_amount = Column(Float, nullable=False)
-    logged_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Set client-side too: SQLite's CURRENT_TIMESTAMP drops the microseconds,
+    # and the short text sorts wrong against bound datetimes
+    logged_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), server_default=func.now())
+    # Client-chosen idempotency key for batch sync; unique per user
+    client_key = Column(String(64), nullable=True)
 
     # Relationships
     user = relationship("User", back_populates="protein_logs")
 
+    __table_args__ = (
+        # Serves every per-user time-range filter and the newest-first
+        # keyset pagination over (logged_at, id)
+        Index("ix_protein_logs_user_id_logged_at", "user_id", logged_at.desc(), id.desc()),
+        Index("uq_protein_logs_user_id_client_key", "user_id", client_key, unique=True),
+    )
+
+
+class RefreshToken(Base):
+    """One refresh token of a login session; only its SHA-256 is stored."""
+    __tablename__ = "refresh_tokens"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    # Shared by every token the session's rotations produce; access tokens carry it as "sid"
+    session_id = Column(String(32), nullable=False, index=True)
+    token_hash = Column(String(64), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    # Set when the token is exchanged; presenting it again revokes the session
+    used_at = Column(DateTime(timezone=True), nullable=True)
+    revoked_at = Column(DateTime(timezone=True), nullable=True, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("uq_refresh_tokens_token_hash", "token_hash", unique=True),
+    )
+
+
+class DailyProteinTotal(Base):
+    """Per-user, per-day rollup of protein_logs, maintained on every write."""
+    __tablename__ = "daily_protein_totals"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    total = Column(Float, nullable=False, default=0.0)
+    count = Column(Integer, nullable=False, default=0)
+
 
 class Food(Base):
     __tablename__ = "foods"
@@ -45,6 +90,11 @@ class Food(Base):
     image_url = Column(String, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (
+        # Catalog order and keyset pagination: highest protein first
+        Index("ix_foods_protein_per_100g_id", protein_per_100g.desc(), id.desc()),
+    )
+
 
 class Store(Base):
     __tablename__ = "stores"
@@ -61,7 +111,34 @@ class FoodPrice(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     food_id = Column(Integer, ForeignKey("foods.id"), nullable=False)
-    store_id = Column(Integer, ForeignKey("stores.id"), nullable=False)
+    store_id = Column(Integer, ForeignKey("stores.id"), nullable=False, index=True)
     price = Column(Float, nullable=False)
     unit = Column(String, default="per lb")
     updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # One current price per food per store; the importer upserts on it
+        Index("uq_food_prices_food_id_store_id", "food_id", "store_id", unique=True),
+    )
+
+
+class LogVersion(Base):
+    """Change counter of a user's protein logs ("log_version"); bumped by every
+    log write, feeds their ETags and live streams.
+
+    Kept out of ``users`` so logging never updates or locks the users row. A
+    user without a row has never logged (version 0).
+    """
+    __tablename__ = "log_versions"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+class CatalogVersion(Base):
+    """Change counter for a cached catalog ("foods", ...); bumped on every write."""
+    __tablename__ = "catalog_versions"
+
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,42 @@
+"""Opaque keyset cursors.
+
+A cursor is the sort key of the last row on a page, JSON-encoded and
+base64url'd. The next page starts strictly after that key, so each page is an
+index range scan no matter how deep into the history it is.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, status
+
+
+def encode_cursor(*values: Any) -> str:
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, *types: Callable[[Any], Any]) -> Tuple[Any, ...]:
+    """Decode ``cursor`` and coerce each value with the matching ``types`` entry."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError("wrong cursor arity")
+        return tuple(kind(value) for kind, value in zip(types, values))
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def paginate(rows: Sequence, limit: int, key: Callable[[Any], Tuple]) -> dict:
+    """Page body from ``limit + 1`` fetched rows; the extra row signals more."""
+    items = list(rows[:limit])
+    next_cursor: Optional[str] = None
+    if len(rows) > limit and items:
+        next_cursor = encode_cursor(*key(items[-1]))
+    return {"items": items, "next_cursor": next_cursor}
@@ -0,0 +1,73 @@
+"""Protein-per-dollar ranking over food_prices.
+
+Prices are quoted per ``unit`` ("per lb", "per 100g", ...). ``UNIT_GRAMS``
+maps the spellings we accept to grams, and the conversion runs inside the
+query as a ``CASE``, so ranking any set of prices is one ordered SELECT
+joined to foods and stores. Prices with an unknown unit get a NULL
+``protein_per_dollar`` and sort last.
+"""
+from typing import Iterable, Optional
+
+from sqlalchemy import Select, bindparam, case, func, literal, select
+
+from .models import Food, FoodPrice, Store
+
+GRAMS_PER_LB = 453.592
+GRAMS_PER_OZ = 28.3495
+
+UNIT_GRAMS = {
+    "per lb": GRAMS_PER_LB, "lb": GRAMS_PER_LB, "per pound": GRAMS_PER_LB, "/lb": GRAMS_PER_LB,
+    "per oz": GRAMS_PER_OZ, "oz": GRAMS_PER_OZ, "per ounce": GRAMS_PER_OZ, "/oz": GRAMS_PER_OZ,
+    "per kg": 1000.0, "kg": 1000.0, "/kg": 1000.0,
+    "per 100g": 100.0, "per 100 g": 100.0, "100g": 100.0, "/100g": 100.0,
+    "per g": 1.0, "g": 1.0, "/g": 1.0,
+}
+
+DEFAULT_UNIT = "per lb"
+
+
+def unit_grams():
+    """SQL expression: grams in one priced unit, NULL when the unit is unknown."""
+    unit = func.lower(func.trim(func.coalesce(FoodPrice.unit, DEFAULT_UNIT)))
+    return case(UNIT_GRAMS, value=unit, else_=None)
+
+
+def protein_per_dollar():
+    """SQL expression: grams of protein one dollar buys."""
+    return (Food.protein_per_100g * unit_grams() / (FoodPrice.price * literal(100.0))).label("protein_per_dollar")
+
+
+def ranked_prices(
+    store_ids: Optional[Iterable[int]] = None,
+    food_id: Optional[int] = None,
+    vegan_only: bool = False,
+    known_units_only: bool = False,
+) -> Select:
+    """Price rows, best protein per dollar first, optionally narrowed to stores or a food."""
+    ppd = protein_per_dollar()
+    query = (
+        select(
+            FoodPrice.store_id,
+            Store.name.label("store_name"),
+            FoodPrice.food_id,
+            Food.name.label("food_name"),
+            FoodPrice.price,
+            func.coalesce(FoodPrice.unit, DEFAULT_UNIT).label("unit"),
+            ppd,
+        )
+        .join(Food, Food.id == FoodPrice.food_id)
+        .join(Store, Store.id == FoodPrice.store_id)
+        .where(FoodPrice.price > 0)
+        .order_by(ppd.desc().nulls_last(), FoodPrice.id)
+    )
+    if store_ids is not None:
+        # Inlined: every store in a large radius can exceed a driver's bind-parameter limit
+        ids = bindparam("store_ids", list(store_ids), expanding=True, literal_execute=True)
+        query = query.where(FoodPrice.store_id.in_(ids))
+    if food_id is not None:
+        query = query.where(FoodPrice.food_id == food_id)
+    if vegan_only:
+        query = query.where(Food.is_vegan == True)
+    if known_units_only:
+        query = query.where(unit_grams().isnot(None))
+    return query
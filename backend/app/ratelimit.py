@@ -0,0 +1,397 @@
+"""Per-user and per-IP rate limits, and load shedding.
+
+``RateLimitMiddleware`` runs before routing, so a rejected request costs no
+database query and no password hash. First the worker sheds load: while
+``SHED_MAX_IN_FLIGHT`` requests are already in progress, or the event loop is
+running more than ``SHED_LOOP_LAG_MS`` behind, new requests get an immediate
+503 rather than queueing behind the ones it cannot keep up with.
+
+Then each request takes a token from up to three token buckets, most specific
+first, and gets a 429 with ``Retry-After`` from the first that is empty:
+
+* the budget in ``RATE_LIMIT_ROUTES`` for its route, per user when it carries
+  a valid access token and per client IP otherwise (login, register);
+* its user's bucket (``RATE_LIMIT_PER_USER``), keyed by the token's subject;
+* its client IP's bucket (``RATE_LIMIT_PER_IP``).
+
+A budget of ``N/minute`` allows bursts of N and refills at N per minute.
+``/health`` and ``/metrics`` are never limited.
+
+Buckets live in worker memory unless ``RATE_LIMIT_STORAGE`` names a
+``sqlite:///`` file: the workers on a host then share their buckets, each take
+being one upsert on that local file, standing in for a networked store. The
+file is only shared by processes on one host. Its takes are blocking calls,
+so they run on a thread of their own and never stall the event loop (whose
+lag the shedder measures).
+"""
+import asyncio
+import json
+import math
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from typing import Dict, List, NamedTuple, Optional, Pattern, Tuple
+
+from starlette.datastructures import Headers
+from starlette.routing import compile_path
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from .auth import decode_access_token
+from .config import settings
+from .metrics import Counter, Gauge, Labeled
+
+PERIODS = {"second": 1.0, "minute": 60.0, "hour": 3600.0}
+
+# Event loop lag is sampled by a task sleeping this long in a loop
+LAG_SAMPLE_SECONDS = 0.05
+
+# Seconds a shared-bucket take waits for the SQLite write lock before letting
+# the request through
+SHARED_LOCK_TIMEOUT = 0.05
+
+# Every this many takes a worker deletes the shared buckets idle for longer
+# than the longest period, which are full again
+SHARED_PRUNE_EVERY = 10_000
+
+SHED_RETRY_AFTER = 1
+
+# Long-lived responses (server-sent events) are not counted as in flight:
+# thousands of idle streams would otherwise shed every other request
+STREAMING_PATHS = frozenset({"/api/protein-logs/today/stream"})
+
+rate_limited = Labeled(
+    Counter, "vegprotein_rate_limited_total", "Requests answered 429, by the budget that ran out", ("limit",)
+)
+load_shed = Labeled(Counter, "vegprotein_load_shed_total", "Requests answered 503 while overloaded", ("reason",))
+storage_errors = Counter("vegprotein_rate_limit_storage_errors_total", "Bucket takes that failed and were let through")
+in_flight_gauge = Gauge("vegprotein_http_in_flight", "Requests in progress in this worker")
+loop_lag_gauge = Gauge("vegprotein_event_loop_lag_seconds", "How late the event loop last ran a timer")
+
+
+class Rate(NamedTuple):
+    capacity: float
+    per_second: float
+
+
+def parse_rate(value: str) -> Optional[Rate]:
+    """``"N/second"``, ``"N/minute"`` or ``"N/hour"``; None for an empty or zero budget."""
+    value = value.strip()
+    if not value:
+        return None
+    count, _, period = value.partition("/")
+    try:
+        count, seconds = float(count), PERIODS[period.strip().lower().rstrip("s")]
+    except (KeyError, ValueError):
+        raise ValueError(f"Invalid rate {value!r}, expected e.g. '60/minute'")
+    return Rate(count, count / seconds) if count > 0 else None
+
+
+class RouteBudget(NamedTuple):
+    label: str
+    method: str
+    pattern: Pattern
+    rate: Rate
+
+
+def parse_route_budgets(value: str) -> List[RouteBudget]:
+    """``"POST /api/auth/login=10/minute; GET /api/foods/{food_id}=120/minute"``."""
+    budgets = []
+    for item in value.split(";"):
+        if not item.strip():
+            continue
+        route, _, rate = item.rpartition("=")
+        method, _, path = route.strip().partition(" ")
+        if not method or not path.strip():
+            raise ValueError(f"Invalid route budget {item.strip()!r}, expected 'METHOD /path=N/period'")
+        parsed = parse_rate(rate)
+        if parsed is not None:
+            path = path.strip()
+            budgets.append(RouteBudget(f"{method.upper()} {path}", method.upper(), compile_path(path)[0], parsed))
+    return budgets
+
+
+class MemoryBuckets:
+    """Buckets of one worker process."""
+
+    # Takes are cheap enough to run on the event loop
+    blocking = False
+
+    def __init__(self):
+        # key -> (tokens, updated, time at which the bucket is full again)
+        self._buckets: Dict[str, Tuple[float, float, float]] = {}
+        self._prune_at = 1024
+
+    def take(self, key: str, rate: Rate, now: float) -> float:
+        """Take a token: 0 if there was one, else seconds until there will be."""
+        tokens, updated, _ = self._buckets.get(key, (rate.capacity, now, now))
+        tokens = min(rate.capacity, tokens + max(0.0, now - updated) * rate.per_second)
+        granted = tokens >= 1
+        if granted:
+            tokens -= 1
+        self._buckets[key] = (tokens, now, now + (rate.capacity - tokens) / rate.per_second)
+        if len(self._buckets) >= self._prune_at:
+            self._prune(now)
+        return 0.0 if granted else (1 - tokens) / rate.per_second
+
+    def _prune(self, now: float) -> None:
+        # A full bucket behaves exactly like a missing one
+        for key in [key for key, (_, _, full_at) in self._buckets.items() if full_at <= now]:
+            del self._buckets[key]
+        self._prune_at = max(1024, 2 * len(self._buckets))
+
+    def close(self) -> None:
+        self._buckets.clear()
+
+
+# One statement, so concurrent workers never lose a take. SET expressions see
+# the row's old values.
+_TAKE_SQL = """
+INSERT INTO buckets (key, tokens, updated, granted) VALUES (:key, :capacity - 1, :now, 1)
+ON CONFLICT (key) DO UPDATE SET
+    granted = min(:capacity, tokens + max(0, :now - updated) * :per_second) >= 1,
+    tokens = min(:capacity, tokens + max(0, :now - updated) * :per_second)
+        - (min(:capacity, tokens + max(0, :now - updated) * :per_second) >= 1),
+    updated = max(updated, :now)
+RETURNING tokens, granted
+"""
+
+
+class SQLiteBuckets:
+    """Buckets in a SQLite file shared by the worker processes of one host.
+
+    ``take`` blocks on the file, so callers go through ``run``, which queues
+    it on the worker's one limiter thread; that thread is also the only one
+    using the connection.
+    """
+
+    blocking = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_pid: Optional[int] = None
+        self._takes = 0
+
+    async def run(self, fn, *args):
+        """``fn(*args)`` on the limiter thread."""
+        # Threads don't survive a fork into another worker either
+        if self._executor is None or self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ratelimit")
+            self._executor_pid = os.getpid()
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _connect(self) -> sqlite3.Connection:
+        # A connection must not cross a fork into another worker
+        if self._connection is None or self._pid != os.getpid():
+            connection = sqlite3.connect(
+                self.path, timeout=SHARED_LOCK_TIMEOUT, isolation_level=None, check_same_thread=False
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            # Losing bucket state in a crash is harmless
+            connection.execute("PRAGMA synchronous=OFF")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, granted INTEGER NOT NULL"
+                ") WITHOUT ROWID"
+            )
+            self._connection, self._pid = connection, os.getpid()
+        return self._connection
+
+    def take(self, key: str, rate: Rate, now: float) -> float:
+        """Take a token: 0 if there was one, else seconds until there will be."""
+        try:
+            connection = self._connect()
+            tokens, granted = connection.execute(
+                _TAKE_SQL, {"key": key, "capacity": rate.capacity, "per_second": rate.per_second, "now": now}
+            ).fetchone()
+            self._takes += 1
+            if self._takes % SHARED_PRUNE_EVERY == 0:
+                connection.execute("DELETE FROM buckets WHERE updated < ?", (now - max(PERIODS.values()),))
+        except sqlite3.Error:
+            # Better to let a request through than to fail it over the limiter
+            storage_errors.inc()
+            return 0.0
+        return 0.0 if granted else (1 - tokens) / rate.per_second
+
+    def close(self) -> None:
+        if self._executor is not None and self._executor_pid == os.getpid():
+            self._executor.shutdown(wait=True)
+        self._executor = None
+        if self._connection is not None and self._pid == os.getpid():
+            self._connection.close()
+        self._connection = None
+
+
+def open_buckets(storage: str):
+    if storage == "memory":
+        return MemoryBuckets()
+    if storage.startswith("sqlite:///"):
+        return SQLiteBuckets(storage[len("sqlite:///"):])
+    raise ValueError(f"Unsupported RATE_LIMIT_STORAGE {storage!r}, expected 'memory' or 'sqlite:///path'")
+
+
+def client_ip(scope: Scope) -> str:
+    # Behind a proxy this is the proxy unless uvicorn runs with --proxy-headers
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def token_subject(scope: Scope) -> Optional[str]:
+    """Subject of a valid bearer access token on the request."""
+    scheme, _, token = Headers(scope=scope).get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer":
+        return None
+    payload = decode_access_token(token)
+    return payload.get("sub") if payload is not None else None
+
+
+class RateLimiter:
+    def __init__(self, buckets, per_ip: Optional[Rate], per_user: Optional[Rate], routes: List[RouteBudget]):
+        self.buckets = buckets
+        self.per_ip = per_ip
+        self.per_user = per_user
+        self.routes = routes
+
+    def route_budget(self, scope: Scope) -> Optional[RouteBudget]:
+        for budget in self.routes:
+            if budget.method == scope["method"] and budget.pattern.match(scope["path"]):
+                return budget
+        return None
+
+    def _first_empty(self, takes: List[Tuple[str, str, Rate]], now: float) -> Optional[Tuple[str, float]]:
+        # Stop at the first empty bucket, so rejected requests don't drain the others
+        for limit, key, rate in takes:
+            wait = self.buckets.take(key, rate, now)
+            if wait > 0:
+                return limit, wait
+        return None
+
+    async def check(self, scope: Scope) -> Optional[Tuple[str, float]]:
+        """``(limit, retry_after_seconds)`` of the first empty bucket, or None to let the request in."""
+        now = time.time()
+        ip = client_ip(scope)
+        user = token_subject(scope)
+        who = f"user:{user}" if user is not None else f"ip:{ip}"
+        takes = []
+        budget = self.route_budget(scope)
+        if budget is not None:
+            takes.append((budget.label, f"route:{budget.label}:{who}", budget.rate))
+        if user is not None and self.per_user is not None:
+            takes.append(("user", who, self.per_user))
+        if self.per_ip is not None:
+            takes.append(("ip", f"ip:{ip}", self.per_ip))
+        if not takes:
+            return None
+        if self.buckets.blocking:
+            # One hop to the limiter thread for all of the request's takes
+            return await self.buckets.run(self._first_empty, takes, now)
+        return self._first_empty(takes, now)
+
+
+class LoadMonitor:
+    """Requests in progress and event loop lag of this worker."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _sample(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(LAG_SAMPLE_SECONDS)
+            self.lag = max(0.0, loop.time() - started - LAG_SAMPLE_SECONDS)
+            loop_lag_gauge.set(self.lag)
+
+    def start(self) -> None:
+        """Start sampling event loop lag; call from the running loop (app startup)."""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._sample())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+            self.lag = 0.0
+
+    def overloaded(self) -> Optional[str]:
+        """Why new requests should be turned away now, or None."""
+        if settings.SHED_MAX_IN_FLIGHT and self.in_flight >= settings.SHED_MAX_IN_FLIGHT:
+            return "in_flight"
+        if settings.SHED_LOOP_LAG_MS and self.lag * 1000 >= settings.SHED_LOOP_LAG_MS:
+            return "loop_lag"
+        return None
+
+
+rate_limiter = RateLimiter(
+    open_buckets(settings.RATE_LIMIT_STORAGE),
+    per_ip=parse_rate(settings.RATE_LIMIT_PER_IP),
+    per_user=parse_rate(settings.RATE_LIMIT_PER_USER),
+    routes=parse_route_budgets(settings.RATE_LIMIT_ROUTES),
+)
+load_monitor = LoadMonitor()
+
+
+def _exempt(path: str) -> bool:
+    return path == "/metrics" or path == "/health" or path.startswith("/health/")
+
+
+async def _reject(send: Send, status: int, detail: str, retry_after: float) -> None:
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class RateLimitMiddleware:
+    """Shed load and apply rate limits before routing."""
+
+    def __init__(self, app: ASGIApp, limiter: RateLimiter = rate_limiter, monitor: LoadMonitor = load_monitor):
+        self.app = app
+        self.limiter = limiter
+        self.monitor = monitor
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or _exempt(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        reason = self.monitor.overloaded()
+        if reason is not None:
+            load_shed.labels(reason).inc()
+            await _reject(send, 503, "Server is busy, please retry shortly", SHED_RETRY_AFTER)
+            return
+
+        if settings.RATE_LIMIT_ENABLED:
+            limited = await self.limiter.check(scope)
+            if limited is not None:
+                limit, retry_after = limited
+                rate_limited.labels(limit).inc()
+                await _reject(send, 429, "Too many requests, please retry later", retry_after)
+                return
+
+        if scope["path"] in STREAMING_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        self.monitor.in_flight += 1
+        in_flight_gauge.set(self.monitor.in_flight)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.monitor.in_flight -= 1
+            in_flight_gauge.set(self.monitor.in_flight)
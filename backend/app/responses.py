@@ -0,0 +1,47 @@
+"""JSON responses rendered with orjson.
+
+``APIJSONResponse`` is the app's default response class, so every endpoint
+gets orjson's encoder. Hot list endpoints go further: they select plain
+columns instead of ORM objects and return ``rows_list``/``rows_page``, which
+skips FastAPI's per-row Pydantic validation and ``jsonable_encoder`` pass.
+Their ``response_model`` then only documents the shape, so the selected
+columns must match it.
+"""
+from typing import Any, Callable, List, Sequence, Tuple
+
+import orjson
+from fastapi.responses import ORJSONResponse
+
+from .pagination import paginate
+
+
+class APIJSONResponse(ORJSONResponse):
+    """orjson response that writes UTC timestamps with a ``Z``, as Pydantic does.
+
+    Naive datetimes are taken as UTC too: every timestamp is stored in UTC,
+    and SQLite hands them back without a zone, so rows selected as plain
+    columns render the same on SQLite as on PostgreSQL.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z)
+
+
+def _objects(rows: Sequence) -> List[dict]:
+    """Result rows (or NamedTuples) as dicts, zipping every row with one shared field tuple."""
+    if not rows:
+        return []
+    fields = rows[0]._fields
+    return [dict(zip(fields, row)) for row in rows]
+
+
+def rows_list(rows: Sequence) -> APIJSONResponse:
+    """JSON array of result rows, one object per row."""
+    return APIJSONResponse(_objects(rows))
+
+
+def rows_page(rows: Sequence, limit: int, key: Callable[[Any], Tuple]) -> APIJSONResponse:
+    """``paginate`` for result rows, serialized directly."""
+    page = paginate(rows, limit, key)
+    page["items"] = _objects(page["items"])
+    return APIJSONResponse(page)
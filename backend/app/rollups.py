@@ -0,0 +1,166 @@
+"""Maintenance of the daily_protein_totals rollup.
+
+Every write to protein_logs applies a delta to the matching
+``(user_id, day)`` row in the same transaction, so summary endpoints read one
+row per day instead of scanning the raw logs. ``rebuild_daily_totals`` derives
+the table from scratch for existing data or after a bug.
+"""
+from datetime import date
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import Select, delete, func, literal, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .database import ON_CONFLICT_INSERTS, mark_recent_write
+from .models import DailyProteinTotal, LogVersion, ProteinLog, User
+from .timezones import local_day
+
+DayDeltas = Dict[date, Tuple[float, int]]
+
+# A user's log_version, for queries joined with ``join_log_version``
+user_log_version = func.coalesce(LogVersion.version, 0).label("log_version")
+
+
+def join_log_version(query: Select) -> Select:
+    """``query`` on users, joined with their log_versions row (if any)."""
+    return query.outerjoin(LogVersion, LogVersion.user_id == User.id)
+
+
+async def _bump_log_version(db: AsyncSession, user_id: int) -> int:
+    table = LogVersion.__table__
+    insert = ON_CONFLICT_INSERTS.get(db.bind.dialect.name)
+    if insert is not None:
+        stmt = insert(table).values(user_id=user_id, version=1)
+        return await db.scalar(
+            stmt.on_conflict_do_update(index_elements=[table.c.user_id], set_={"version": table.c.version + 1})
+            .returning(table.c.version)
+        )
+    version = await db.scalar(
+        update(table).where(table.c.user_id == user_id).values(version=table.c.version + 1).returning(table.c.version)
+    )
+    if version is None:
+        await db.execute(table.insert().values(user_id=user_id, version=1))
+        version = 1
+    return version
+
+
+def _bump_log_versions(db: Session, user_id: Optional[int] = None) -> None:
+    """Bump the log_version of ``user_id`` (default: every user with logs or rollup rows)."""
+    table = LogVersion.__table__
+    update_stmt = update(table).values(version=table.c.version + 1)
+    users = select(ProteinLog.user_id).union(select(DailyProteinTotal.user_id))
+    if user_id is not None:
+        update_stmt = update_stmt.where(table.c.user_id == user_id)
+        users = select(User.id.label("user_id")).where(User.id == user_id)
+    db.execute(update_stmt)
+    missing = users.subquery()
+    db.execute(table.insert().from_select(
+        ["user_id", "version"],
+        select(missing.c.user_id, literal(1)).where(missing.c.user_id.not_in(select(table.c.user_id))),
+    ))
+
+
+async def apply_log_delta(
+    db: AsyncSession, user_id: int, day: date, protein: float, count: int
+) -> int:
+    """Add ``protein``/``count`` (negative when deleting) to one day's row.
+
+    Returns the user's new ``log_version``. Does not commit, so the rollup
+    lands in the caller's transaction.
+    """
+    return await apply_log_deltas(db, user_id, {day: (protein, count)})
+
+
+async def apply_log_deltas(db: AsyncSession, user_id: int, deltas: DayDeltas) -> Optional[int]:
+    """Apply ``{day: (protein, count)}`` deltas with one multi-row upsert.
+
+    Also bumps the user's ``log_version`` and pins their reads to the
+    primary for a while; returns the new version (None without deltas).
+    Does not commit, so the rollup lands in the caller's transaction.
+    """
+    if not deltas:
+        return None
+    mark_recent_write(user_id)
+    table = DailyProteinTotal.__table__
+    rows = [
+        {"user_id": user_id, "day": day, "total": protein, "count": count}
+        for day, (protein, count) in sorted(deltas.items())
+    ]
+    insert = ON_CONFLICT_INSERTS.get(db.bind.dialect.name)
+    if insert is not None:
+        stmt = insert(table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.day],
+            set_={
+                "total": table.c.total + stmt.excluded.total,
+                "count": table.c.count + stmt.excluded.count,
+            },
+        )
+        await db.execute(stmt)
+    else:
+        for row in rows:
+            result = await db.execute(
+                update(table)
+                .where(table.c.user_id == user_id, table.c.day == row["day"])
+                .values(total=table.c.total + row["total"], count=table.c.count + row["count"])
+            )
+            if result.rowcount == 0:
+                await db.execute(table.insert().values(**row))
+
+    shrunk = [row["day"] for row in rows if row["count"] < 0]
+    if shrunk:
+        await db.execute(
+            delete(table).where(table.c.user_id == user_id, table.c.day.in_(shrunk), table.c.count <= 0)
+        )
+    # Last, so the version row is locked for as short a time as possible
+    return await _bump_log_version(db, user_id)
+
+
+def rebuild_daily_totals(db: Session, user_id: Optional[int] = None, batch_size: int = 5000) -> int:
+    """Recompute rollup rows from protein_logs; returns the number of rows written.
+
+    Days are bucketed in each user's timezone, so this also has to run for a
+    user whose timezone changes. Logs are streamed in ``user_id`` order and
+    flushed one user at a time, keeping memory bounded by a single user's
+    history in days. Bumps the log_version of every user it covers, so
+    cached summaries built from the old rows stop validating. The caller
+    commits.
+    """
+    # Before the delete, so users whose rows are all cleared are covered too
+    _bump_log_versions(db, user_id)
+    table = DailyProteinTotal.__table__
+    clear = delete(table)
+    query = select(
+        ProteinLog.user_id, ProteinLog.logged_at, ProteinLog.protein_amount, User.timezone
+    ).join(User, User.id == ProteinLog.user_id)
+    if user_id is not None:
+        clear = clear.where(table.c.user_id == user_id)
+        query = query.where(ProteinLog.user_id == user_id)
+    db.execute(clear)
+
+    written = 0
+    current_user, days = None, {}
+
+    def flush():
+        nonlocal written
+        if days:
+            db.execute(table.insert(), [
+                {"user_id": current_user, "day": day, "total": total, "count": count}
+                for day, (total, count) in days.items()
+            ])
+            written += len(days)
+            days.clear()
+
+    rows = db.execute(
+        query.order_by(ProteinLog.user_id).execution_options(yield_per=batch_size)
+    )
+    for row_user, logged_at, amount, tz_name in rows:
+        if row_user != current_user:
+            flush()
+            current_user = row_user
+        day = local_day(logged_at, tz_name)
+        total, count = days.get(day, (0.0, 0))
+        days[day] = (total + amount, count + 1)
+    flush()
+    return written
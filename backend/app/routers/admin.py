@@ -0,0 +1,48 @@
+from dataclasses import asdict
+from typing import Optional
+
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile, status
+from starlette.concurrency import run_in_threadpool
+
+from ..auth import require_admin_key
+from ..catalog import food_catalog, store_index
+from ..config import settings
+from ..database import SessionLocal
+from ..importer import FORMATS, feed_format, import_prices, open_feed
+from ..schemas import PriceImportReport
+
+router = APIRouter(prefix="/admin", tags=["Admin"], dependencies=[Depends(require_admin_key)])
+
+
+def _run_import(upload: UploadFile, fmt: str, batch_size: int, create_missing: bool):
+    stream = open_feed(upload.file, upload.filename or "")
+    with SessionLocal() as db:
+        return import_prices(db, stream, fmt, batch_size=batch_size, create_missing=create_missing)
+
+
+@router.post("/import/prices", response_model=PriceImportReport)
+async def import_price_feed(
+    feed: UploadFile = File(..., description="CSV or JSON Lines price feed, optionally gzipped"),
+    format: Optional[str] = Query(None, description="csv or jsonl; guessed from the file name by default"),
+    batch_size: int = Query(settings.PRICE_IMPORT_BATCH_SIZE, ge=1, le=100000),
+    create_missing: bool = Query(False, description="Create foods and stores the feed names but we don't have"),
+):
+    """Upsert a store price feed. Runs on a worker thread, one commit per batch."""
+    fmt = format or feed_format(feed.filename or "")
+    if fmt not in FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"format must be one of: {', '.join(FORMATS)}"
+        )
+    try:
+        report = await run_in_threadpool(_run_import, feed, fmt, batch_size, create_missing)
+    except UnicodeDecodeError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Feed must be UTF-8 text"
+        )
+    if report.created_foods:
+        food_catalog.expire()
+    if report.created_stores:
+        store_index.expire()
+    return asdict(report)
@@ -0,0 +1,46 @@
+from datetime import timedelta
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..auth import UserPrincipal, get_current_active_user, get_user_read_db
+from ..responses import APIJSONResponse
+from ..schemas import UserOut
+from ..summaries import recent_logs_with_count, today_summary, totals_by_local_day, user_stats, weekly_summary
+from ..timezones import local_day, local_today
+
+router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
+
+
+@router.get("")
+async def get_dashboard(
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_user_read_db)
+):
+    """Profile, today, weekly and stats in one response.
+
+    Each part has the shape of its own endpoint (``/users/me``,
+    ``/protein-logs/today``, ``/protein-logs/weekly``, ``/users/me/stats``),
+    but all of them come from one query: the user's logs since
+    ``today - 7`` (the window stats calls this week) with their all-time
+    log count alongside.
+    """
+    today = local_today(current_user.timezone)
+    rows = (await db.execute(
+        recent_logs_with_count(current_user.id, today - timedelta(days=7), today, current_user.timezone)
+    )).all()
+    total_logs = rows[0].total_logs
+    logs = [row for row in rows if row.id is not None]
+    
+    totals_by_day = totals_by_local_day(logs, current_user.timezone)
+    goal = current_user.protein_goal
+    
+    return APIJSONResponse({
+        "profile": UserOut.model_validate(current_user).model_dump(),
+        "today": today_summary(
+            today, [log for log in logs if local_day(log.logged_at, current_user.timezone) == today], goal
+        ),
+        "weekly": weekly_summary(today, totals_by_day, goal),
+        "stats": user_stats(
+            total_logs, sum(total for total, _ in totals_by_day.values()), len(totals_by_day), goal
+        ),
+    })
@@ -1,10 +1,15 @@
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 
-from ..database import get_db
+from ..catalog import bump_catalog_version, food_catalog
+from ..database import get_db, get_read_db
 from ..models import Food
-from ..schemas import FoodOut
+from ..pagination import decode_cursor
+from ..pricing import ranked_prices
+from ..responses import rows_list, rows_page
+from ..schemas import FoodOut, Page, StorePriceOut
 
 router = APIRouter(prefix="/foods", tags=["Foods"])
 
@@ -32,80 +37,88 @@ SEED_FOODS = [
 ]
 
 
-@router.get("/", response_model=List[FoodOut])
+@router.get("/", response_model=Page[FoodOut])
 async def list_foods(
     search: Optional[str] = Query(None, description="Search by food name"),
     category: Optional[str] = Query(None, description="Filter by category"),
     vegan_only: bool = Query(False, description="Show only vegan foods"),
-    limit: int = Query(50, le=100),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(50, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """List all foods with optional filtering."""
-    query = db.query(Food)
+    """List all foods with optional filtering, highest protein first.
+
+    With ``search`` the results are ranked by match quality instead.
+    """
+    catalog = await food_catalog.get(db)
     
     if search:
-        query = query.filter(Food.name.ilike(f"%{search}%"))
-    
-    if category:
-        query = query.filter(Food.category == category)
+        # Relevance order has no stable column key, so the cursor is a rank offset
+        offset = max(0, decode_cursor(cursor, int)[0]) if cursor else 0
+        ids = catalog.search.search(search, limit + 1, offset=offset, category=category, vegan_only=vegan_only)
+        foods = [catalog.by_id[food_id] for food_id in ids]
+        return rows_page(foods, limit, key=lambda food: (offset + limit,))
     
-    if vegan_only:
-        query = query.filter(Food.is_vegan == True)
-    
-    foods = query.order_by(Food.protein_per_100g.desc()).limit(limit).all()
-    return foods
+    after = decode_cursor(cursor, float, int) if cursor else None
+    foods = catalog.page(limit + 1, after=after, category=category, vegan_only=vegan_only)
+    return rows_page(foods, limit, key=lambda food: (food.protein_per_100g, food.id))
 
 
 @router.get("/categories")
-async def get_categories(db: Session = Depends(get_db)):
+async def get_categories(db: AsyncSession = Depends(get_read_db)):
     """Get all food categories."""
-    from sqlalchemy import distinct
-    
-    categories = db.query(distinct(Food.category)).filter(
-        Food.category.isnot(None)
-    ).all()
-    
-    return [c[0] for c in categories]
+    catalog = await food_catalog.get(db)
+    return catalog.categories
 
 
 @router.get("/top-protein", response_model=List[FoodOut])
 async def get_top_protein_foods(
-    limit: int = Query(10, le=50),
+    limit: int = Query(10, ge=1, le=50),
     vegan_only: bool = Query(True),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get top protein foods sorted by protein content."""
-    query = db.query(Food)
-    
-    if vegan_only:
-        query = query.filter(Food.is_vegan == True)
-    
-    foods = query.order_by(Food.protein_per_100g.desc()).limit(limit).all()
-    return foods
+    catalog = await food_catalog.get(db)
+    return rows_list(catalog.page(limit, vegan_only=vegan_only))
 
 
 @router.post("/seed")
-async def seed_foods(db: Session = Depends(get_db)):
+async def seed_foods(db: AsyncSession = Depends(get_db)):
     """Seed the database with sample foods (dev only)."""
-    existing = db.query(Food).first()
+    existing = await db.scalar(select(Food).limit(1))
     if existing:
-        return {"message": "Foods already seeded", "count": db.query(Food).count()}
+        count = await db.scalar(select(func.count(Food.id)))
+        return {"message": "Foods already seeded", "count": count}
     
     for food_data in SEED_FOODS:
         food = Food(**food_data)
         db.add(food)
     
-    db.commit()
+    await bump_catalog_version(db, "foods")
+    await db.commit()
+    food_catalog.expire()
     
     return {"message": "Foods seeded successfully", "count": len(SEED_FOODS)}
 
 
+@router.get("/{food_id}/prices", response_model=List[StorePriceOut])
+async def get_food_prices(food_id: int, db: AsyncSession = Depends(get_read_db)):
+    """Prices for a food across stores, best protein per dollar first."""
+    catalog = await food_catalog.get(db)
+    if food_id not in catalog.by_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Food not found"
+        )
+    rows = await db.execute(ranked_prices(food_id=food_id))
+    return rows.mappings().all()
+
+
 @router.get("/{food_id}", response_model=FoodOut)
-async def get_food(food_id: int, db: Session = Depends(get_db)):
+async def get_food(food_id: int, db: AsyncSession = Depends(get_read_db)):
     """Get a specific food by ID."""
-    from fastapi import HTTPException, status
-    
-    food = db.query(Food).filter(Food.id == food_id).first()
+    catalog = await food_catalog.get(db)
+    food = catalog.by_id.get(food_id)
     if not food:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -1,102 +1,259 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List, Optional
-from datetime import datetime, date, timedelta
+from fastapi import APIRouter, Depends, Header, HTTPException, status, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from datetime import datetime, date, timedelta, timezone
 
-from ..database import get_db
-from ..models import User, ProteinLog
-from ..schemas import ProteinLogCreate, ProteinLogOut
-from ..auth import get_current_active_user
+from ..config import settings
+from ..database import ON_CONFLICT_INSERTS, get_db
+from ..events import day_events, today_stream
+from ..exports import FORMATS, accepts_gzip, export_chunks, export_query
+from ..models import ProteinLog
+from ..schemas import Page, ProteinLogBatch, ProteinLogBatchOut, ProteinLogCreate, ProteinLogOut
+from ..auth import (
+    UserPrincipal, decode_access_token, get_current_active_user, get_fresh_active_user, get_user_read_db, oauth2_scheme
+)
+from ..rollups import apply_log_delta, apply_log_deltas
+from ..pagination import decode_cursor
+from ..responses import APIJSONResponse, rows_page
+from ..summaries import (
+    BUCKETS, bucket_totals, fetch_daily_totals, log_entry, logs_before, logs_between, today_summary, user_logs,
+    weekly_summary
+)
+from ..timezones import local_day, local_today
 
 router = APIRouter(prefix="/protein-logs", tags=["Protein Logs"])
 
+# Longest window /range will serve (about ten years of daily buckets)
+MAX_RANGE_DAYS = 3660
+
+# How far ahead of the server clock a client-supplied logged_at may be
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+
 
 @router.post("/", response_model=ProteinLogOut, status_code=status.HTTP_201_CREATED)
 async def create_log(
     log_data: ProteinLogCreate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: UserPrincipal = Depends(get_fresh_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """Log a protein intake."""
     new_log = ProteinLog(
         user_id=current_user.id,
         food_name=log_data.food_name,
         protein_amount=log_data.protein_amount,
+        logged_at=datetime.now(timezone.utc),
     )
     
     db.add(new_log)
-    db.commit()
-    db.refresh(new_log)
+    day = local_day(new_log.logged_at, current_user.timezone)
+    log_version = await apply_log_delta(db, current_user.id, day, new_log.protein_amount, 1)
+    await db.commit()
+    await db.refresh(new_log)
+    day_events.publish(current_user.id, log_version, added=[log_entry(new_log)])
     
     return new_log
 
 
-@router.get("/", response_model=List[ProteinLogOut])
+@router.post("/batch", response_model=ProteinLogBatchOut, status_code=status.HTTP_201_CREATED)
+async def create_logs_batch(
+    batch: ProteinLogBatch,
+    current_user: UserPrincipal = Depends(get_fresh_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Log many intakes in one transaction, e.g. an offline sync.
+
+    Entries whose ``client_key`` is already logged come back under
+    ``existing`` instead of being inserted again, so a sync can be retried.
+    """
+    now = datetime.now(timezone.utc)
+    rows, seen_keys = [], set()
+    for entry in batch.entries:
+        if entry.client_key is not None:
+            if entry.client_key in seen_keys:
+                continue
+            seen_keys.add(entry.client_key)
+        logged_at = now
+        if entry.logged_at is not None:
+            # Naive timestamps are taken as UTC, like everywhere else; others
+            # are converted, since SQLite stores the wall time and drops the offset
+            logged_at = entry.logged_at
+            if logged_at.tzinfo is None:
+                logged_at = logged_at.replace(tzinfo=timezone.utc)
+            logged_at = logged_at.astimezone(timezone.utc)
+            if logged_at > now + MAX_CLOCK_SKEW:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="logged_at cannot be in the future"
+                )
+        rows.append({
+            "user_id": current_user.id,
+            "food_name": entry.food_name,
+            "protein_amount": entry.protein_amount,
+            "logged_at": logged_at,
+            "client_key": entry.client_key,
+        })
+    
+    table = ProteinLog.__table__
+    insert = ON_CONFLICT_INSERTS.get(db.bind.dialect.name)
+    if insert is not None:
+        stmt = insert(table).values(rows).on_conflict_do_nothing(
+            index_elements=[table.c.user_id, table.c.client_key]
+        )
+    else:
+        stmt = table.insert().values(rows)
+    try:
+        created = (await db.execute(stmt.returning(
+            table.c.id, table.c.food_name, table.c.protein_amount, table.c.logged_at, table.c.client_key
+        ))).all()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A client_key in this batch is already logged"
+        )
+    
+    deltas = {}
+    for log in created:
+        day = local_day(log.logged_at, current_user.timezone)
+        protein, count = deltas.get(day, (0.0, 0))
+        deltas[day] = (protein + log.protein_amount, count + 1)
+    log_version = await apply_log_deltas(db, current_user.id, deltas)
+    
+    existing = []
+    skipped = seen_keys - {log.client_key for log in created}
+    if skipped:
+        existing = (await db.scalars(
+            select(ProteinLog).where(ProteinLog.user_id == current_user.id, ProteinLog.client_key.in_(skipped))
+        )).all()
+    await db.commit()
+    day_events.publish(current_user.id, log_version, added=[log_entry(log) for log in created])
+    
+    return {"created": created, "existing": existing}
+
+
+@router.get("/", response_model=Page[ProteinLogOut])
 async def get_logs(
     date_filter: Optional[date] = Query(None, description="Filter by specific date"),
-    limit: int = Query(50, le=100),
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(50, ge=1, le=100),
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_user_read_db)
 ):
-    """Get protein logs for current user."""
-    query = db.query(ProteinLog).filter(ProteinLog.user_id == current_user.id)
-    
+    """Get protein logs for current user, newest first."""
     if date_filter:
-        query = query.filter(func.date(ProteinLog.logged_at) == date_filter)
+        query = logs_between(current_user.id, date_filter, date_filter, current_user.timezone)
+    else:
+        query = user_logs(current_user.id)
+    
+    if cursor:
+        logged_at, log_id = decode_cursor(cursor, datetime.fromisoformat, int)
+        query = logs_before(query, logged_at, log_id)
     
-    logs = query.order_by(ProteinLog.logged_at.desc()).limit(limit).all()
-    return logs
+    # Plain columns in ProteinLogOut's shape, serialized without ORM objects
+    query = query.with_only_columns(
+        ProteinLog.id, ProteinLog.food_name, ProteinLog.protein_amount, ProteinLog.logged_at, ProteinLog.client_key
+    )
+    logs = (await db.execute(query.limit(limit + 1))).all()
+    return rows_page(logs, limit, key=lambda log: (log.logged_at, log.id))
 
 
 @router.get("/today")
 async def get_today_summary(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_user_read_db)
 ):
     """Get today's protein summary."""
-    today = date.today()
-    
-    logs = db.query(ProteinLog).filter(
-        ProteinLog.user_id == current_user.id,
-        func.date(ProteinLog.logged_at) == today
-    ).all()
+    today = local_today(current_user.timezone)
     
-    total_protein = sum(log.protein_amount for log in logs)
-    goal = current_user.protein_goal
-    remaining = max(goal - total_protein, 0)
-    progress = min((total_protein / goal) * 100, 100) if goal > 0 else 0
+    # Oldest first, as before the range rewrite
+    logs = (await db.scalars(
+        logs_between(current_user.id, today, today, current_user.timezone)
+    )).all()[::-1]
     
-    return {
-        "date": today.isoformat(),
-        "total_protein": round(total_protein, 1),
-        "goal": goal,
-        "remaining": round(remaining, 1),
-        "progress_percent": round(progress, 1),
-        "log_count": len(logs),
-        "logs": [
-            {
-                "id": log.id,
-                "food_name": log.food_name,
-                "protein_amount": log.protein_amount,
-                "logged_at": log.logged_at.isoformat()
-            }
-            for log in logs
-        ]
+    # Returned as is so log timestamps keep their UTC "Z", as the list does
+    return APIJSONResponse(today_summary(today, logs, current_user.protein_goal))
+
+
+@router.get("/today/stream")
+async def stream_today_summary(
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    token: str = Depends(oauth2_scheme)
+):
+    """Today's summary as server-sent events, updated as logs change.
+
+    Sends a ``summary`` event (the ``/today`` body), then ``log_added`` and
+    ``log_deleted`` events carrying the log and the new totals. The stream
+    ends when the access token expires; reconnect with a fresh one.
+    """
+    if len(day_events) >= settings.SSE_MAX_STREAMS:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many open streams, please retry shortly",
+            headers={"Retry-After": "5"},
+        )
+    payload = decode_access_token(token) or {}
+    return StreamingResponse(
+        today_stream(current_user, payload.get("exp", 0), payload.get("sid")),
+        media_type="text/event-stream",
+        # No proxy buffering or caching: events must go out as they happen
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/export")
+async def export_logs(
+    format: str = Query("csv", description="csv or ndjson"),
+    start: Optional[date] = Query(None, description="First day to include (default: the first log)"),
+    end: Optional[date] = Query(None, description="Last day to include (default: today)"),
+    accept_encoding: str = Header(""),
+    current_user: UserPrincipal = Depends(get_current_active_user)
+):
+    """Download the log history, streamed oldest first.
+
+    Rows are read and sent in batches, so the download starts at once and
+    any length of history can be exported. Gzipped on the fly when the
+    client accepts it.
+    """
+    if format not in FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"format must be one of: {', '.join(FORMATS)}"
+        )
+    if start is not None and end is not None and end < start:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="end must not be before start"
+        )
+    gzip = accepts_gzip(accept_encoding)
+    headers = {
+        "Content-Disposition": f'attachment; filename="protein-logs.{format}"',
+        "Vary": "Accept-Encoding",
     }
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        export_chunks(
+            current_user.id, export_query(current_user.id, start, end, current_user.timezone), format, gzip
+        ),
+        media_type=FORMATS[format],
+        headers=headers,
+    )
 
 
 @router.delete("/{log_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_log(
     log_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: UserPrincipal = Depends(get_fresh_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """Delete a protein log."""
-    log = db.query(ProteinLog).filter(
+    log = await db.scalar(select(ProteinLog).where(
         ProteinLog.id == log_id,
         ProteinLog.user_id == current_user.id
-    ).first()
+    ))
     
     if not log:
         raise HTTPException(
@@ -104,44 +261,64 @@ async def delete_log(
             detail="Log not found"
         )
     
-    db.delete(log)
-    db.commit()
+    deleted = log_entry(log)
+    await db.delete(log)
+    day = local_day(log.logged_at, current_user.timezone)
+    log_version = await apply_log_delta(db, current_user.id, day, -log.protein_amount, -1)
+    await db.commit()
+    day_events.publish(current_user.id, log_version, deleted=[deleted])
 
 
 @router.get("/weekly")
 async def get_weekly_summary(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_user_read_db)
 ):
     """Get weekly protein summary."""
-    today = date.today()
-    week_start = today - timedelta(days=6)
-    
-    daily_totals = []
-    
-    for i in range(7):
-        day = week_start + timedelta(days=i)
-        total = db.query(func.sum(ProteinLog.protein_amount)).filter(
-            ProteinLog.user_id == current_user.id,
-            func.date(ProteinLog.logged_at) == day
-        ).scalar() or 0
-        
-        daily_totals.append({
-            "date": day.isoformat(),
-            "day_name": day.strftime("%a"),
-            "protein": round(total, 1),
-            "goal_met": total >= current_user.protein_goal
-        })
+    today = local_today(current_user.timezone)
     
-    total_weekly = sum(d["protein"] for d in daily_totals)
-    days_goal_met = sum(1 for d in daily_totals if d["goal_met"])
+    totals_by_day = await fetch_daily_totals(db, current_user.id, today - timedelta(days=6), today)
+    return weekly_summary(today, totals_by_day, current_user.protein_goal)
+
+
+@router.get("/range")
+async def get_range_summary(
+    start: date = Query(..., description="First day of the window (inclusive)"),
+    end: date = Query(..., description="Last day of the window (inclusive)"),
+    bucket: str = Query("day", description="Bucket size: day, week or month"),
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_user_read_db)
+):
+    """Get protein totals for an arbitrary window, grouped into buckets."""
+    if bucket not in BUCKETS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"bucket must be one of: {', '.join(BUCKETS)}"
+        )
+    if end < start:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="end must not be before start"
+        )
+    if (end - start).days >= MAX_RANGE_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Range is limited to {MAX_RANGE_DAYS} days"
+        )
+    
+    totals_by_day = await fetch_daily_totals(db, current_user.id, start, end)
+    buckets = bucket_totals(totals_by_day, start, end, bucket, current_user.protein_goal)
+    
+    total_protein = sum(total for total, _ in totals_by_day.values())
+    span_days = (end - start).days + 1
     
     return {
-        "week_start": week_start.isoformat(),
-        "week_end": today.isoformat(),
-        "daily_totals": daily_totals,
-        "total_weekly_protein": round(total_weekly, 1),
-        "average_daily": round(total_weekly / 7, 1),
-        "days_goal_met": days_goal_met,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "bucket": bucket,
+        "buckets": buckets,
+        "total_protein": round(total_protein, 1),
+        "average_daily": round(total_protein / span_days, 1),
+        "days_logged": len(totals_by_day),
         "goal": current_user.protein_goal
     }
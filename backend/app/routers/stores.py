@@ -1,13 +1,24 @@
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import bindparam, select, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from pydantic import BaseModel
 
-from ..database import get_db
-from ..models import Store, FoodPrice, Food
+from ..catalog import bump_catalog_version, store_index
+from ..database import get_db, get_read_db
+from ..models import Store
+from ..pagination import decode_cursor
+from ..pricing import ranked_prices
+from ..responses import rows_page
+from ..schemas import Page, StorePriceOut
 
 router = APIRouter(prefix="/stores", tags=["Stores"])
 
+# /nearby radius when neither radius_miles nor limit is given
+DEFAULT_RADIUS_MILES = 5.0
+# Largest k for /nearby?limit= (a radius alone returns every store inside it)
+MAX_NEARBY = 100
+
 
 # Schemas
 class StoreOut(BaseModel):
@@ -21,15 +32,6 @@ class StoreOut(BaseModel):
         from_attributes = True
 
 
-class StorePriceOut(BaseModel):
-    store_id: int
-    store_name: str
-    food_name: str
-    price: float
-    unit: str
-    protein_per_dollar: float
-
-
 # Sample seed data
 SEED_STORES = [
     {"name": "Whole Foods Market", "address": "123 Market St, San Francisco, CA", "latitude": 37.7749, "longitude": -122.4194},
@@ -40,87 +42,128 @@ SEED_STORES = [
 ]
 
 
-@router.get("/", response_model=List[StoreOut])
+@router.get("/", response_model=Page[StoreOut])
 async def list_stores(
     search: Optional[str] = Query(None, description="Search by store name"),
-    limit: int = Query(20, le=50),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(20, ge=1, le=50),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """List all stores."""
-    query = db.query(Store)
+    """List all stores, in id order."""
+    query = select(Store.id, Store.name, Store.address, Store.latitude, Store.longitude)
     
     if search:
-        query = query.filter(Store.name.ilike(f"%{search}%"))
+        query = query.where(Store.name.ilike(f"%{search}%"))
     
-    stores = query.limit(limit).all()
-    return stores
+    if cursor:
+        (store_id,) = decode_cursor(cursor, int)
+        query = query.where(Store.id > store_id)
+    
+    stores = (await db.execute(query.order_by(Store.id).limit(limit + 1))).all()
+    return rows_page(stores, limit, key=lambda store: (store.id,))
 
 
 @router.get("/nearby")
 async def get_nearby_stores(
-    latitude: float = Query(..., description="User latitude"),
-    longitude: float = Query(..., description="User longitude"),
-    radius_miles: float = Query(5.0, description="Search radius in miles"),
-    db: Session = Depends(get_db)
+    latitude: float = Query(..., ge=-90, le=90, description="User latitude"),
+    longitude: float = Query(..., ge=-180, le=180, description="User longitude"),
+    radius_miles: Optional[float] = Query(None, gt=0, description="Search radius in miles (5 unless limit is given)"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_NEARBY, description="Return only the k nearest stores"),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """Get stores near a location (simplified distance calc)."""
-    # Simple approximate distance calculation
-    # 1 degree lat ≈ 69 miles, 1 degree lon ≈ 55 miles (varies by latitude)
-    lat_range = radius_miles / 69.0
-    lon_range = radius_miles / 55.0
+    """Get stores near a location, closest first by great-circle distance.
+
+    With ``radius_miles`` alone, every store inside the radius; with
+    ``limit``, the ``limit`` nearest (inside the radius, if one is given).
+    """
+    if radius_miles is None and limit is None:
+        radius_miles = DEFAULT_RADIUS_MILES
     
-    stores = db.query(Store).filter(
-        Store.latitude.isnot(None),
-        Store.longitude.isnot(None),
-        Store.latitude.between(latitude - lat_range, latitude + lat_range),
-        Store.longitude.between(longitude - lon_range, longitude + lon_range)
-    ).all()
+    index = await store_index.get(db)
+    nearest = index.nearest(latitude, longitude, limit, radius_miles)
+    if not nearest:
+        return []
     
-    # Calculate approximate distances
-    result = []
-    for store in stores:
-        # Haversine-like approximation
-        lat_diff = abs(store.latitude - latitude) * 69
-        lon_diff = abs(store.longitude - longitude) * 55
-        distance = (lat_diff ** 2 + lon_diff ** 2) ** 0.5
-        
-        if distance <= radius_miles:
-            result.append({
-                "id": store.id,
-                "name": store.name,
-                "address": store.address,
-                "latitude": store.latitude,
-                "longitude": store.longitude,
-                "distance_miles": round(distance, 2)
-            })
+    # Ids inlined: a dense radius can hold more stores than a driver takes bind parameters
+    ids = bindparam("store_ids", [store_id for store_id, _ in nearest], expanding=True, literal_execute=True)
+    stores = await db.scalars(select(Store).where(Store.id.in_(ids)))
+    by_id = {store.id: store for store in stores}
     
-    # Sort by distance
-    result.sort(key=lambda x: x["distance_miles"])
+    result = []
+    for store_id, distance in nearest:
+        store = by_id.get(store_id)
+        if store is None:
+            continue
+        result.append({
+            "id": store.id,
+            "name": store.name,
+            "address": store.address,
+            "latitude": store.latitude,
+            "longitude": store.longitude,
+            "distance_miles": round(distance, 2)
+        })
     return result
 
 
+@router.get("/cheapest-protein", response_model=List[StorePriceOut])
+async def get_cheapest_protein_nearby(
+    latitude: float = Query(..., ge=-90, le=90, description="User latitude"),
+    longitude: float = Query(..., ge=-180, le=180, description="User longitude"),
+    radius_miles: float = Query(DEFAULT_RADIUS_MILES, gt=0, description="Search radius in miles"),
+    vegan_only: bool = Query(False, description="Show only vegan foods"),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Foods at stores within the radius ranked by grams of protein per dollar."""
+    index = await store_index.get(db)
+    nearest = dict(index.nearest(latitude, longitude, None, radius_miles))
+    if not nearest:
+        return []
+    
+    rows = await db.execute(
+        ranked_prices(store_ids=nearest, vegan_only=vegan_only, known_units_only=True).limit(limit)
+    )
+    return [
+        {**row._mapping, "distance_miles": round(nearest[row.store_id], 2)}
+        for row in rows
+    ]
+
+
 @router.post("/seed")
-async def seed_stores(db: Session = Depends(get_db)):
+async def seed_stores(db: AsyncSession = Depends(get_db)):
     """Seed the database with sample stores (dev only)."""
-    existing = db.query(Store).first()
+    existing = await db.scalar(select(Store).limit(1))
     if existing:
-        return {"message": "Stores already seeded", "count": db.query(Store).count()}
+        count = await db.scalar(select(func.count(Store.id)))
+        return {"message": "Stores already seeded", "count": count}
     
     for store_data in SEED_STORES:
         store = Store(**store_data)
         db.add(store)
     
-    db.commit()
+    await bump_catalog_version(db, "stores")
+    await db.commit()
+    store_index.expire()
     
     return {"message": "Stores seeded successfully", "count": len(SEED_STORES)}
 
 
+@router.get("/{store_id}/prices", response_model=List[StorePriceOut])
+async def get_store_prices(store_id: int, db: AsyncSession = Depends(get_read_db)):
+    """Prices at a store, best protein per dollar first."""
+    if await db.get(Store, store_id) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Store not found"
+        )
+    rows = await db.execute(ranked_prices(store_ids=[store_id]))
+    return rows.mappings().all()
+
+
 @router.get("/{store_id}", response_model=StoreOut)
-async def get_store(store_id: int, db: Session = Depends(get_db)):
+async def get_store(store_id: int, db: AsyncSession = Depends(get_read_db)):
     """Get a specific store by ID."""
-    from fastapi import HTTPException, status
-    
-    store = db.query(Store).filter(Store.id == store_id).first()
+    store = await db.get(Store, store_id)
     if not store:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -1,17 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import Optional
+from datetime import timedelta
+from fastapi import APIRouter, Depends
+from sqlalchemy import case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..database import get_db
-from ..models import User
+from ..database import get_db, mark_recent_write
+from ..models import DailyProteinTotal, User
 from ..schemas import UserOut, UserUpdate
-from ..auth import get_current_active_user
+from ..auth import UserPrincipal, get_current_active_user, get_user_read_db, invalidate_cached_user
+from ..events import day_events
+from ..rollups import rebuild_daily_totals
+from ..summaries import user_stats
+from ..timezones import local_today
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
 
 @router.get("/me", response_model=UserOut)
-async def get_profile(current_user: User = Depends(get_current_active_user)):
+async def get_profile(current_user: UserPrincipal = Depends(get_current_active_user)):
     """Get current user profile."""
     return current_user
 
@@ -19,54 +24,51 @@ async def get_profile(current_user: User = Depends(get_current_active_user)):
 @router.patch("/me", response_model=UserOut)
 async def update_profile(
     user_update: UserUpdate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """Update current user profile."""
     update_data = user_update.model_dump(exclude_unset=True)
+    user = await db.get(User, current_user.id)
+    # From the row: the cached principal may predate a change made on another worker
+    old_timezone = user.timezone
     
     for field, value in update_data.items():
-        setattr(current_user, field, value)
+        setattr(user, field, value)
     
-    db.commit()
-    db.refresh(current_user)
+    if "timezone" in update_data and update_data["timezone"] != old_timezone:
+        # Rollup days are local days, so they have to be re-bucketed
+        await db.flush()
+        await db.run_sync(rebuild_daily_totals, user.id)
     
-    return current_user
+    await db.commit()
+    await db.refresh(user)
+    invalidate_cached_user(user.email)
+    mark_recent_write(user.id)
+    # Goal and timezone shape the live day summary
+    day_events.resync(user.id)
+    
+    return user
 
 
 @router.get("/me/stats")
 async def get_user_stats(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_user_read_db)
 ):
     """Get user statistics."""
-    from ..models import ProteinLog
-    from datetime import datetime, timedelta
-    from sqlalchemy import func
-    
-    today = datetime.now().date()
+    today = local_today(current_user.timezone)
     week_ago = today - timedelta(days=7)
+    this_week = DailyProteinTotal.day >= week_ago
     
-    # Total logs
-    total_logs = db.query(func.count(ProteinLog.id)).filter(
-        ProteinLog.user_id == current_user.id
-    ).scalar()
-    
-    # This week's protein
-    weekly_protein = db.query(func.sum(ProteinLog.protein_amount)).filter(
-        ProteinLog.user_id == current_user.id,
-        func.date(ProteinLog.logged_at) >= week_ago
-    ).scalar() or 0
-    
-    # Days with logs this week (streak approximation)
-    days_logged = db.query(func.count(func.distinct(func.date(ProteinLog.logged_at)))).filter(
-        ProteinLog.user_id == current_user.id,
-        func.date(ProteinLog.logged_at) >= week_ago
-    ).scalar()
+    # One pass over the user's daily rollup rows: total logs ever, this
+    # week's protein and days with logs this week (streak approximation)
+    total_logs, weekly_protein, days_logged = (await db.execute(
+        select(
+            func.coalesce(func.sum(DailyProteinTotal.count), 0),
+            func.coalesce(func.sum(case((this_week, DailyProteinTotal.total), else_=0.0)), 0),
+            func.count(case((this_week, 1))),
+        ).where(DailyProteinTotal.user_id == current_user.id)
+    )).one()
     
-    return {
-        "total_logs": total_logs,
-        "weekly_protein": round(weekly_protein, 1),
-        "days_logged_this_week": days_logged,
-        "protein_goal": current_user.protein_goal,
-    }
+    return user_stats(total_logs, weekly_protein, days_logged, current_user.protein_goal)
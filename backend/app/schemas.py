@@ -1,7 +1,18 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional
+from pydantic import BaseModel, EmailStr, Field, field_validator
+from typing import Generic, List, Optional, Tuple, TypeVar
 from datetime import datetime
 
+from .timezones import as_utc, is_valid_timezone
+
+
+T = TypeVar("T")
+
+
+class Page(BaseModel, Generic[T]):
+    """One page of a keyset-paginated listing; pass next_cursor back as ?cursor=."""
+    items: List[T]
+    next_cursor: Optional[str] = None
+
 
 # ============ User Schemas ============
 
@@ -20,6 +31,14 @@ class UserUpdate(BaseModel):
     full_name: Optional[str] = None
     location: Optional[str] = None
     protein_goal: Optional[int] = None
+    timezone: Optional[str] = None
+
+    @field_validator("timezone")
+    @classmethod
+    def check_timezone(cls, value: Optional[str]) -> Optional[str]:
+        if value is not None and not is_valid_timezone(value):
+            raise ValueError("Unknown timezone, expected an IANA name like 'Europe/Berlin'")
+        return value
 
 
 class UserOut(BaseModel):
@@ -28,9 +47,16 @@ class UserOut(BaseModel):
     full_name: Optional[str] = None
     location: Optional[str] = None
     protein_goal: int
+    timezone: str = "UTC"
     is_active: bool
     created_at: datetime
 
+    @field_validator("created_at")
+    @classmethod
+    def check_created_at(cls, value: datetime) -> datetime:
+        # Stored in UTC; SQLite hands it back naive, so mark it, like the list responses
+        return as_utc(value)
+
     class Config:
         from_attributes = True
 
@@ -40,6 +66,13 @@ class UserOut(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: str
+    # Seconds until the access token expires
+    expires_in: int
+
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 
 class TokenData(BaseModel):
@@ -53,16 +86,36 @@ class ProteinLogCreate(BaseModel):
     protein_amount: float
 
 
+class ProteinLogBatchEntry(ProteinLogCreate):
+    logged_at: Optional[datetime] = None
+    client_key: Optional[str] = Field(None, min_length=1, max_length=64)
+
+
+class ProteinLogBatch(BaseModel):
+    entries: List[ProteinLogBatchEntry] = Field(..., min_length=1, max_length=100)
+
+
 class ProteinLogOut(BaseModel):
     id: int
     food_name: str
     protein_amount: float
     logged_at: datetime
+    client_key: Optional[str] = None
+
+    @field_validator("logged_at")
+    @classmethod
+    def check_logged_at(cls, value: datetime) -> datetime:
+        return as_utc(value)
 
     class Config:
         from_attributes = True
 
 
+class ProteinLogBatchOut(BaseModel):
+    created: List[ProteinLogOut]
+    existing: List[ProteinLogOut]
+
+
 # ============ Food Schemas ============
 
 class FoodOut(BaseModel):
@@ -76,3 +129,29 @@ class FoodOut(BaseModel):
     class Config:
         from_attributes = True
 
+
+
+# ============ Price Schemas ============
+
+class StorePriceOut(BaseModel):
+    store_id: int
+    store_name: str
+    food_id: int
+    food_name: str
+    price: float
+    unit: str
+    # Grams of protein per dollar; None when the price's unit is not recognised
+    protein_per_dollar: Optional[float] = None
+    distance_miles: Optional[float] = None
+
+
+class PriceImportReport(BaseModel):
+    read: int
+    upserted: int
+    rejected: int
+    created_foods: int
+    created_stores: int
+    elapsed_seconds: float
+    rows_per_second: float
+    # (line number, reason) for the first rejected lines
+    rejections: List[Tuple[int, str]]
@@ -0,0 +1,141 @@
+"""In-process food name search.
+
+A leading-wildcard ``ILIKE`` can't use the ``name`` index, so ``/foods/?search=``
+is served from an inverted index over the words of every food name instead.
+Each query word matches any name word it is a prefix of ("tof" finds "Tofu"),
+which is what search-as-you-type needs, and results are ranked by how well the
+name matches rather than by protein alone. The index is part of the food
+catalog snapshot (``app.catalog``) and is rebuilt with it.
+"""
+import heapq
+import re
+import unicodedata
+from array import array
+from bisect import bisect_left
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+# Sorts after every character a normalized word can contain
+_PREFIX_END = "\x7f"
+
+# (id, name, protein_per_100g, category, is_vegan)
+FoodRow = Tuple[int, str, float, Optional[str], bool]
+
+
+def normalize(text: str) -> str:
+    """Lowercase ASCII words separated by single spaces ("Crème Fraîche" -> "creme fraiche")."""
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+    return " ".join(_WORD.findall(text.lower()))
+
+
+class FoodSearchIndex:
+    """Immutable word-prefix index over food rows.
+
+    Foods are numbered in static rank order (shorter names first, then higher
+    protein, then id), so among equally good matches the smallest ordinal
+    wins and every lookup can stop as soon as it has a page. Two structures
+    serve the two ranking tiers:
+
+    * names in alphabetical order, so "name starts with the query" is one
+      bisected range;
+    * ordinal-sorted postings per word, keyed by a sorted word list, so a
+      word prefix is a contiguous slice that merges lazily in rank order.
+    """
+
+    def __init__(self, rows: Iterable[FoodRow]):
+        docs = sorted(
+            ((normalize(name), protein, food_id, category, bool(is_vegan))
+             for food_id, name, protein, category, is_vegan in rows),
+            key=lambda doc: (len(doc[0]), -doc[1], doc[2]),
+        )
+        self.ids = array("q", (doc[2] for doc in docs))
+        self.names = [doc[0] for doc in docs]
+        categories = {}
+        self.categories = [categories.setdefault(doc[3], doc[3]) for doc in docs]
+        self.vegan = bytearray(doc[4] for doc in docs)
+        del docs
+
+        self.alpha = array("i", sorted(range(len(self.names)), key=self.names.__getitem__))
+        self.alpha_names = [self.names[o] for o in self.alpha]
+
+        postings = {}
+        for ordinal, name in enumerate(self.names):
+            for word in set(name.split()):
+                postings.setdefault(word, []).append(ordinal)
+        self.words = sorted(postings)
+        self.postings = [array("i", postings[word]) for word in self.words]
+        # Running posting counts, to size a prefix's matches in O(1)
+        self.offsets = array("q", [0])
+        for word_postings in self.postings:
+            self.offsets.append(self.offsets[-1] + len(word_postings))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def search(
+        self,
+        query: str,
+        limit: int,
+        offset: int = 0,
+        category: Optional[str] = None,
+        vegan_only: bool = False,
+    ) -> List[int]:
+        """Food ids for ranks ``offset`` to ``offset + limit``, best match first.
+
+        Every query word must prefix-match a word of the name. Names that
+        start with the whole query rank first, the rest follow; ties go to
+        the static order.
+        """
+        phrase = normalize(query)
+        terms = phrase.split()
+        if not terms:
+            return []
+        wanted = offset + limit
+        keep = self._filter(category, vegan_only)
+
+        lo = bisect_left(self.alpha_names, phrase)
+        hi = bisect_left(self.alpha_names, phrase + _PREFIX_END, lo)
+        starts = self.alpha[lo:hi]
+        if keep is not None:
+            starts = [o for o in starts if keep(o)]
+        best = heapq.nsmallest(wanted, starts)
+        if len(best) < wanted:
+            best.extend(islice(self._word_matches(terms, phrase, keep), wanted - len(best)))
+        return [self.ids[o] for o in best[offset:]]
+
+    def _filter(self, category: Optional[str], vegan_only: bool) -> Optional[Callable[[int], bool]]:
+        if category is None and not vegan_only:
+            return None
+        categories, vegan = self.categories, self.vegan
+        return lambda o: (category is None or categories[o] == category) and (not vegan_only or vegan[o])
+
+    def _word_range(self, term: str) -> Tuple[int, int]:
+        lo = bisect_left(self.words, term)
+        return lo, bisect_left(self.words, term + _PREFIX_END, lo)
+
+    def _word_matches(self, terms: List[str], phrase: str, keep) -> Iterator[int]:
+        """Ordinals, in rank order, whose words match every term but that don't start with ``phrase``."""
+        def size(term):
+            lo, hi = self._word_range(term)
+            return self.offsets[hi] - self.offsets[lo]
+
+        # Stream the most selective word's postings; check the rest on the name
+        lead = min(terms, key=size)
+        lo, hi = self._word_range(lead)
+        others = [" " + term for term in terms if term != lead]
+        names, previous = self.names, -1
+        for ordinal in heapq.merge(*self.postings[lo:hi]):
+            if ordinal == previous:
+                continue
+            previous = ordinal
+            name = names[ordinal]
+            if name.startswith(phrase) or (keep is not None and not keep(ordinal)):
+                continue
+            if others:
+                padded = " " + name
+                if not all(term in padded for term in others):
+                    continue
+            yield ordinal
@@ -0,0 +1,213 @@
+"""Protein logs and totals over arbitrary date ranges.
+
+Totals come from the daily_protein_totals rollup with a single range query;
+bucketing and gap-filling happen in Python, so any window costs exactly one
+round trip regardless of its length. Raw-log queries are built here too so
+every caller filters on index-friendly ``logged_at`` ranges.
+"""
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Tuple
+
+from sqlalchemy import Select, and_, func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import DailyProteinTotal, ProteinLog
+from .timezones import as_utc, day_bounds, local_day
+
+BUCKETS = ("day", "week", "month")
+
+DayTotals = Dict[date, Tuple[float, int]]
+
+
+async def fetch_daily_totals(db: AsyncSession, user_id: int, start: date, end: date) -> DayTotals:
+    """``{day: (protein, log_count)}`` for days in ``[start, end]`` that have logs."""
+    rows = await db.execute(
+        select(DailyProteinTotal.day, DailyProteinTotal.total, DailyProteinTotal.count).where(
+            DailyProteinTotal.user_id == user_id,
+            DailyProteinTotal.day.between(start, end),
+        )
+    )
+    return {day: (total, count) for day, total, count in rows}
+
+
+def user_logs(user_id: int) -> Select:
+    """All of a user's logs, newest first (an index scan on user_id, logged_at, id)."""
+    return (
+        select(ProteinLog)
+        .where(ProteinLog.user_id == user_id)
+        .order_by(ProteinLog.logged_at.desc(), ProteinLog.id.desc())
+    )
+
+
+def logs_before(query: Select, logged_at: datetime, log_id: int) -> Select:
+    """Keyset condition: rows that sort after ``(logged_at, log_id)`` newest-first.
+
+    A row-value comparison matches the index order exactly, so the page is a
+    single index range with no sort.
+    """
+    return query.where(tuple_(ProteinLog.logged_at, ProteinLog.id) < tuple_(logged_at, log_id))
+
+
+def logs_between(user_id: int, first: date, last: date, tz_name: str) -> Select:
+    """Raw logs for local days ``first``..``last``, newest first.
+
+    Filters on a half-open ``logged_at`` range rather than ``date(logged_at)``
+    so the ``(user_id, logged_at)`` index can be used.
+    """
+    start, end = day_bounds(first, last, tz_name)
+    return user_logs(user_id).where(
+        ProteinLog.logged_at >= start,
+        ProteinLog.logged_at < end,
+    )
+
+
+def day_progress(total_protein: float, log_count: int, goal: int) -> dict:
+    """The totals of a day summary (``/today`` and its stream)."""
+    remaining = max(goal - total_protein, 0)
+    progress = min((total_protein / goal) * 100, 100) if goal > 0 else 0
+    return {
+        "total_protein": round(total_protein, 1),
+        "goal": goal,
+        "remaining": round(remaining, 1),
+        "progress_percent": round(progress, 1),
+        "log_count": log_count,
+    }
+
+
+def today_summary(day: date, logs, goal: int) -> dict:
+    """The ``/today`` body from the day's logs, oldest first."""
+    return {
+        "date": day.isoformat(),
+        **day_progress(sum(log.protein_amount for log in logs), len(logs), goal),
+        "logs": [log_entry(log) for log in logs]
+    }
+
+
+def weekly_summary(today: date, totals: DayTotals, goal: int) -> dict:
+    """The ``/weekly`` body: the seven days ending ``today``."""
+    week_start = today - timedelta(days=6)
+    daily_totals = []
+    for i in range(7):
+        day = week_start + timedelta(days=i)
+        total = totals.get(day, (0, 0))[0]
+        daily_totals.append({
+            "date": day.isoformat(),
+            "day_name": day.strftime("%a"),
+            "protein": round(total, 1),
+            "goal_met": total >= goal
+        })
+    
+    total_weekly = sum(d["protein"] for d in daily_totals)
+    days_goal_met = sum(1 for d in daily_totals if d["goal_met"])
+    
+    return {
+        "week_start": week_start.isoformat(),
+        "week_end": today.isoformat(),
+        "daily_totals": daily_totals,
+        "total_weekly_protein": round(total_weekly, 1),
+        "average_daily": round(total_weekly / 7, 1),
+        "days_goal_met": days_goal_met,
+        "goal": goal
+    }
+
+
+def user_stats(total_logs: int, weekly_protein: float, days_logged: int, goal: int) -> dict:
+    """The ``/users/me/stats`` body; "this week" is the eight days from ``today - 7``."""
+    return {
+        "total_logs": total_logs,
+        "weekly_protein": round(weekly_protein, 1),
+        "days_logged_this_week": days_logged,
+        "protein_goal": goal,
+    }
+
+
+def recent_logs_with_count(user_id: int, first: date, last: date, tz_name: str) -> Select:
+    """Logs of local days ``first``..``last``, oldest first, each row also
+    carrying the user's all-time ``total_logs`` from the rollup.
+
+    The logs are outer-joined to the one-row count, so the count comes back
+    (with NULL log columns) even when the window is empty.
+    """
+    start, end = day_bounds(first, last, tz_name)
+    count = select(
+        func.coalesce(func.sum(DailyProteinTotal.count), 0).label("total_logs")
+    ).where(DailyProteinTotal.user_id == user_id).subquery()
+    return (
+        select(count.c.total_logs, ProteinLog.id, ProteinLog.food_name, ProteinLog.protein_amount, ProteinLog.logged_at)
+        .select_from(count.outerjoin(ProteinLog, and_(
+            ProteinLog.user_id == user_id,
+            ProteinLog.logged_at >= start,
+            ProteinLog.logged_at < end,
+        )))
+        .order_by(ProteinLog.logged_at, ProteinLog.id)
+    )
+
+
+def totals_by_local_day(logs, tz_name: str) -> DayTotals:
+    """``{day: (protein, log_count)}`` for raw logs, bucketed like the rollup."""
+    totals: DayTotals = {}
+    for log in logs:
+        day = local_day(log.logged_at, tz_name)
+        total, count = totals.get(day, (0.0, 0))
+        totals[day] = (total + log.protein_amount, count + 1)
+    return totals
+
+
+def log_entry(log) -> dict:
+    """A log as listed in a day summary.
+
+    ``logged_at`` is an aware UTC datetime, so it renders with a ``Z`` through
+    APIJSONResponse and the SSE encoder alike, whatever the database returned.
+    """
+    return {
+        "id": log.id,
+        "food_name": log.food_name,
+        "protein_amount": log.protein_amount,
+        "logged_at": as_utc(log.logged_at)
+    }
+
+
+def bucket_start(day: date, bucket: str) -> date:
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+
+def _next_bucket(start: date, bucket: str) -> date:
+    if bucket == "week":
+        return start + timedelta(days=7)
+    if bucket == "month":
+        return date(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return start + timedelta(days=1)
+
+
+def bucket_totals(totals: DayTotals, start: date, end: date, bucket: str, goal: int) -> List[dict]:
+    """Gap-filled buckets covering ``[start, end]``, clipped to the range."""
+    result = []
+    current = bucket_start(start, bucket)
+    while current <= end:
+        following = _next_bucket(current, bucket)
+        first, last = max(current, start), min(following - timedelta(days=1), end)
+        protein, log_count, days_logged, days_goal_met = 0.0, 0, 0, 0
+        day = first
+        while day <= last:
+            day_total, day_count = totals.get(day, (0.0, 0))
+            if day_count:
+                protein += day_total
+                log_count += day_count
+                days_logged += 1
+                if day_total >= goal:
+                    days_goal_met += 1
+            day += timedelta(days=1)
+        result.append({
+            "start": first.isoformat(),
+            "end": last.isoformat(),
+            "protein": round(protein, 1),
+            "log_count": log_count,
+            "days_logged": days_logged,
+            "days_goal_met": days_goal_met,
+        })
+        current = following
+    return result
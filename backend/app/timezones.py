@@ -0,0 +1,51 @@
+"""Day boundaries in the user's own timezone.
+
+Log timestamps are stored in UTC. A user's "day" runs from local midnight to
+local midnight, so range filters are built as half-open UTC intervals
+``[start, end)`` that the ``(user_id, logged_at)`` index can serve directly.
+"""
+from datetime import date, datetime, time, timedelta, timezone
+from functools import lru_cache
+from typing import Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+DEFAULT_TIMEZONE = "UTC"
+
+
+def is_valid_timezone(name: str) -> bool:
+    try:
+        ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return False
+    return True
+
+
+@lru_cache(maxsize=512)
+def get_zone(name: str) -> ZoneInfo:
+    """ZoneInfo for ``name``, falling back to UTC for unknown names."""
+    try:
+        return ZoneInfo(name or DEFAULT_TIMEZONE)
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo(DEFAULT_TIMEZONE)
+
+
+def local_today(tz_name: str) -> date:
+    return datetime.now(get_zone(tz_name)).date()
+
+
+def as_utc(value: datetime) -> datetime:
+    """A stored timestamp as an aware UTC datetime (SQLite hands back naive UTC)."""
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def local_day(logged_at: datetime, tz_name: str) -> date:
+    """The local calendar day of a stored timestamp; naive values are UTC."""
+    return as_utc(logged_at).astimezone(get_zone(tz_name)).date()
+
+
+def day_bounds(first: date, last: date, tz_name: str) -> Tuple[datetime, datetime]:
+    """UTC ``[start, end)`` covering local days ``first`` through ``last``."""
+    zone = get_zone(tz_name)
+    start = datetime.combine(first, time.min, tzinfo=zone)
+    end = datetime.combine(last + timedelta(days=1), time.min, tzinfo=zone)
+    return start.astimezone(timezone.utc), end.astimezone(timezone.utc)
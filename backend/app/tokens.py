@@ -0,0 +1,154 @@
+"""Refresh tokens and the revoked-session list.
+
+Logging in starts a session: a short-lived JWT access token plus an opaque
+refresh token. ``POST /auth/refresh`` trades the refresh token for a new pair
+without the password, so renewing costs a SHA-256 and an indexed lookup
+instead of a bcrypt verify. Refresh tokens are 256 random bits, so a fast
+hash is as safe as a slow one; only the hash is stored.
+
+Each refresh token works once. Presenting one that was already exchanged
+means it leaked (or a client replayed it), so the whole session is revoked,
+as it is on logout.
+
+Access tokens carry their session id as ``sid``. ``revoked_sessions`` holds
+the sessions revoked within the last access token lifetime, so
+``get_current_user`` rejects their access tokens with a set lookup. A
+revocation applies at once on the worker that made it; other workers pick it
+up within REVOCATION_POLL_SECONDS.
+"""
+import asyncio
+import hashlib
+import secrets
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .models import RefreshToken, User
+
+ACCESS_TOKEN_LIFETIME = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+REFRESH_TOKEN_LIFETIME = timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+
+# Each poll re-reads this much before the previous one, for revocations that
+# were still committing (or stamped by a worker whose clock is behind)
+REVOCATION_POLL_OVERLAP = timedelta(seconds=30)
+
+
+def hash_refresh_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes; they are UTC
+    return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+
+
+def new_refresh_token(db: AsyncSession, user_id: int, session_id: Optional[str] = None) -> Tuple[str, str]:
+    """Add a refresh token for ``user_id`` (a new session unless ``session_id`` is given).
+
+    Returns ``(token, session_id)``; the caller commits.
+    """
+    token = secrets.token_urlsafe(32)
+    session_id = session_id or secrets.token_hex(16)
+    db.add(RefreshToken(
+        user_id=user_id,
+        session_id=session_id,
+        token_hash=hash_refresh_token(token),
+        expires_at=datetime.now(timezone.utc) + REFRESH_TOKEN_LIFETIME,
+    ))
+    return token, session_id
+
+
+async def revoke_session(db: AsyncSession, session_id: str) -> None:
+    """Revoke every refresh token of a session, and its access tokens on this worker. Does not commit."""
+    await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.session_id == session_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=datetime.now(timezone.utc))
+    )
+    revoked_sessions.add(session_id)
+
+
+async def use_refresh_token(db: AsyncSession, token: str) -> Optional[Tuple[int, str, str]]:
+    """Mark a current refresh token used; ``(user_id, email, session_id)``, or None if it is not valid.
+
+    Reusing a token that was already exchanged revokes its session. Does not commit.
+    """
+    now = datetime.now(timezone.utc)
+    row = (await db.execute(
+        select(RefreshToken.id, RefreshToken.user_id, RefreshToken.session_id, RefreshToken.expires_at,
+               RefreshToken.used_at, RefreshToken.revoked_at, User.email, User.is_active)
+        .join(User, User.id == RefreshToken.user_id)
+        .where(RefreshToken.token_hash == hash_refresh_token(token))
+    )).first()
+    if row is None or row.revoked_at is not None or _as_utc(row.expires_at) <= now or not row.is_active:
+        return None
+    if row.used_at is None:
+        claimed = (await db.execute(
+            update(RefreshToken)
+            .where(RefreshToken.id == row.id, RefreshToken.used_at.is_(None))
+            .values(used_at=now)
+        )).rowcount
+        if claimed:
+            return row.user_id, row.email, row.session_id
+    # Already exchanged, by an earlier request or one racing this one
+    await revoke_session(db, row.session_id)
+    return None
+
+
+async def find_session(db: AsyncSession, token: str) -> Optional[str]:
+    """Session id of a refresh token in any state, or None."""
+    return await db.scalar(
+        select(RefreshToken.session_id).where(RefreshToken.token_hash == hash_refresh_token(token))
+    )
+
+
+def prune_refresh_tokens(db: Session) -> int:
+    """Delete tokens that expired longer ago than an access token lives. Does not commit."""
+    cutoff = datetime.now(timezone.utc) - ACCESS_TOKEN_LIFETIME
+    return db.execute(delete(RefreshToken).where(RefreshToken.expires_at < cutoff)).rowcount
+
+
+class RevocationList:
+    """Sessions revoked within the last access token lifetime, per worker."""
+
+    def __init__(self):
+        # session id -> time.time() after which none of its access tokens are valid anyway
+        self._revoked: Dict[str, float] = {}
+        self._since: Optional[datetime] = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def __contains__(self, session_id: Optional[str]) -> bool:
+        return session_id in self._revoked
+
+    def __len__(self) -> int:
+        return len(self._revoked)
+
+    def add(self, session_id: str) -> None:
+        self._revoked[session_id] = time.time() + ACCESS_TOKEN_LIFETIME.total_seconds()
+
+    async def sync(self, db: AsyncSession) -> None:
+        """Pick up revocations from other workers, at most every REVOCATION_POLL_SECONDS."""
+        if time.monotonic() - self._checked_at < settings.REVOCATION_POLL_SECONDS or self._lock.locked():
+            return
+        async with self._lock:
+            now = datetime.now(timezone.utc)
+            since = self._since or now - ACCESS_TOKEN_LIFETIME
+            result = await db.execute(
+                select(RefreshToken.session_id).where(RefreshToken.revoked_at >= since).distinct()
+            )
+            for session_id in result.scalars():
+                self.add(session_id)
+            self._since = now - REVOCATION_POLL_OVERLAP
+            self._checked_at = time.monotonic()
+            expired = [session_id for session_id, until in self._revoked.items() if until <= time.time()]
+            for session_id in expired:
+                del self._revoked[session_id]
+
+
+revoked_sessions = RevocationList()
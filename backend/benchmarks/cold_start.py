@@ -0,0 +1,139 @@
+"""Cold start: from launching a server process to its first 200 responses.
+
+Migrates and seeds a throwaway SQLite database (or a scratch
+``--database-url``), then starts ``uvicorn app.main:app`` in a fresh process
+several times, as a scale-to-zero deploy does on wake-up, and measures from
+launch until ``/health`` first answers 200 and until the first catalog read
+(``/api/foods/``) and signed-in read (``/api/protein-logs/today``) do. The
+import of ``app.main`` alone is timed separately.
+
+    python -m benchmarks.cold_start
+    python -m benchmarks.cold_start --runs 10 --env STARTUP_WARMUP=true
+
+To compare with an older tree, check it out somewhere and point
+``--baseline-dir`` at its ``backend``::
+
+    git worktree add /tmp/vp-before <ref>
+    python -m benchmarks.cold_start --baseline-dir /tmp/vp-before/backend
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from .common import auth_headers, configure_env, free_port, seed_protein_history
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SCRIPT = "import time; started = time.perf_counter(); import app.main; print(time.perf_counter() - started)"
+
+# (result key, path, needs the user's token)
+FIRST_REQUESTS = [
+    ("health_s", "/health", False),
+    ("first_catalog_s", "/api/foods/?limit=20", False),
+    ("first_user_read_s", "/api/protein-logs/today", True),
+]
+
+
+def _prepare_database(database_url: str) -> dict:
+    """Run the migrations and seed a catalog and one user; returns that user's auth headers."""
+    from .suite import seed_catalog
+
+    subprocess.run(
+        [sys.executable, "-m", "alembic", "upgrade", "head"],
+        cwd=BACKEND_DIR, env=os.environ, check=True, capture_output=True,
+    )
+    emails = seed_protein_history(1, days=30, logs_per_day=3)
+    seed_catalog(foods=5000, stores=2000, prices_per_store=5)
+    return auth_headers(emails[0])
+
+
+def _time_import(app_dir: str) -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT], cwd=app_dir, env=os.environ, check=True, capture_output=True, text=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def _time_start(app_dir: str, headers: dict, timeout: float) -> dict:
+    import httpx
+
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--app-dir", app_dir, "--log-level", "warning"],
+        cwd=app_dir, env=os.environ, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    result = {}
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=timeout) as client:
+            for key, path, signed_in in FIRST_REQUESTS:
+                while True:
+                    if time.perf_counter() - started > timeout:
+                        raise TimeoutError(f"{path} did not answer 200 within {timeout}s")
+                    if server.poll() is not None:
+                        raise RuntimeError(f"server exited with status {server.returncode}")
+                    try:
+                        response = client.get(path, headers=headers if signed_in else None)
+                    except httpx.TransportError:
+                        time.sleep(0.005)
+                        continue
+                    if response.status_code == 200:
+                        break
+                    raise RuntimeError(f"{path} answered {response.status_code}")
+                result[key] = round(time.perf_counter() - started, 4)
+    finally:
+        server.terminate()
+        server.wait()
+    return result
+
+
+def _summary(samples) -> dict:
+    return {
+        "median_s": round(statistics.median(samples), 4),
+        "min_s": round(min(samples), 4),
+        "max_s": round(max(samples), 4),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--baseline-dir", help="backend directory of an older tree to measure first")
+    parser.add_argument("--database-url", help="scratch database to migrate and seed (default: temporary SQLite file)")
+    parser.add_argument("--env", nargs="*", default=[], metavar="KEY=VALUE", help="settings for the server")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds to wait for each server")
+    parser.add_argument("--json", action="store_true", help="print raw results as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        configure_env(database_url, **dict(item.split("=", 1) for item in args.env))
+        headers = _prepare_database(database_url)
+
+        trees = ([("baseline", os.path.abspath(args.baseline_dir))] if args.baseline_dir else []) + [("current", BACKEND_DIR)]
+        results = []
+        for label, app_dir in trees:
+            runs = []
+            for _ in range(args.runs):
+                run = {"import_s": round(_time_import(app_dir), 4)}
+                run.update(_time_start(app_dir, headers, args.timeout))
+                runs.append(run)
+            results.append({"label": label, **{key: _summary([run[key] for run in runs]) for key in runs[0]}})
+
+    if args.json:
+        print(json.dumps(results))
+        return
+
+    keys = ["import_s"] + [key for key, _, _ in FIRST_REQUESTS]
+    print(f"{'median seconds':<20}" + "".join(f"{key:>20}" for key in keys))
+    for r in results:
+        print(f"{r['label']:<20}" + "".join(f"{r[key]['median_s']:>20}" for key in keys))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""Shared helpers for the benchmark scripts.
+
+Benchmarks are run from the ``backend`` directory, e.g.::
+
+    python -m benchmarks.event_loop_latency
+
+They configure the app through environment variables before importing it, so
+each measured configuration runs in its own interpreter.
+"""
+import asyncio
+import os
+import random
+import socket
+import sys
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+
+BENCH_PASSWORD = "benchmark-password"
+
+
+def percentile(samples, pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(samples) -> dict:
+    """Latency summary in milliseconds."""
+    return {
+        "count": len(samples),
+        "mean_ms": round(sum(samples) / len(samples) * 1000, 3) if samples else 0.0,
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 95) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+        "max_ms": round(max(samples) * 1000, 3) if samples else 0.0,
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def configure_env(database_url: str, app_dir: str = None, **overrides) -> None:
+    """Point the app at ``database_url``; must run before ``import app``."""
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    # One in-process client sends everything: it would spend every budget and,
+    # sharing the event loop, look like lag. Pass overrides to measure them.
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    os.environ.setdefault("SHED_MAX_IN_FLIGHT", "0")
+    os.environ.setdefault("SHED_LOOP_LAG_MS", "0")
+    for key, value in overrides.items():
+        os.environ[key] = str(value)
+    if app_dir:
+        sys.path.insert(0, os.path.abspath(app_dir))
+
+
+def seed_protein_history(users: int, days: int, logs_per_day: int, seed: int = 7):
+    """Create ``users`` accounts with ``days`` of protein logs each.
+
+    Returns the list of user emails. Uses the sync engine and bulk inserts so
+    seeding stays fast even for years of history.
+    """
+    from app.auth import get_password_hash
+    from app.database import Base, SessionLocal, engine
+    from app.models import ProteinLog, User
+
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(seed)
+    hashed = get_password_hash(BENCH_PASSWORD)
+    now = datetime.now(timezone.utc)
+    emails = [f"bench{i}@example.com" for i in range(users)]
+
+    with SessionLocal() as db:
+        db.execute(User.__table__.insert(), [
+            {"email": email, "hashed_password": hashed, "full_name": "Bench", "protein_goal": 120, "is_active": True}
+            for email in emails
+        ])
+        user_ids = [row[0] for row in db.execute(User.__table__.select().with_only_columns(User.id))]
+        batch = []
+        for user_id in user_ids:
+            for day in range(days):
+                for _ in range(logs_per_day):
+                    logged_at = now - timedelta(days=day, minutes=rng.randint(0, 600))
+                    batch.append({
+                        "user_id": user_id,
+                        "food_name": "Tofu (Firm)",
+                        "protein_amount": round(rng.uniform(5, 40), 1),
+                        "logged_at": logged_at,
+                    })
+                if len(batch) >= 10_000:
+                    db.execute(ProteinLog.__table__.insert(), batch)
+                    batch.clear()
+        if batch:
+            db.execute(ProteinLog.__table__.insert(), batch)
+        db.commit()
+
+        try:
+            from app.rollups import rebuild_daily_totals
+        except ImportError:  # measuring an older tree without the rollup
+            pass
+        else:
+            rebuild_daily_totals(db)
+            db.commit()
+    return emails
+
+
+def auth_headers(email: str) -> dict:
+    from app.auth import create_access_token
+
+    return {"Authorization": f"Bearer {create_access_token({'sub': email})}"}
+
+
+async def run_load(send, total: int, concurrency: int):
+    """Issue ``total`` calls of ``send(i)`` with ``concurrency`` workers.
+
+    Returns ``(latencies, elapsed_seconds, errors)``.
+    """
+    latencies = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            response = await send(i)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - started, errors
+
+
+@asynccontextmanager
+async def asgi_client(app):
+    """In-process client for ``app``, run inside the app's lifespan (startup and shutdown)."""
+    import httpx
+
+    # Shutdown closes pooled connections; open aiosqlite connections keep the process alive
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            yield client
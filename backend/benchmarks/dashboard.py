@@ -0,0 +1,99 @@
+"""Dashboard load: ``/dashboard`` against the four calls it replaces.
+
+Seeds a throwaway SQLite database with users holding ``--days`` of logs and
+drives dashboard loads through the ASGI app in-process, first as the four
+requests the page used to make (``/users/me``, ``/protein-logs/today``,
+``/protein-logs/weekly`` and ``/users/me/stats``, sent together as a
+browser would), then as one ``/dashboard`` request. Reports loads per
+second, load latency and the database statements each load runs.
+
+    python -m benchmarks.dashboard
+    python -m benchmarks.dashboard --loads 5000 --concurrency 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+
+from .common import asgi_client, auth_headers, configure_env, run_load, seed_protein_history, summarize
+
+FOUR_CALLS = ("/api/users/me", "/api/protein-logs/today", "/api/protein-logs/weekly", "/api/users/me/stats")
+DASHBOARD = ("/api/dashboard",)
+
+
+class StatementCounter:
+    """Statements run on any engine while counting."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, *args) -> None:
+        self.count += 1
+
+
+async def _measure(args) -> dict:
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    from app.main import app
+
+    emails = seed_protein_history(args.users, args.days, args.logs_per_day)
+    headers = [auth_headers(email) for email in emails]
+    statements = StatementCounter()
+    event.listen(Engine, "before_cursor_execute", statements)
+
+    results = {"users": args.users, "loads": args.loads}
+    async with asgi_client(app) as client:
+        for name, paths in (("four calls", FOUR_CALLS), ("dashboard", DASHBOARD)):
+            async def load(i, paths=paths):
+                responses = await asyncio.gather(
+                    *(client.get(path, headers=headers[i % len(headers)]) for path in paths)
+                )
+                # run_load counts a load failed if its worst response did
+                return max(responses, key=lambda response: response.status_code)
+
+            # Warm up: first calls fill the user cache and the pools
+            for i in range(len(headers)):
+                await load(i)
+            before = statements.count
+            latencies, elapsed, errors = await run_load(load, args.loads, args.concurrency)
+            results[name] = {
+                "loads_per_s": round(len(latencies) / elapsed, 1),
+                "errors": errors,
+                "statements_per_load": round((statements.count - before) / args.loads, 1),
+                **summarize(latencies),
+            }
+    event.remove(Engine, "before_cursor_execute", statements)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--loads", type=int, default=2000, help="dashboard loads per variant")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--logs-per-day", type=int, default=4)
+    parser.add_argument("--json", action="store_true", help="print raw results as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        configure_env(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        results = asyncio.run(_measure(args))
+
+    if args.json:
+        print(json.dumps(results))
+        return
+    print(f"{results['loads']} loads over {results['users']} users")
+    print(f"{'':<12}{'loads/s':>10}{'stmts':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for name in ("four calls", "dashboard"):
+        r = results[name]
+        print(
+            f"{name:<12}{r['loads_per_s']:>10}{r['statements_per_load']:>8}{r['p50_ms']:>10}{r['p95_ms']:>10}"
+            f"{r['p99_ms']:>10}{r['errors']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Latency under concurrent traffic: sync Session vs AsyncSession.
+
+Seeds a throwaway SQLite database, then drives the ASGI app in-process with
+concurrent clients. Cheap ``/protein-logs/today`` calls are mixed with the
+heavier ``/weekly`` and ``/users/me/stats`` calls, so a handler that blocks the
+event loop shows up directly in the tail latency of everything else.
+
+    python -m benchmarks.event_loop_latency
+    python -m benchmarks.event_loop_latency --modes sync async --requests 4000
+
+To get the numbers from before this code path existed, check the older tree
+out somewhere and point ``--baseline-dir`` at its ``backend`` directory::
+
+    git worktree add /tmp/vp-before <ref>
+    python -m benchmarks.event_loop_latency --baseline-dir /tmp/vp-before/backend
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from .common import asgi_client, auth_headers, configure_env, run_load, seed_protein_history, summarize
+
+HEAVY_PATHS = ("/api/protein-logs/weekly", "/api/users/me/stats")
+
+
+async def _measure(args) -> dict:
+    from app.main import app
+
+    emails = seed_protein_history(args.users, args.days, args.logs_per_day)
+    headers = [auth_headers(email) for email in emails]
+    light, heavy = [], []
+
+    async with asgi_client(app) as client:
+        async def send(i):
+            user_headers = headers[i % len(headers)]
+            is_heavy = i % args.heavy_every == 0
+            path = HEAVY_PATHS[i % 2] if is_heavy else "/api/protein-logs/today"
+            started = time.perf_counter()
+            response = await client.get(path, headers=user_headers)
+            (heavy if is_heavy else light).append(time.perf_counter() - started)
+            return response
+
+        latencies, elapsed, errors = await run_load(send, args.requests, args.concurrency)
+
+    return {
+        "mode": args.mode,
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "all": summarize(latencies),
+        "light": summarize(light),
+        "heavy": summarize(heavy),
+    }
+
+
+def _child(args) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        configure_env(
+            f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+            app_dir=args.baseline_dir if args.mode == "baseline" else None,
+            DATABASE_ASYNC="true" if args.mode == "async" else "false",
+        )
+        print(json.dumps(asyncio.run(_measure(args))))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", default=["sync", "async"], choices=["baseline", "sync", "async"])
+    parser.add_argument("--baseline-dir", help="backend directory of the tree to measure as 'baseline'")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--logs-per-day", type=int, default=4)
+    parser.add_argument("--heavy-every", type=int, default=10, help="every Nth request is a heavy one")
+    parser.add_argument("--mode", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        _child(args)
+        return
+
+    modes = list(args.modes)
+    if args.baseline_dir and "baseline" not in modes:
+        modes.insert(0, "baseline")
+    results = []
+    for mode in modes:
+        cmd = [sys.executable, "-m", "benchmarks.event_loop_latency", "--mode", mode] + sys.argv[1:]
+        output = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"{'mode':<10}{'rps':>10}{'p50 ms':>10}{'p99 ms':>10}{'light p99':>12}{'heavy p99':>12}")
+    for r in results:
+        print(
+            f"{r['mode']:<10}{r['throughput_rps']:>10}{r['all']['p50_ms']:>10}"
+            f"{r['all']['p99_ms']:>10}{r['light']['p99_ms']:>12}{r['heavy']['p99_ms']:>12}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Time to first byte, throughput and memory of ``/protein-logs/export``.
+
+Migrates and seeds a throwaway SQLite database (or a scratch
+``--database-url``) with one user holding ``--days`` x ``--logs-per-day``
+logs, starts ``uvicorn app.main:app`` with one worker and downloads the whole
+history as CSV, NDJSON and gzipped CSV. For each it reports the time to the
+first body byte, the total time, rows per second, the bytes sent and how far
+the server's peak resident memory rose above its level before the first
+export (it should stay flat as the history grows).
+
+    python -m benchmarks.export
+    python -m benchmarks.export --days 3650 --logs-per-day 100 --batch-size 5000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from .common import auth_headers, configure_env, free_port, seed_protein_history
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+VARIANTS = (
+    ("csv", "csv", "identity"),
+    ("ndjson", "ndjson", "identity"),
+    ("csv+gzip", "csv", "gzip"),
+)
+
+
+def _memory_kb(pid: int, field: str) -> int:
+    """A /proc status field such as VmRSS or VmHWM (Linux only; 0 elsewhere)."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def _download(base_url: str, headers: dict, export_format: str, encoding: str) -> dict:
+    import httpx
+
+    started = time.perf_counter()
+    first_byte = None
+    sent = 0
+    with httpx.stream(
+        "GET", f"{base_url}/api/protein-logs/export", params={"format": export_format},
+        headers={**headers, "Accept-Encoding": encoding}, timeout=None,
+    ) as response:
+        response.raise_for_status()
+        for chunk in response.iter_raw():
+            if first_byte is None:
+                first_byte = time.perf_counter() - started
+            sent += len(chunk)
+    return {"first_byte_ms": round(first_byte * 1000, 1), "total_s": time.perf_counter() - started, "bytes": sent}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="scratch database to migrate and seed (default: temporary SQLite file)")
+    parser.add_argument("--days", type=int, default=1825)
+    parser.add_argument("--logs-per-day", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=2000, help="EXPORT_BATCH_SIZE for the server")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--json", action="store_true", help="print raw results as JSON")
+    args = parser.parse_args()
+
+    rows = args.days * args.logs_per_day
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        configure_env(database_url, EXPORT_BATCH_SIZE=args.batch_size)
+        subprocess.run(
+            [sys.executable, "-m", "alembic", "upgrade", "head"],
+            cwd=BACKEND_DIR, env=os.environ, check=True, capture_output=True,
+        )
+        email = seed_protein_history(1, days=args.days, logs_per_day=args.logs_per_day)[0]
+
+        port = free_port()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=os.environ, stdout=subprocess.DEVNULL,
+        )
+        try:
+            import httpx
+
+            base_url = f"http://127.0.0.1:{port}"
+            deadline = time.perf_counter() + args.timeout
+            while True:
+                try:
+                    httpx.get(f"{base_url}/health")
+                    break
+                except httpx.TransportError:
+                    if time.perf_counter() > deadline or server.poll() is not None:
+                        raise RuntimeError("server did not start")
+                    time.sleep(0.05)
+
+            headers = auth_headers(email)
+            # Warm imports and the connection pool before the memory baseline
+            httpx.get(f"{base_url}/api/protein-logs/today", headers=headers).raise_for_status()
+            baseline = _memory_kb(server.pid, "VmRSS")
+            results = {"rows": rows, "batch_size": args.batch_size, "variants": {}}
+            for label, export_format, encoding in VARIANTS:
+                result = _download(base_url, headers, export_format, encoding)
+                peak = _memory_kb(server.pid, "VmHWM")
+                result["rows_per_s"] = round(rows / result.pop("total_s"))
+                result["peak_rss_growth_kb"] = max(peak - baseline, 0) if baseline else None
+                results["variants"][label] = result
+        finally:
+            server.terminate()
+            server.wait()
+
+    if args.json:
+        print(json.dumps(results))
+        return
+    print(f"{rows} rows, EXPORT_BATCH_SIZE={args.batch_size}, one worker")
+    print(f"{'':<12}{'first byte ms':>15}{'rows/s':>12}{'MiB sent':>12}{'peak RSS +KiB':>15}")
+    for label, r in results["variants"].items():
+        print(
+            f"{label:<12}{r['first_byte_ms']:>15}{r['rows_per_s']:>12}{r['bytes'] / 2**20:>12.1f}"
+            f"{r['peak_rss_growth_kb'] if r['peak_rss_growth_kb'] is not None else '-':>15}"
+        )
+
+
+if __name__ == "__main__":
+    main()
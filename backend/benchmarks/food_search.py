@@ -0,0 +1,143 @@
+"""Food name search latency: in-memory index vs ILIKE.
+
+Builds a synthetic catalog (500k foods by default) in a throwaway SQLite
+database, then times the index build and a mix of search-as-you-type queries
+against ``FoodSearchIndex``. With ``--compare-sql`` the same queries also run
+as the old ``name ILIKE '%q%' ORDER BY protein`` scan for comparison.
+
+    python -m benchmarks.food_search
+    python -m benchmarks.food_search --foods 100000 --compare-sql
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from .common import configure_env, summarize
+
+BRANDS = ["", "", "", "Organic ", "Trader's ", "Good Earth ", "Green Valley ", "Nature's Best ", "Homestyle "]
+STYLES = ["", "", "Smoked ", "Roasted ", "Spicy ", "Sprouted ", "Extra Firm ", "Silken ", "Toasted ", "Raw ",
+          "Baked ", "Marinated ", "Teriyaki ", "Garlic ", "Crème ", "Unsweetened ", "Low Sodium "]
+BASES = ["Tofu", "Tempeh", "Seitan", "Lentils", "Chickpeas", "Black Beans", "Edamame", "Peanut Butter",
+         "Almonds", "Hemp Seeds", "Chia Seeds", "Quinoa", "Oats", "Soy Milk", "Pea Protein", "Pumpkin Seeds",
+         "Spirulina", "Nutritional Yeast", "Kidney Beans", "Cashews", "Pistachios", "Broccoli", "Spinach",
+         "Greek Yogurt", "Cottage Cheese", "Pinto Beans", "Buckwheat", "Sunflower Seeds", "Walnuts", "Miso"]
+FORMS = ["", "", "", " Strips", " Cubes", " Bites", " Spread", " Burger", " Crumbles", " Snack Pack",
+         " Protein Bar", " Powder", " Salad", " Soup"]
+CATEGORIES = ["Soy", "Legumes", "Nuts", "Seeds", "Grains", "Dairy Alternatives", "Vegetables", "Supplements"]
+
+# Typing "tofu burger" one keystroke at a time, plus whole-word and miss cases
+QUERIES = ["t", "to", "tof", "tofu", "tofu b", "tofu bu", "tofu burger",
+           "ch", "chick", "chickpeas salad", "peanut butter", "smoked tempeh strips",
+           "nutritional yeast", "organic", "xyzzy"]
+
+
+def synthetic_foods(count: int, seed: int):
+    """Food rows with realistic, overlapping names (brand, style, base, form)."""
+    rng = random.Random(seed)
+    for food_id in range(1, count + 1):
+        name = f"{rng.choice(BRANDS)}{rng.choice(STYLES)}{rng.choice(BASES)}{rng.choice(FORMS)} #{food_id % 997}"
+        yield {
+            "id": food_id,
+            "name": name,
+            "protein_per_100g": round(rng.uniform(1, 80), 1),
+            "category": rng.choice(CATEGORIES),
+            "is_vegan": rng.random() < 0.85,
+        }
+
+
+def _time_queries(run, repeat: int) -> dict:
+    results = {}
+    for query in QUERIES:
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run(query)
+            samples.append(time.perf_counter() - started)
+        results[query] = summarize(samples)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--foods", type=int, default=500_000)
+    parser.add_argument("--repeat", type=int, default=50, help="timed runs per query")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--category", help="also filter by this category, e.g. Nuts")
+    parser.add_argument("--vegan-only", action="store_true")
+    parser.add_argument("--compare-sql", action="store_true", help="also time the ILIKE scan (slow)")
+    parser.add_argument("--json", action="store_true", help="print raw results as JSON")
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    configure_env(f"sqlite:///{os.path.join(tmp.name, 'search.db')}", DATABASE_ASYNC="false")
+
+    from sqlalchemy import select
+
+    from app.database import Base, SessionLocal, engine
+    from app.models import Food
+    from app.search import FoodSearchIndex
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        batch = []
+        for row in synthetic_foods(args.foods, seed=11):
+            batch.append(row)
+            if len(batch) == 10_000:
+                db.execute(Food.__table__.insert(), batch)
+                batch.clear()
+        if batch:
+            db.execute(Food.__table__.insert(), batch)
+        db.commit()
+
+        started = time.perf_counter()
+        rows = db.execute(select(Food.id, Food.name, Food.protein_per_100g, Food.category, Food.is_vegan)).all()
+        loaded = time.perf_counter() - started
+        started = time.perf_counter()
+        index = FoodSearchIndex(rows)
+        built = time.perf_counter() - started
+        del rows
+
+        results = {
+            "foods": len(index),
+            "distinct_words": len(index.words),
+            "load_s": round(loaded, 3),
+            "build_s": round(built, 3),
+            "index": _time_queries(
+                lambda q: index.search(q, args.limit, category=args.category, vegan_only=args.vegan_only),
+                args.repeat,
+            ),
+        }
+        if args.compare_sql:
+            def ilike(q):
+                query = select(Food.id).where(Food.name.ilike(f"%{q}%"))
+                if args.category:
+                    query = query.where(Food.category == args.category)
+                if args.vegan_only:
+                    query = query.where(Food.is_vegan == True)
+                db.execute(query.order_by(Food.protein_per_100g.desc()).limit(args.limit)).all()
+
+            results["ilike"] = _time_queries(ilike, max(1, args.repeat // 10))
+
+    if args.json:
+        print(json.dumps(results))
+        return
+
+    print(f"{results['foods']} foods, {results['distinct_words']} distinct words; "
+          f"load {results['load_s']}s, index build {results['build_s']}s")
+    header = f"{'query':<24}{'index p50':>12}{'index p99':>12}"
+    if args.compare_sql:
+        header += f"{'ilike p50':>12}"
+    print(header)
+    for query in QUERIES:
+        line = f"{query!r:<24}{results['index'][query]['p50_ms']:>10.3f}ms{results['index'][query]['p99_ms']:>10.3f}ms"
+        if args.compare_sql:
+            line += f"{results['ilike'][query]['p50_ms']:>10.1f}ms"
+        print(line)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""Requests per second for the JSON list endpoints.
+
+Seeds a throwaway SQLite database with foods, stores and a user's log
+history, then drives full pages of ``/foods``, ``/foods/top-protein``,
+``/stores`` and ``/protein-logs`` through the ASGI app in-process. The
+numbers are dominated by per-request Python work: validation, serialization
+and (for stores and logs) hydrating rows.
+
+    python -m benchmarks.list_endpoints
+    python -m benchmarks.list_endpoints --requests 5000 --concurrency 20
+
+To compare with an older tree (e.g. before the orjson/column-tuple path),
+check it out somewhere and point ``--baseline-dir`` at its ``backend``::
+
+    git worktree add /tmp/vp-before <ref>
+    python -m benchmarks.list_endpoints --baseline-dir /tmp/vp-before/backend
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+
+from .common import asgi_client, auth_headers, configure_env, run_load, seed_protein_history, summarize
+
+ENDPOINTS = [
+    ("foods", "/api/foods/?limit=100"),
+    ("top-protein", "/api/foods/top-protein?limit=50&vegan_only=false"),
+    ("stores", "/api/stores/?limit=50"),
+    ("logs", "/api/protein-logs/?limit=100"),
+]
+
+
+def _seed_catalog(foods: int, stores: int, seed: int = 3) -> None:
+    from app.database import SessionLocal
+    from app.models import Food, Store
+
+    rng = random.Random(seed)
+    with SessionLocal() as db:
+        db.execute(Food.__table__.insert(), [
+            {
+                "name": f"Food {i}",
+                "protein_per_100g": round(rng.uniform(1, 80), 1),
+                "category": rng.choice(["Legumes", "Grains", "Soy Products", "Nuts & Seeds"]),
+                "is_vegan": rng.random() < 0.9,
+            }
+            for i in range(foods)
+        ])
+        db.execute(Store.__table__.insert(), [
+            {
+                "name": f"Store {i}",
+                "address": f"{i} Market St",
+                "latitude": 37.7 + rng.random() / 10,
+                "longitude": -122.5 + rng.random() / 10,
+            }
+            for i in range(stores)
+        ])
+        db.commit()
+
+
+async def _measure(args) -> dict:
+    from app.main import app
+
+    emails = seed_protein_history(1, args.days, args.logs_per_day)
+    _seed_catalog(args.foods, args.stores)
+    headers = auth_headers(emails[0])
+
+    results = {"label": args.label}
+    async with asgi_client(app) as client:
+        for name, path in ENDPOINTS:
+            async def send(i, path=path):
+                return await client.get(path, headers=headers)
+
+            # Warm up: first calls build the catalog snapshots
+            for i in range(5):
+                await send(i)
+            latencies, elapsed, errors = await run_load(send, args.requests, args.concurrency)
+            results[name] = {
+                "rps": round(len(latencies) / elapsed, 1),
+                "errors": errors,
+                "bytes": len((await send(0)).content),
+                **summarize(latencies),
+            }
+    return results
+
+
+def _child(args) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        configure_env(
+            f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+            app_dir=args.baseline_dir if args.label == "baseline" else None,
+        )
+        print(json.dumps(asyncio.run(_measure(args))))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--baseline-dir", help="backend directory of an older tree to measure first")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--foods", type=int, default=5000)
+    parser.add_argument("--stores", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--logs-per-day", type=int, default=4)
+    parser.add_argument("--json", action="store_true", help="print raw results as JSON")
+    parser.add_argument("--label", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.label:
+        _child(args)
+        return
+
+    labels = (["baseline"] if args.baseline_dir else []) + ["current"]
+    results = []
+    for label in labels:
+        cmd = [sys.executable, "-m", "benchmarks.list_endpoints", "--label", label] + sys.argv[1:]
+        output = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    if args.json:
+        print(json.dumps(results))
+        return
+
+    print(f"{'endpoint':<14}" + "".join(f"{r['label'] + ' rps':>16}{'p99 ms':>10}" for r in results))
+    for name, _ in ENDPOINTS:
+        row = f"{name:<14}"
+        for r in results:
+            summary = r[name]
+            rps = f"{summary['rps']}" + ("*" if summary["errors"] else "")
+            row += f"{rps:>16}{summary['p99_ms']:>10}"
+        print(row)
+    if any(r[name]["errors"] for r in results for name, _ in ENDPOINTS):
+        print("* some requests failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Nearest-store lookup latency over a large synthetic store table.
+
+Generates stores clustered around cities plus a uniform scatter, builds the
+``StoreIndex`` KD-tree and times ``/stores/nearby``-style lookups in k-nearest
+and radius modes. With ``--compare-sql`` the same lookups also run as the old
+unindexed lat/lon bounding-box query (SQLite) for comparison.
+
+    python -m benchmarks.nearby_stores
+    python -m benchmarks.nearby_stores --stores 200000 --compare-sql
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+
+from .common import configure_env, summarize
+
+CITIES = [(37.77, -122.42), (40.71, -74.01), (41.88, -87.63), (34.05, -118.24), (47.61, -122.33),
+          (51.51, -0.13), (52.52, 13.40), (35.68, 139.69), (-33.87, 151.21), (19.43, -99.13),
+          (64.84, -147.72), (-36.85, 174.76)]
+
+# (label, k, radius in miles)
+MODES = [("k=1", 1, None), ("k=10", 10, None), ("k=50", 50, None),
+         ("5mi, max 100", 100, 5.0), ("25mi, k=20", 20, 25.0)]
+
+
+def synthetic_stores(count: int, seed: int):
+    """``(id, latitude, longitude)`` clustered around ``CITIES``, plus a uniform scatter."""
+    rng = random.Random(seed)
+    for store_id in range(1, count + 1):
+        if rng.random() < 0.8:
+            lat, lon = rng.choice(CITIES)
+            lat += rng.gauss(0, 0.25)
+            lon += rng.gauss(0, 0.25)
+        else:
+            lat = math.degrees(math.asin(rng.uniform(-1, 1)))
+            lon = rng.uniform(-180, 180)
+        yield store_id, max(-90.0, min(90.0, lat)), (lon + 180) % 360 - 180
+
+
+def synthetic_locations(count: int, seed: int):
+    """User positions, mostly near ``CITIES``."""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        if rng.random() < 0.8:
+            lat, lon = rng.choice(CITIES)
+            queries.append((lat + rng.gauss(0, 0.2), lon + rng.gauss(0, 0.2)))
+        else:
+            queries.append((math.degrees(math.asin(rng.uniform(-1, 1))), rng.uniform(-180, 180)))
+    return queries
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stores", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--compare-sql", action="store_true", help="also time the old bounding-box query (slow)")
+    parser.add_argument("--json", action="store_true", help="print raw results as JSON")
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    configure_env(f"sqlite:///{os.path.join(tmp.name, 'stores.db')}", DATABASE_ASYNC="false")
+
+    from app.geo import StoreIndex
+
+    points = list(synthetic_stores(args.stores, seed=5))
+    started = time.perf_counter()
+    index = StoreIndex(1, points)
+    built = time.perf_counter() - started
+    size = sum(a.itemsize * len(a) for a in (index.ids, *index._coords, index._splits)) + len(index._axes)
+    queries = synthetic_locations(args.queries, seed=9)
+
+    results = {"stores": len(index), "build_s": round(built, 2), "index_mb": round(size / 2 ** 20, 1), "index": {}}
+    for label, k, radius in MODES:
+        samples = []
+        for lat, lon in queries:
+            started = time.perf_counter()
+            index.nearest(lat, lon, k, radius)
+            samples.append(time.perf_counter() - started)
+        results["index"][label] = summarize(samples)
+
+    if args.compare_sql:
+        from sqlalchemy import select
+
+        from app.database import Base, SessionLocal, engine
+        from app.models import Store
+
+        Base.metadata.create_all(bind=engine)
+        with SessionLocal() as db:
+            for start in range(0, len(points), 10_000):
+                db.execute(Store.__table__.insert(), [
+                    {"id": store_id, "name": f"Store {store_id}", "latitude": lat, "longitude": lon}
+                    for store_id, lat, lon in points[start:start + 10_000]
+                ])
+            db.commit()
+            samples = []
+            for lat, lon in queries[:max(1, args.queries // 20)]:
+                started = time.perf_counter()
+                # The pre-KD-tree /nearby: unindexed bbox, flat-earth distance, sort in Python
+                lat_range, lon_range = 5.0 / 69.0, 5.0 / 55.0
+                stores = db.scalars(select(Store).where(
+                    Store.latitude.between(lat - lat_range, lat + lat_range),
+                    Store.longitude.between(lon - lon_range, lon + lon_range),
+                )).all()
+                sorted(((abs(s.latitude - lat) * 69) ** 2 + (abs(s.longitude - lon) * 55) ** 2, s.id) for s in stores)
+                samples.append(time.perf_counter() - started)
+            results["bbox_sql_5mi"] = summarize(samples)
+
+    if args.json:
+        print(json.dumps(results))
+        return
+
+    print(f"{results['stores']} stores; build {results['build_s']}s, index {results['index_mb']} MB")
+    print(f"{'mode':<16}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for label, _, _ in MODES:
+        summary = results["index"][label]
+        print(f"{label:<16}{summary['p50_ms']:>10.3f}{summary['p99_ms']:>10.3f}{summary['max_ms']:>10.3f}")
+    if args.compare_sql:
+        summary = results["bbox_sql_5mi"]
+        print(f"{'old bbox 5mi':<16}{summary['p50_ms']:>10.3f}{summary['p99_ms']:>10.3f}{summary['max_ms']:>10.3f}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+"""Idle streams and fan-out latency of ``/protein-logs/today/stream``.
+
+Migrates and seeds a throwaway SQLite database (or a scratch
+``--database-url``), starts ``uvicorn app.main:app`` with one worker, opens
+``--streams`` streams spread over ``--users`` users and reports:
+
+* the server's resident memory per open stream;
+* the latency of a plain request (``/health``) while they are all open;
+* for ``--writes`` logged intakes, the time from sending the POST until each
+  of that user's streams has the ``log_added`` event.
+
+    python -m benchmarks.sse_fanout
+    python -m benchmarks.sse_fanout --streams 5000 --users 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from .common import auth_headers, configure_env, free_port, seed_protein_history, summarize
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STREAM_PATH = "/api/protein-logs/today/stream"
+
+
+def _rss_kb(pid: int) -> int:
+    """Resident memory of a process (Linux only; 0 elsewhere)."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+async def _wait_until(condition, timeout: float) -> None:
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("streams did not receive their events in time")
+        await asyncio.sleep(0.001)
+
+
+async def _read_stream(client, headers: dict, opened: list, received: dict) -> None:
+    async with client.stream("GET", STREAM_PATH, headers=headers) as response:
+        response.raise_for_status()
+        event = None
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                if event == "summary":
+                    opened.append(1)
+                elif event == "log_added":
+                    log_id = json.loads(line[len("data: "):])["log"]["id"]
+                    received.setdefault(log_id, []).append(time.perf_counter())
+
+
+async def _measure(base_url: str, server_pid: int, emails, args) -> dict:
+    import httpx
+
+    headers = [auth_headers(email) for email in emails]
+    opened, received = [], {}
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(base_url=base_url, timeout=None, limits=limits) as streams, \
+            httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+        rss_before = _rss_kb(server_pid)
+        readers = [
+            asyncio.create_task(_read_stream(streams, headers[i % len(headers)], opened, received))
+            for i in range(args.streams)
+        ]
+        await _wait_until(lambda: len(opened) >= args.streams or any(r.done() for r in readers), args.timeout)
+        for reader in readers:
+            if reader.done():
+                reader.result()
+        rss_after = _rss_kb(server_pid)
+
+        health = []
+        for _ in range(args.health_requests):
+            started = time.perf_counter()
+            await client.get("/health")
+            health.append(time.perf_counter() - started)
+
+        delivery = []
+        for i in range(args.writes):
+            user = i % len(emails)
+            fan_out = len(range(user, args.streams, len(emails)))
+            started = time.perf_counter()
+            response = await client.post(
+                "/api/protein-logs/", json={"food_name": "Edamame", "protein_amount": 11.0}, headers=headers[user]
+            )
+            log_id = response.json()["id"]
+            await _wait_until(lambda: len(received.get(log_id, ())) >= fan_out, args.timeout)
+            delivery.extend(at - started for at in received[log_id])
+
+        for reader in readers:
+            reader.cancel()
+        await asyncio.gather(*readers, return_exceptions=True)
+
+    return {
+        "streams": args.streams,
+        "users": len(emails),
+        "rss_per_stream_kb": round((rss_after - rss_before) / args.streams, 1) if rss_before else None,
+        "health": summarize(health),
+        "delivery": summarize(delivery),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="scratch database to migrate and seed (default: temporary SQLite file)")
+    parser.add_argument("--streams", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--writes", type=int, default=20, help="logged intakes to time the fan-out of")
+    parser.add_argument("--health-requests", type=int, default=200)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--json", action="store_true", help="print raw results as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        configure_env(database_url, SSE_MAX_STREAMS=args.streams)
+        subprocess.run(
+            [sys.executable, "-m", "alembic", "upgrade", "head"],
+            cwd=BACKEND_DIR, env=os.environ, check=True, capture_output=True,
+        )
+        emails = seed_protein_history(args.users, days=1, logs_per_day=2)
+
+        port = free_port()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning",
+             "--timeout-graceful-shutdown", "1"],
+            cwd=BACKEND_DIR, env=os.environ, stdout=subprocess.DEVNULL,
+        )
+        try:
+            import httpx
+
+            deadline = time.perf_counter() + args.timeout
+            while True:
+                try:
+                    httpx.get(f"http://127.0.0.1:{port}/health")
+                    break
+                except httpx.TransportError:
+                    if time.perf_counter() > deadline or server.poll() is not None:
+                        raise RuntimeError("server did not start")
+                    time.sleep(0.05)
+            results = asyncio.run(_measure(f"http://127.0.0.1:{port}", server.pid, emails, args))
+        finally:
+            server.terminate()
+            server.wait()
+
+    if args.json:
+        print(json.dumps(results))
+        return
+    print(f"{results['streams']} streams over {results['users']} users, one worker")
+    print(f"server memory per open stream: {results['rss_per_stream_kb']} KiB")
+    print(f"{'ms':<28}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+    for label, key in (("/health with streams open", "health"), ("log to every stream", "delivery")):
+        r = results[key]
+        print(f"{label:<28}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}{r['max_ms']:>10}")
+
+
+if __name__ == "__main__":
+    main()
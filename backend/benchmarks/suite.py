@@ -0,0 +1,250 @@
+"""Load test of the API hot paths against a seeded database.
+
+Seeds a SQLite or PostgreSQL database with synthetic data (users with years
+of protein logs, and large foods, stores and food_prices tables), then drives
+the real app in-process with concurrent clients, one scenario at a time:
+
+    login          POST /api/auth/login
+    create_log     POST /api/protein-logs/
+    today          GET  /api/protein-logs/today
+    weekly         GET  /api/protein-logs/weekly
+    stats          GET  /api/users/me/stats
+    food_search    GET  /api/foods/?search=...
+    nearby_stores  GET  /api/stores/nearby
+
+and reports throughput and p50/p95/p99 latency for each::
+
+    python -m benchmarks.suite
+    python -m benchmarks.suite --scenarios today weekly --requests 5000 --concurrency 50
+    python -m benchmarks.suite --env DATABASE_ASYNC=false
+    python -m benchmarks.suite --database-url postgresql://user:pw@localhost/vegprotein_bench
+
+A ``--database-url`` database is wiped and re-seeded, so point it at a
+scratch database. To compare commits, save each run's results and compare
+against the older one; the exit status is 1 if any scenario lost more than
+``--threshold`` percent of its throughput or p95::
+
+    python -m benchmarks.suite --output before.json          # on the older commit
+    python -m benchmarks.suite --output after.json --compare before.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from .common import BENCH_PASSWORD, asgi_client, auth_headers, configure_env, run_load, seed_protein_history, summarize
+from .food_search import QUERIES, synthetic_foods
+from .nearby_stores import synthetic_locations, synthetic_stores
+
+SCENARIOS = ("login", "food_search", "nearby_stores", "today", "weekly", "stats", "create_log")
+
+UNITS = ("per lb", "per lb", "per oz", "per kg", "each")
+
+INSERT_BATCH = 10_000
+
+
+def _insert(db, table, rows) -> None:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= INSERT_BATCH:
+            db.execute(table.insert(), batch)
+            batch.clear()
+    if batch:
+        db.execute(table.insert(), batch)
+
+
+def seed_catalog(foods: int, stores: int, prices_per_store: int, seed: int = 13) -> None:
+    """Foods with realistic names, stores around a dozen cities and a price list per store."""
+    from sqlalchemy import select
+
+    from app.database import SessionLocal
+    from app.models import Food, FoodPrice, Store
+
+    rng = random.Random(seed)
+    with SessionLocal() as db:
+        _insert(db, Food.__table__, ({k: v for k, v in row.items() if k != "id"} for row in synthetic_foods(foods, seed)))
+        _insert(db, Store.__table__, (
+            {"name": f"Store {i}", "address": f"{i} Market St", "latitude": lat, "longitude": lon}
+            for i, lat, lon in synthetic_stores(stores, seed)
+        ))
+        food_ids = db.scalars(select(Food.id)).all()
+        store_ids = db.scalars(select(Store.id)).all()
+        _insert(db, FoodPrice.__table__, (
+            {"food_id": food_id, "store_id": store_id, "price": round(rng.uniform(0.5, 15), 2), "unit": rng.choice(UNITS)}
+            for store_id in store_ids
+            for food_id in rng.sample(food_ids, min(prices_per_store, len(food_ids)))
+        ))
+        db.commit()
+
+
+def reset_database() -> None:
+    from app import models  # noqa: F401  (registers the tables)
+    from app.database import Base, engine
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+
+def _requests(emails):
+    """Scenario name -> ``send(client, i)``."""
+    headers = [auth_headers(email) for email in emails]
+    locations = synthetic_locations(1000, seed=17)
+
+    def user(i):
+        return headers[i % len(headers)]
+
+    return {
+        "login": lambda client, i: client.post(
+            "/api/auth/login", json={"email": emails[i % len(emails)], "password": BENCH_PASSWORD}
+        ),
+        "create_log": lambda client, i: client.post(
+            "/api/protein-logs/", json={"food_name": "Tempeh", "protein_amount": 19.0}, headers=user(i)
+        ),
+        "today": lambda client, i: client.get("/api/protein-logs/today", headers=user(i)),
+        "weekly": lambda client, i: client.get("/api/protein-logs/weekly", headers=user(i)),
+        "stats": lambda client, i: client.get("/api/users/me/stats", headers=user(i)),
+        "food_search": lambda client, i: client.get(
+            "/api/foods/", params={"search": QUERIES[i % len(QUERIES)], "limit": 20}
+        ),
+        "nearby_stores": lambda client, i: client.get("/api/stores/nearby", params={
+            "latitude": locations[i % len(locations)][0],
+            "longitude": locations[i % len(locations)][1],
+            "radius_miles": 5,
+            "limit": 20,
+        }),
+    }
+
+
+def _git(*args) -> str:
+    try:
+        return subprocess.run(["git", *args], check=True, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+async def _run(args, database_url: str) -> dict:
+    from app.config import settings
+    from app.main import app
+
+    started = time.perf_counter()
+    reset_database()
+    emails = seed_protein_history(args.users, args.days, args.logs_per_day)
+    seed_catalog(args.foods, args.stores, args.prices_per_store)
+    seed_seconds = time.perf_counter() - started
+
+    requests = _requests(emails)
+    scenarios = {}
+    async with asgi_client(app) as client:
+        for name in args.scenarios:
+            send = requests[name]
+            total = args.login_requests if name == "login" else args.requests
+            # Warm up: the first calls build catalog snapshots and fill caches
+            for i in range(min(args.warmup, total)):
+                await send(client, i)
+            latencies, elapsed, errors = await run_load(lambda i: send(client, i), total, args.concurrency)
+            scenarios[name] = {"rps": round(len(latencies) / elapsed, 1), "errors": errors, **summarize(latencies)}
+            print(f"  {name}: {scenarios[name]['rps']} req/s", file=sys.stderr)
+
+    return {
+        "meta": {
+            "commit": _git("rev-parse", "HEAD"),
+            "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "database": database_url.split("://", 1)[0],
+            "database_async": settings.DATABASE_ASYNC,
+            "seed_seconds": round(seed_seconds, 1),
+            "params": {
+                key: getattr(args, key)
+                for key in ("requests", "login_requests", "concurrency", "warmup", "users", "days", "logs_per_day",
+                            "foods", "stores", "prices_per_store", "env")
+            },
+        },
+        "scenarios": scenarios,
+    }
+
+
+def _print_results(results: dict) -> None:
+    meta = results["meta"]
+    print(f"commit {meta['commit'][:12] or '?'}{' (dirty)' if meta['dirty'] else ''}, {meta['database']}, "
+          f"async={meta['database_async']}, concurrency {meta['params']['concurrency']}")
+    print(f"{'scenario':<15}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for name, r in results["scenarios"].items():
+        print(f"{name:<15}{r['rps']:>10}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}{r['errors']:>8}")
+
+
+def _change(new: float, old: float) -> float:
+    return (new - old) / old * 100 if old else 0.0
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> bool:
+    """Print the change per scenario; True if any lost more than ``threshold`` percent."""
+    print(f"\nvs {baseline['meta']['commit'][:12] or '?'} ({baseline['meta']['date']})")
+    setup = ("database", "database_async", "params")
+    if any(results["meta"][key] != baseline["meta"].get(key) for key in setup):
+        print("note: the runs differ in database, DATABASE_ASYNC or parameters; the numbers are not comparable")
+    print(f"{'scenario':<15}{'req/s':>10}{'change':>10}{'p95 ms':>10}{'change':>10}")
+    regressed = False
+    for name, r in results["scenarios"].items():
+        old = baseline["scenarios"].get(name)
+        if old is None:
+            continue
+        rps_change, p95_change = _change(r["rps"], old["rps"]), _change(r["p95_ms"], old["p95_ms"])
+        flag = rps_change < -threshold or p95_change > threshold
+        regressed |= flag
+        print(f"{name:<15}{r['rps']:>10}{rps_change:>+9.1f}%{r['p95_ms']:>10}{p95_change:>+9.1f}%"
+              + ("  <- regression" if flag else ""))
+    return regressed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="scratch database to wipe and seed (default: temporary SQLite file)")
+    parser.add_argument("--env", nargs="*", default=[], metavar="KEY=VALUE", help="settings for the app under test")
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=SCENARIOS)
+    parser.add_argument("--requests", type=int, default=1000, help="requests per scenario")
+    parser.add_argument("--login-requests", type=int, default=100, help="requests for login (bcrypt bound)")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests before each scenario")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--days", type=int, default=3 * 365, help="days of protein log history per user")
+    parser.add_argument("--logs-per-day", type=int, default=4)
+    parser.add_argument("--foods", type=int, default=50_000)
+    parser.add_argument("--stores", type=int, default=20_000)
+    parser.add_argument("--prices-per-store", type=int, default=25)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", metavar="BASELINE", help="results JSON of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=10.0, help="regression threshold in percent")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        overrides = dict(item.split("=", 1) for item in args.env)
+        configure_env(database_url, **overrides)
+        results = asyncio.run(_run(args, database_url))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.json:
+        print(json.dumps(results))
+    else:
+        _print_results(results)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        return 1 if compare(results, baseline, args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""Initial schema
+
+Tables as created by Base.metadata.create_all before migrations were added.
+Tables that already exist are left alone, so a database created that way is
+adopted by a plain ``alembic upgrade head`` (no ``alembic stamp`` needed).
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Tables made by the app's old create_all at startup
+    existing = set() if context.is_offline_mode() else set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "users" not in existing:
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("email", sa.String(), nullable=False),
+            sa.Column("hashed_password", sa.String(), nullable=False),
+            sa.Column("full_name", sa.String(), nullable=True),
+            sa.Column("location", sa.String(), nullable=True),
+            sa.Column("protein_goal", sa.Integer(), nullable=True),
+            sa.Column("is_active", sa.Boolean(), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_users_email", "users", ["email"], unique=True)
+        op.create_index("ix_users_id", "users", ["id"], unique=False)
+
+    if "protein_logs" not in existing:
+        op.create_table(
+            "protein_logs",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("user_id", sa.Integer(), nullable=False),
+            sa.Column("food_name", sa.String(), nullable=False),
+            sa.Column("protein_amount", sa.Float(), nullable=False),
+            sa.Column("logged_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_protein_logs_id", "protein_logs", ["id"], unique=False)
+
+    if "foods" not in existing:
+        op.create_table(
+            "foods",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("protein_per_100g", sa.Float(), nullable=False),
+            sa.Column("category", sa.String(), nullable=True),
+            sa.Column("is_vegan", sa.Boolean(), nullable=True),
+            sa.Column("image_url", sa.String(), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_foods_id", "foods", ["id"], unique=False)
+        op.create_index("ix_foods_name", "foods", ["name"], unique=False)
+
+    if "stores" not in existing:
+        op.create_table(
+            "stores",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("address", sa.String(), nullable=True),
+            sa.Column("latitude", sa.Float(), nullable=True),
+            sa.Column("longitude", sa.Float(), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_stores_id", "stores", ["id"], unique=False)
+
+    if "food_prices" not in existing:
+        op.create_table(
+            "food_prices",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("food_id", sa.Integer(), nullable=False),
+            sa.Column("store_id", sa.Integer(), nullable=False),
+            sa.Column("price", sa.Float(), nullable=False),
+            sa.Column("unit", sa.String(), nullable=True),
+            sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.ForeignKeyConstraint(["food_id"], ["foods.id"]),
+            sa.ForeignKeyConstraint(["store_id"], ["stores.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_food_prices_id", "food_prices", ["id"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_food_prices_id", table_name="food_prices")
+    op.drop_table("food_prices")
+    op.drop_index("ix_stores_id", table_name="stores")
+    op.drop_table("stores")
+    op.drop_index("ix_foods_name", table_name="foods")
+    op.drop_index("ix_foods_id", table_name="foods")
+    op.drop_table("foods")
+    op.drop_index("ix_protein_logs_id", table_name="protein_logs")
+    op.drop_table("protein_logs")
+    op.drop_index("ix_users_id", table_name="users")
+    op.drop_index("ix_users_email", table_name="users")
+    op.drop_table("users")
@@ -0,0 +1,37 @@
+"""User timezone and (user_id, logged_at) index on protein_logs
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.add_column(sa.Column("timezone", sa.String(), server_default="UTC", nullable=False))
+
+    op.create_index(
+        "ix_protein_logs_user_id_logged_at",
+        "protein_logs",
+        ["user_id", sa.text("logged_at DESC")],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_protein_logs_user_id_logged_at", table_name="protein_logs")
+
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.drop_column("timezone")
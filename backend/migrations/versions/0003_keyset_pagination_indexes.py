@@ -0,0 +1,59 @@
+"""Indexes for keyset pagination
+
+Extends the protein_logs composite index with id so (logged_at, id) pages
+come straight off the index, and adds a (protein_per_100g, id) index for
+paging the food catalog.
+
+On SQLite, logs written through the old ``server_default`` (CURRENT_TIMESTAMP)
+hold ``logged_at`` as ``YYYY-MM-DD HH:MM:SS``, while SQLAlchemy writes and
+binds ``YYYY-MM-DD HH:MM:SS.ffffff``. Values are compared as text there, so a
+short value sorts before the bound copy of itself: a cursor never moves past
+its own row, and a log at exactly local midnight falls out of its day's range.
+They are rewritten in the full format.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == "sqlite":
+        op.execute("UPDATE protein_logs SET logged_at = logged_at || '.000000' WHERE length(logged_at) = 19")
+
+    op.drop_index("ix_protein_logs_user_id_logged_at", table_name="protein_logs")
+    op.create_index(
+        "ix_protein_logs_user_id_logged_at",
+        "protein_logs",
+        ["user_id", sa.text("logged_at DESC"), sa.text("id DESC")],
+        unique=False,
+    )
+    op.create_index(
+        "ix_foods_protein_per_100g_id",
+        "foods",
+        [sa.text("protein_per_100g DESC"), sa.text("id DESC")],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_foods_protein_per_100g_id", table_name="foods")
+    op.drop_index("ix_protein_logs_user_id_logged_at", table_name="protein_logs")
+    op.create_index(
+        "ix_protein_logs_user_id_logged_at",
+        "protein_logs",
+        ["user_id", sa.text("logged_at DESC")],
+        unique=False,
+    )
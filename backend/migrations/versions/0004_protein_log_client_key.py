@@ -0,0 +1,36 @@
+"""Idempotency key on protein_logs for batch sync
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("protein_logs") as batch_op:
+        batch_op.add_column(sa.Column("client_key", sa.String(length=64), nullable=True))
+
+    op.create_index(
+        "uq_protein_logs_user_id_client_key",
+        "protein_logs",
+        ["user_id", "client_key"],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_protein_logs_user_id_client_key", table_name="protein_logs")
+    with op.batch_alter_table("protein_logs") as batch_op:
+        batch_op.drop_column("client_key")
@@ -0,0 +1,27 @@
+"""Indexes on food_prices foreign keys for price lookups
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_food_prices_store_id", "food_prices", ["store_id"], unique=False)
+    op.create_index("ix_food_prices_food_id", "food_prices", ["food_id"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_food_prices_food_id", table_name="food_prices")
+    op.drop_index("ix_food_prices_store_id", table_name="food_prices")
@@ -0,0 +1,39 @@
+"""One price per (food, store) for feed upserts
+
+Keeps the newest row of any existing duplicates, then replaces the plain
+food_id index with a unique (food_id, store_id) index.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        "DELETE FROM food_prices WHERE id NOT IN "
+        "(SELECT max_id FROM (SELECT MAX(id) AS max_id FROM food_prices GROUP BY food_id, store_id) AS newest)"
+    )
+    op.drop_index("ix_food_prices_food_id", table_name="food_prices")
+    op.create_index(
+        "uq_food_prices_food_id_store_id",
+        "food_prices",
+        ["food_id", "store_id"],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_food_prices_food_id_store_id", table_name="food_prices")
+    op.create_index("ix_food_prices_food_id", "food_prices", ["food_id"], unique=False)
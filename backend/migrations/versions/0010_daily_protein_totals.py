@@ -0,0 +1,81 @@
+"""Daily protein totals rollup
+
+Creates the per-user, per-day rollup and fills it from protein_logs, with
+days in each user's timezone. Databases migrated before this revision
+existed already got the table from 0001 and keep it as it is.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.timezones import local_day
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0010"
+down_revision: Union[str, None] = "0009"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 5000
+
+
+def _backfill(totals: sa.Table) -> None:
+    bind = op.get_bind()
+    users = sa.table("users", sa.column("id", sa.Integer), sa.column("timezone", sa.String))
+    logs = sa.table(
+        "protein_logs",
+        sa.column("user_id", sa.Integer),
+        sa.column("logged_at", sa.DateTime(timezone=True)),
+        sa.column("protein_amount", sa.Float),
+    )
+    rows = bind.execute(
+        sa.select(logs.c.user_id, logs.c.logged_at, logs.c.protein_amount, users.c.timezone)
+        .join(users, users.c.id == logs.c.user_id)
+        .order_by(logs.c.user_id)
+        .execution_options(yield_per=BATCH_SIZE)
+    )
+    current_user, days = None, {}
+
+    def flush():
+        if days:
+            op.bulk_insert(totals, [
+                {"user_id": current_user, "day": day, "total": total, "count": count}
+                for day, (total, count) in days.items()
+            ])
+            days.clear()
+
+    # One user's days in memory at a time
+    for user_id, logged_at, amount, tz_name in rows:
+        if user_id != current_user:
+            flush()
+            current_user = user_id
+        day = local_day(logged_at, tz_name)
+        total, count = days.get(day, (0.0, 0))
+        days[day] = (total + amount, count + 1)
+    flush()
+
+
+def upgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table("daily_protein_totals"):
+        return
+    totals = op.create_table(
+        "daily_protein_totals",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("total", sa.Float(), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("user_id", "day"),
+    )
+    _backfill(totals)
+
+
+def downgrade() -> None:
+    op.drop_table("daily_protein_totals")
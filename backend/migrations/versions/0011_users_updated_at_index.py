@@ -0,0 +1,25 @@
+"""Index users.updated_at for the profile change poll
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0011"
+down_revision: Union[str, None] = "0010"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_users_updated_at", "users", ["updated_at"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_users_updated_at", table_name="users")
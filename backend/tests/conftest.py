@@ -0,0 +1,54 @@
+"""Shared fixtures for the API tests.
+
+Run from the ``backend`` directory::
+
+    pip install -r tests/requirements.txt
+    python -m pytest
+
+The app reads its settings when imported, so the environment is set here
+first: a temporary SQLite database, migrated with ``alembic upgrade head``
+like a deployment, and no rate limits or load shedding (every request comes
+from one client).
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import uuid
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp.name, 'test.db')}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ.pop("DATABASE_READ_URL", None)
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+os.environ["SHED_MAX_IN_FLIGHT"] = "0"
+os.environ["SHED_LOOP_LAG_MS"] = "0"
+
+PASSWORD = "test-password"
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+
+    subprocess.run(
+        [sys.executable, "-m", "alembic", "upgrade", "head"],
+        cwd=BACKEND_DIR, env=os.environ, check=True, capture_output=True,
+    )
+    from app.main import app
+
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def auth(client):
+    """A fresh account: its email and Authorization header."""
+    email = f"user-{uuid.uuid4().hex[:12]}@example.com"
+    client.post("/api/auth/register", json={"email": email, "password": PASSWORD}).raise_for_status()
+    tokens = client.post("/api/auth/login", json={"email": email, "password": PASSWORD}).json()
+    return {"email": email, "tokens": tokens, "headers": {"Authorization": f"Bearer {tokens['access_token']}"}}
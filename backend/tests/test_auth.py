@@ -0,0 +1,79 @@
+def _refresh(client, refresh_token: str):
+    return client.post("/api/auth/refresh", json={"refresh_token": refresh_token})
+
+
+def test_refresh_rotates_the_token_pair(client, auth):
+    response = _refresh(client, auth["tokens"]["refresh_token"])
+    assert response.status_code == 200
+    tokens = response.json()
+    assert tokens["refresh_token"] != auth["tokens"]["refresh_token"]
+
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    assert client.get("/api/users/me", headers=headers).json()["email"] == auth["email"]
+    assert _refresh(client, tokens["refresh_token"]).status_code == 200
+
+
+def test_reused_refresh_token_revokes_the_session(client, auth):
+    old = auth["tokens"]["refresh_token"]
+    tokens = _refresh(client, old).json()
+
+    # The exchanged token is refused, and its reuse ends the session
+    assert _refresh(client, old).status_code == 401
+    assert _refresh(client, tokens["refresh_token"]).status_code == 401
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    assert client.get("/api/users/me", headers=headers).status_code == 401
+
+
+def test_logout_revokes_the_session(client, auth):
+    refresh_token = auth["tokens"]["refresh_token"]
+    response = client.post("/api/auth/logout", json={"refresh_token": refresh_token}, headers=auth["headers"])
+    assert response.status_code == 204
+    assert _refresh(client, refresh_token).status_code == 401
+    assert client.get("/api/users/me", headers=auth["headers"]).status_code == 401
+
+
+def _change_profile_elsewhere(auth, **values):
+    """Update the users row like another worker would: without touching this worker's cache."""
+    from sqlalchemy import select
+
+    from app.database import SessionLocal
+    from app.models import User
+
+    with SessionLocal() as db:
+        user = db.scalar(select(User).where(User.email == auth["email"]))
+        for field, value in values.items():
+            setattr(user, field, value)
+        db.commit()
+
+
+def test_profile_changes_on_other_workers_reach_the_user_cache(client, auth, monkeypatch):
+    from app.config import settings
+
+    headers = auth["headers"]
+    assert client.get("/api/users/me", headers=headers).json()["protein_goal"] == 120
+
+    _change_profile_elsewhere(auth, protein_goal=90)
+    monkeypatch.setattr(settings, "USER_CACHE_POLL_SECONDS", 0)
+    assert client.get("/api/users/me", headers=headers).json()["protein_goal"] == 90
+
+    _change_profile_elsewhere(auth, is_active=False)
+    assert client.get("/api/users/me", headers=headers).status_code == 400
+
+
+def test_log_writes_use_the_current_timezone(client, auth):
+    from app.timezones import local_today
+
+    headers = auth["headers"]
+    # Whichever of UTC+14 and UTC-12 is on another date than UTC right now
+    zone = "Pacific/Kiritimati"
+    if local_today(zone) == local_today("UTC"):
+        zone = "Etc/GMT+12"
+    client.get("/api/users/me", headers=headers).raise_for_status()
+
+    # Before any poll: the write itself must not use the cached timezone
+    _change_profile_elsewhere(auth, timezone=zone)
+    client.post("/api/protein-logs/", headers=headers, json={"food_name": "Tofu", "protein_amount": 20.0})
+    days = client.get("/api/protein-logs/range", headers=headers, params={
+        "start": local_today(zone).isoformat(), "end": local_today(zone).isoformat(),
+    }).json()
+    assert days["total_protein"] == 20.0
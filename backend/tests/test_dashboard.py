@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta, timezone
+
+
+def _parts(client, headers) -> dict:
+    return {
+        "profile": client.get("/api/users/me", headers=headers).json(),
+        "today": client.get("/api/protein-logs/today", headers=headers).json(),
+        "weekly": client.get("/api/protein-logs/weekly", headers=headers).json(),
+        "stats": client.get("/api/users/me/stats", headers=headers).json(),
+    }
+
+
+def test_dashboard_matches_the_separate_endpoints(client, auth):
+    headers = auth["headers"]
+    now = datetime.now(timezone.utc)
+    client.post("/api/protein-logs/batch", headers=headers, json={"entries": [
+        {"food_name": "Tofu", "protein_amount": 20.0},
+        {"food_name": "Lentils", "protein_amount": 9.0, "logged_at": (now - timedelta(days=3)).isoformat()},
+        # Outside the week, so only in the all-time log count
+        {"food_name": "Seitan", "protein_amount": 25.0, "logged_at": (now - timedelta(days=10)).isoformat()},
+    ]}).raise_for_status()
+    client.post("/api/protein-logs/", headers=headers, json={"food_name": "Tempeh", "protein_amount": 19.0})
+
+    dashboard = client.get("/api/dashboard", headers=headers).json()
+    assert dashboard == _parts(client, headers)
+    assert dashboard["today"]["total_protein"] == 39.0
+    assert [log["food_name"] for log in dashboard["today"]["logs"]] == ["Tofu", "Tempeh"]
+    assert dashboard["weekly"]["total_weekly_protein"] == 48.0
+    assert dashboard["stats"]["total_logs"] == 4
+
+
+def test_dashboard_of_a_new_user(client, auth):
+    headers = auth["headers"]
+    dashboard = client.get("/api/dashboard", headers=headers).json()
+    assert dashboard == _parts(client, headers)
+    assert dashboard["today"]["logs"] == []
+    assert dashboard["stats"] == {"total_logs": 0, "weekly_protein": 0.0, "days_logged_this_week": 0, "protein_goal": 120}
@@ -0,0 +1,91 @@
+import pytest
+from sqlalchemy import create_engine, exc, text
+
+
+def test_engine_options_by_backend():
+    from app.config import settings
+    from app.database import TimedAsyncQueuePool, TimedQueuePool, _engine_options
+
+    options = _engine_options("postgresql://user:secret@db/vegprotein", is_async=False)
+    assert options == {
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "poolclass": TimedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+    }
+    assert _engine_options("postgresql+asyncpg://db/vegprotein", is_async=True)["poolclass"] is TimedAsyncQueuePool
+
+    # File SQLite is pooled like a server; in-memory SQLite keeps its single connection
+    options = _engine_options("sqlite:///./vegprotein.db", is_async=False)
+    assert options["poolclass"] is TimedQueuePool
+    assert options["connect_args"] == {"check_same_thread": False}
+    assert "pool_pre_ping" not in options
+    assert _engine_options("sqlite://", is_async=False) == {"connect_args": {"check_same_thread": False}}
+    assert _engine_options("sqlite+aiosqlite://", is_async=True) == {}
+
+
+def test_pool_timeouts_and_waits_are_recorded(tmp_path):
+    from app.database import TimedQueuePool, pool_timeouts, pool_wait_seconds
+
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}", poolclass=TimedQueuePool, pool_size=1, max_overflow=0, pool_timeout=0.05,
+    )
+    timeouts, waits = pool_timeouts.value, pool_wait_seconds.snapshot()["count"]
+    with engine.connect():
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+    engine.dispose()
+    assert pool_timeouts.value == timeouts + 1
+    assert pool_wait_seconds.snapshot()["count"] == waits + 2
+
+
+def test_sqlite_connections_use_wal(client):
+    from app.database import engine
+
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() > 0
+
+
+def test_pool_health(client):
+    from app.config import settings
+
+    client.get("/api/foods/categories").raise_for_status()
+    stats = client.get("/health/pool").json()
+    assert stats["sync"]["pool"] == "TimedQueuePool"
+    assert stats["sync"]["size"] == settings.DB_POOL_SIZE
+    assert stats["sync"]["open"] >= 1
+    assert {"timeouts_total", "invalidations_total", "wait_seconds"} <= set(stats)
+
+
+def test_reads_stay_on_the_primary_after_a_write(client, auth, monkeypatch):
+    from contextlib import asynccontextmanager
+
+    import app.auth as auth_module
+    from app.database import open_session, recent_writers
+
+    routed = []
+
+    @asynccontextmanager
+    async def recording_session(read: bool = False):
+        routed.append("replica" if read else "primary")
+        async with open_session(read=read) as db:
+            yield db
+
+    monkeypatch.setattr(auth_module, "open_session", recording_session)
+    headers = auth["headers"]
+
+    client.get("/api/protein-logs/", headers=headers).raise_for_status()
+    assert routed == ["replica"]
+
+    client.post("/api/protein-logs/", headers=headers, json={"food_name": "Tofu", "protein_amount": 20.0})
+    logs = client.get("/api/protein-logs/", headers=headers).json()["items"]
+    assert routed[-1] == "primary"
+    assert [log["food_name"] for log in logs] == ["Tofu"]
+
+    # Once READ_YOUR_WRITES_SECONDS have passed (the entry is gone), back to the replica
+    recent_writers.clear()
+    client.get("/api/protein-logs/weekly", headers=headers).raise_for_status()
+    assert routed[-1] == "replica"
@@ -0,0 +1,164 @@
+def _revalidate(client, path: str, etag: str, headers=None, **params):
+    return client.get(path, headers={**(headers or {}), "If-None-Match": etag}, params=params)
+
+
+def _version_etag(client, path: str, headers) -> str:
+    """The ETag a revalidating client holds: a plain GET's body ETag, traded for the version's."""
+    response = _revalidate(client, path, client.get(path, headers=headers).headers["etag"], headers)
+    assert response.status_code == 304
+    return response.headers["etag"]
+
+
+def test_rollup_rebuild_changes_summary_etags(client, auth):
+    from sqlalchemy import update
+
+    from app.database import SessionLocal
+    from app.models import DailyProteinTotal
+    from app.rollups import rebuild_daily_totals
+
+    headers = auth["headers"]
+    client.post("/api/protein-logs/", headers=headers, json={"food_name": "Tofu", "protein_amount": 20.0})
+    user_id = client.get("/api/users/me", headers=headers).json()["id"]
+
+    # Drift the rollup behind the API's back, so the client holds the wrong total
+    with SessionLocal() as db:
+        db.execute(update(DailyProteinTotal).where(DailyProteinTotal.user_id == user_id).values(total=999.0))
+        db.commit()
+    etag = _version_etag(client, "/api/protein-logs/weekly", headers)
+
+    # Repaired like the CLI does
+    with SessionLocal() as db:
+        rebuild_daily_totals(db, user_id=user_id)
+        db.commit()
+    response = _revalidate(client, "/api/protein-logs/weekly", etag, headers)
+    assert response.status_code == 200
+    assert response.json()["total_weekly_protein"] == 20.0
+
+    # A full rebuild covers every user, including those without a version row yet
+    etag = response.headers["etag"]
+    with SessionLocal() as db:
+        rebuild_daily_totals(db)
+        db.commit()
+    assert _revalidate(client, "/api/protein-logs/weekly", etag, headers).status_code == 200
+
+
+def test_matching_etag_skips_the_handler(client, auth, monkeypatch):
+    import app.routers.protein_logs as protein_logs
+
+    headers = auth["headers"]
+    weekly = client.get("/api/protein-logs/weekly", headers=headers)
+    assert weekly.status_code == 200
+    assert weekly.headers["cache-control"] == "private, no-cache"
+    assert weekly.headers["vary"] == "Authorization"
+    etag = _version_etag(client, "/api/protein-logs/weekly", headers)
+
+    def handler_ran(*args, **kwargs):
+        raise AssertionError("the handler ran for a matching If-None-Match")
+
+    monkeypatch.setattr(protein_logs, "fetch_daily_totals", handler_ran)
+    response = _revalidate(client, "/api/protein-logs/weekly", etag, headers)
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    assert response.headers["vary"] == "Authorization"
+
+
+def test_plain_gets_skip_the_version_lookup(client, auth, monkeypatch):
+    from contextlib import asynccontextmanager
+
+    import app.etags as etags
+
+    headers = auth["headers"]
+    client.post("/api/protein-logs/", headers=headers, json={"food_name": "Tofu", "protein_amount": 20.0})
+    sessions = []
+
+    @asynccontextmanager
+    async def recording_session(read: bool = False):
+        sessions.append(read)
+        async with open_session(read=read) as db:
+            yield db
+
+    open_session = etags.open_session
+    monkeypatch.setattr(etags, "open_session", recording_session)
+
+    # Nothing to match: the body is tagged and no version is looked up
+    first = client.get("/api/protein-logs/today", headers=headers)
+    assert first.status_code == 200 and first.headers["etag"].startswith('W/"')
+    assert client.get("/api/protein-logs/today", headers=headers).headers["etag"] == first.headers["etag"]
+    assert sessions == []
+
+    # The body's ETag still revalidates, and is traded for the version's
+    response = _revalidate(client, "/api/protein-logs/today", first.headers["etag"], headers)
+    assert response.status_code == 304
+    assert response.headers["etag"] != first.headers["etag"]
+    assert sessions
+    assert _revalidate(client, "/api/protein-logs/today", response.headers["etag"], headers).status_code == 304
+
+    # A stale body ETag gets the new body
+    client.post("/api/protein-logs/", headers=headers, json={"food_name": "Seitan", "protein_amount": 25.0})
+    response = _revalidate(client, "/api/protein-logs/today", first.headers["etag"], headers)
+    assert response.status_code == 200
+    assert response.json()["total_protein"] == 45.0
+
+
+def test_revoked_sessions_get_no_304(client, auth):
+    headers = auth["headers"]
+    etag = _version_etag(client, "/api/protein-logs/today", headers)
+    client.post("/api/auth/logout", headers=headers, json={"refresh_token": auth["tokens"]["refresh_token"]})
+    response = _revalidate(client, "/api/protein-logs/today", etag, headers)
+    assert response.status_code == 401
+    assert "etag" not in response.headers
+
+
+def test_log_etags_follow_log_writes_and_the_goal(client, auth):
+    headers = auth["headers"]
+    etag = client.get("/api/protein-logs/today", headers=headers).headers["etag"]
+    # Another query string is another resource
+    assert client.get("/api/protein-logs/", headers=headers, params={"limit": 5}).headers["etag"] != etag
+
+    created = client.post("/api/protein-logs/", headers=headers, json={"food_name": "Tofu", "protein_amount": 20.0})
+    response = _revalidate(client, "/api/protein-logs/today", etag, headers)
+    assert response.status_code == 200
+    assert response.json()["total_protein"] == 20.0
+    etag = response.headers["etag"]
+    assert _revalidate(client, "/api/protein-logs/today", etag, headers).status_code == 304
+
+    client.patch("/api/users/me", headers=headers, json={"protein_goal": 80}).raise_for_status()
+    response = _revalidate(client, "/api/protein-logs/today", etag, headers)
+    assert response.status_code == 200
+    assert response.json()["goal"] == 80
+    etag = response.headers["etag"]
+
+    client.delete(f"/api/protein-logs/{created.json()['id']}", headers=headers).raise_for_status()
+    assert _revalidate(client, "/api/protein-logs/today", etag, headers).status_code == 200
+
+
+def test_catalog_etags_follow_the_catalog_version(client):
+    from app.catalog import bump_catalog_version_sync, food_catalog
+    from app.database import SessionLocal
+
+    client.post("/api/foods/seed").raise_for_status()
+    first = client.get("/api/foods/categories")
+    assert first.headers["cache-control"].startswith("public, max-age=")
+    assert "vary" not in first.headers
+    etag = first.headers["etag"]
+    assert _revalidate(client, "/api/foods/categories", etag).status_code == 304
+    # Several tags are allowed, strong or weak
+    assert _revalidate(client, "/api/foods/categories", f'"other", {etag[2:]}').status_code == 304
+
+    # A write from another process, picked up on the next version check
+    with SessionLocal() as db:
+        bump_catalog_version_sync(db, "foods")
+        db.commit()
+    food_catalog.expire()
+    response = _revalidate(client, "/api/foods/categories", etag)
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def test_other_responses_carry_no_etag(client, auth):
+    # Unauthenticated requests fall through to the handler's 401
+    response = client.get("/api/protein-logs/today")
+    assert response.status_code == 401
+    assert "etag" not in response.headers
+    assert "etag" not in client.get("/api/foods/999999").headers
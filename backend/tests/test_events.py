@@ -0,0 +1,131 @@
+from datetime import date, datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import orjson
+
+
+def _data(chunk: bytes) -> dict:
+    return orjson.loads(chunk.split(b"\ndata: ", 1)[1])
+
+
+def test_log_events_send_utc_timestamps():
+    from app.events import DayState, _apply
+    from app.summaries import log_entry
+
+    # SQLite hands back naive UTC; Postgres hands back aware values in the session zone
+    naive = SimpleNamespace(id=1, food_name="Tofu", protein_amount=20.0, logged_at=datetime(2026, 1, 18, 6, 30))
+    aware = SimpleNamespace(
+        id=2, food_name="Seitan", protein_amount=25.0,
+        logged_at=datetime(2026, 1, 18, 1, 45, tzinfo=timezone(timedelta(hours=-5))),
+    )
+    state = DayState(1, date(2026, 1, 18), "UTC", 120, 0.0, 0)
+
+    added = _apply(state, [log_entry(naive), log_entry(aware)], [])
+    assert [_data(chunk)["log"]["logged_at"] for chunk in added] == ["2026-01-18T06:30:00Z", "2026-01-18T06:45:00Z"]
+    assert state.log_count == 2
+
+    deleted = _apply(state, [], [log_entry(naive)])
+    assert _data(deleted[0])["log_count"] == 1
+
+
+def test_today_sends_utc_timestamps(client, auth):
+    client.post("/api/protein-logs/", headers=auth["headers"], json={"food_name": "Lentils", "protein_amount": 9.0})
+    logs = client.get("/api/protein-logs/today", headers=auth["headers"]).json()["logs"]
+    assert logs[0]["logged_at"].endswith("Z")
+
+
+def _event_of(chunk: bytes):
+    """``(event name, data)`` of an SSE chunk."""
+    head, _, data = chunk.partition(b"\ndata: ")
+    return head[len(b"event: "):].decode(), orjson.loads(data)
+
+
+async def _next(stream):
+    try:
+        return await stream.__anext__()
+    except StopAsyncIteration:
+        return None
+
+
+def _open_stream(client, auth, expires_in: float):
+    """``today_stream`` for the ``auth`` user, run on the app's event loop; its first summary."""
+    import time
+
+    from app.auth import UserPrincipal
+    from app.database import SessionLocal
+    from app.events import today_stream
+    from app.models import User
+
+    with SessionLocal() as db:
+        user = UserPrincipal.from_user(db.query(User).filter(User.email == auth["email"]).one())
+    stream = today_stream(user, time.time() + expires_in, None)
+    assert client.portal.call(_next, stream).startswith(b"retry: ")
+    name, summary = _event_of(client.portal.call(_next, stream))
+    assert name == "summary"
+    return stream, summary
+
+
+def test_stream_gets_published_writes(client, auth):
+    from app.events import day_events
+
+    headers = auth["headers"]
+    client.post("/api/protein-logs/", headers=headers, json={"food_name": "Oats", "protein_amount": 5.0})
+    streams = len(day_events)
+    stream, summary = _open_stream(client, auth, expires_in=60)
+    assert (summary["total_protein"], summary["log_count"]) == (5.0, 1)
+    assert len(day_events) == streams + 1
+
+    created = client.post("/api/protein-logs/", headers=headers, json={"food_name": "Tofu", "protein_amount": 20.0})
+    name, data = _event_of(client.portal.call(_next, stream))
+    assert name == "log_added"
+    assert data["log"]["id"] == created.json()["id"]
+    assert (data["total_protein"], data["log_count"]) == (25.0, 2)
+
+    client.delete(f"/api/protein-logs/{created.json()['id']}", headers=headers).raise_for_status()
+    name, data = _event_of(client.portal.call(_next, stream))
+    assert (name, data["id"], data["total_protein"], data["log_count"]) == ("log_deleted", created.json()["id"], 5.0, 1)
+
+    client.portal.call(stream.aclose)
+    assert len(day_events) == streams
+
+
+def test_stream_resyncs_after_a_version_gap(client, auth, monkeypatch):
+    from app.events import day_events, stream_resyncs
+
+    headers = auth["headers"]
+    stream, _ = _open_stream(client, auth, expires_in=60)
+
+    # A write on another worker: committed, but never published here
+    with monkeypatch.context() as patched:
+        patched.setattr(day_events, "publish", lambda *args, **kwargs: None)
+        client.post("/api/protein-logs/", headers=headers, json={"food_name": "Seitan", "protein_amount": 25.0})
+    resyncs = stream_resyncs.value
+    # The next local write arrives one version too far ahead, so the day is re-read
+    client.post("/api/protein-logs/", headers=headers, json={"food_name": "Tofu", "protein_amount": 20.0})
+    name, summary = _event_of(client.portal.call(_next, stream))
+    assert name == "summary"
+    assert (summary["total_protein"], summary["log_count"]) == (45.0, 2)
+    assert [log["food_name"] for log in summary["logs"]] == ["Seitan", "Tofu"]
+    assert stream_resyncs.value == resyncs + 1
+    client.portal.call(stream.aclose)
+
+
+def test_stream_ends_when_the_token_expires(client, auth):
+    import time
+
+    stream, _ = _open_stream(client, auth, expires_in=0.3)
+    started = time.monotonic()
+    # A heartbeat at the expiry, then the end
+    assert client.portal.call(_next, stream) == b": ping\n\n"
+    assert client.portal.call(_next, stream) is None
+    assert time.monotonic() - started < 5
+
+
+def test_stream_limit_answers_503(client, auth, monkeypatch):
+    from app.config import settings
+    from app.events import day_events
+
+    monkeypatch.setattr(settings, "SSE_MAX_STREAMS", len(day_events))
+    response = client.get("/api/protein-logs/today/stream", headers=auth["headers"])
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "5"
@@ -0,0 +1,91 @@
+import csv
+import gzip
+import io
+
+import orjson
+
+ENTRIES = [
+    {"food_name": "Tofu", "protein_amount": 20.0, "logged_at": "2026-03-01T08:00:00Z", "client_key": "a"},
+    {"food_name": "Beans, black", "protein_amount": 15.5, "logged_at": "2026-03-01T23:30:00Z"},
+    {"food_name": "Seitan", "protein_amount": 25.0, "logged_at": "2026-03-02T12:00:00Z", "client_key": "c"},
+    {"food_name": 'Tempeh "smoked"', "protein_amount": 19.0, "logged_at": "2026-03-03T04:15:00Z"},
+    {"food_name": "Lentils", "protein_amount": 9.0, "logged_at": "2026-03-04T18:45:00Z"},
+]
+
+
+def _logged(client, auth) -> list:
+    response = client.post("/api/protein-logs/batch", headers=auth["headers"], json={"entries": ENTRIES})
+    response.raise_for_status()
+    return sorted(response.json()["created"], key=lambda log: (log["logged_at"], log["id"]))
+
+
+def _export(client, auth, **params):
+    # No Accept-Encoding: the body as sent
+    headers = {**auth["headers"], "Accept-Encoding": "identity"}
+    return client.get("/api/protein-logs/export", headers=headers, params=params)
+
+
+def test_csv_export_streams_every_batch(client, auth, monkeypatch):
+    from app.config import settings
+
+    logs = _logged(client, auth)
+    monkeypatch.setattr(settings, "EXPORT_BATCH_SIZE", 2)
+    response = _export(client, auth)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.headers["content-disposition"] == 'attachment; filename="protein-logs.csv"'
+    assert "content-encoding" not in response.headers
+
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0] == ["id", "logged_at", "food_name", "protein_amount", "client_key"]
+    assert rows[1:] == [
+        [str(log["id"]), entry["logged_at"], entry["food_name"], str(entry["protein_amount"]), entry.get("client_key", "")]
+        for log, entry in zip(logs, ENTRIES)
+    ]
+
+
+def test_ndjson_export_in_a_local_day_range(client, auth):
+    logs = _logged(client, auth)
+    client.patch("/api/users/me", headers=auth["headers"], json={"timezone": "America/New_York"}).raise_for_status()
+
+    # 2026-03-01 23:30 UTC is the evening of March 1st in New York; 2026-03-03 04:15 UTC is still March 2nd
+    response = _export(client, auth, format="ndjson", start="2026-03-02", end="2026-03-02")
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    exported = [orjson.loads(line) for line in response.content.splitlines()]
+    assert exported == [
+        {"id": log["id"], "logged_at": entry["logged_at"], "food_name": entry["food_name"],
+         "protein_amount": entry["protein_amount"], "client_key": entry.get("client_key")}
+        for log, entry in zip(logs[2:4], ENTRIES[2:4])
+    ]
+
+
+def test_gzipped_export(client, auth):
+    _logged(client, auth)
+    plain = _export(client, auth).content
+    headers = {**auth["headers"], "Accept-Encoding": "gzip"}
+    with client.stream("GET", "/api/protein-logs/export", headers=headers) as response:
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["vary"] == "Accept-Encoding"
+        raw = b"".join(response.iter_raw())
+    assert gzip.decompress(raw) == plain
+
+
+def test_export_rejects_bad_parameters(client, auth):
+    assert _export(client, auth, format="xml").status_code == 400
+    assert _export(client, auth, start="2026-03-02", end="2026-03-01").status_code == 400
+    assert client.get("/api/protein-logs/export").status_code == 401
+
+
+def test_accept_encoding_quality_values(client, auth):
+    from app.exports import accepts_gzip
+
+    assert accepts_gzip("gzip, deflate, br")
+    assert accepts_gzip("br;q=1.0, GZIP;q=0.5")
+    assert accepts_gzip("*")
+    assert not accepts_gzip("")
+    assert not accepts_gzip("gzip;q=0")
+    assert not accepts_gzip("gzip; q=0.000, *;q=1")
+    assert not accepts_gzip("identity, *;q=0")
+
+    headers = {**auth["headers"], "Accept-Encoding": "br, gzip;q=0"}
+    assert "content-encoding" not in client.get("/api/protein-logs/export", headers=headers).headers
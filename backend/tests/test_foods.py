@@ -0,0 +1,17 @@
+def test_top_protein_limit_must_be_positive(client):
+    client.post("/api/foods/seed").raise_for_status()
+    assert len(client.get("/api/foods/top-protein", params={"limit": 3}).json()) == 3
+    assert client.get("/api/foods/top-protein", params={"limit": 0}).status_code == 422
+    assert client.get("/api/foods/top-protein", params={"limit": -1}).status_code == 422
+
+
+def test_catalog_page_of_no_foods():
+    from app.catalog import FoodCatalog
+
+    catalog = FoodCatalog(1, [
+        (1, "Seitan", 75.0, "Wheat", True, None),
+        (2, "Tempeh", 19.0, "Soy Products", True, None),
+    ])
+    assert [food.id for food in catalog.page(1)] == [1]
+    assert catalog.page(0) == []
+    assert catalog.page(-5) == []
@@ -0,0 +1,74 @@
+import asyncio
+import threading
+import uuid
+
+import pytest
+
+from tests.conftest import PASSWORD
+
+
+def test_full_pool_rejects_at_once():
+    from app.hashing import HashingPool, HashingPoolFull, rejected_counter
+
+    pool = HashingPool(workers=1, queue_limit=1)
+    release = threading.Event()
+
+    async def scenario():
+        # One call running, one queued: the pool is full
+        running = [asyncio.ensure_future(pool.run(release.wait, 5)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        assert pool.stats()["in_flight"] == 2
+        assert pool.stats()["queue_depth"] == 1
+        rejected = rejected_counter.value
+        with pytest.raises(HashingPoolFull) as full:
+            await pool.run(release.wait, 5)
+        assert rejected_counter.value == rejected + 1
+        release.set()
+        assert await asyncio.gather(*running) == [True, True]
+        return full.value
+
+    try:
+        error = asyncio.run(scenario())
+    finally:
+        pool.shutdown()
+    assert error.status_code == 503
+    assert error.headers == {"Retry-After": "1"}
+    assert pool.pending == 0
+
+
+def test_login_and_register_get_503_when_the_pool_is_full(client, auth, monkeypatch):
+    from app.hashing import hashing_pool
+
+    before = client.get("/health/hashing").json()
+    monkeypatch.setattr(hashing_pool, "pending", hashing_pool.capacity)
+
+    response = client.post("/api/auth/login", json={"email": auth["email"], "password": PASSWORD})
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    response = client.post(
+        "/api/auth/register", json={"email": f"user-{uuid.uuid4().hex[:12]}@example.com", "password": PASSWORD}
+    )
+    assert response.status_code == 503
+
+    stats = client.get("/health/hashing").json()
+    assert stats["rejected_total"] == before["rejected_total"] + 2
+    assert stats["in_flight"] == hashing_pool.capacity
+
+    monkeypatch.setattr(hashing_pool, "pending", 0)
+    assert client.post("/api/auth/login", json={"email": auth["email"], "password": PASSWORD}).status_code == 200
+
+
+def test_hashing_health(client, auth):
+    from app.config import settings
+
+    stats = client.get("/health/hashing").json()
+    assert {key: stats[key] for key in ("kind", "workers", "queue_limit", "in_flight", "queue_depth")} == {
+        "kind": settings.HASH_POOL_KIND,
+        "workers": settings.HASH_POOL_WORKERS,
+        "queue_limit": settings.HASH_POOL_QUEUE_LIMIT,
+        "in_flight": 0,
+        "queue_depth": 0,
+    }
+    # The fixture's register and login each hashed once
+    assert stats["hash_seconds"]["count"] >= 2
+    assert stats["wait_seconds"]["count"] >= stats["hash_seconds"]["count"]
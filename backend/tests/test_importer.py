@@ -0,0 +1,139 @@
+import gzip
+import io
+import uuid
+
+import pytest
+
+from app.importer import import_prices
+
+
+def _import(feed: str, fmt: str = "csv", **options):
+    from app.database import SessionLocal
+
+    with SessionLocal() as db:
+        return import_prices(db, io.StringIO(feed), fmt, **options)
+
+
+def _price(food_name: str, store_name: str):
+    from sqlalchemy import select
+
+    from app.database import SessionLocal
+    from app.models import Food, FoodPrice, Store
+
+    with SessionLocal() as db:
+        return db.execute(
+            select(FoodPrice.price, FoodPrice.unit).join(Food).join(Store)
+            .where(Food.name == food_name, Store.name == store_name)
+        ).one_or_none()
+
+
+def _catalog_version(name: str) -> int:
+    from app.database import SessionLocal
+    from app.models import CatalogVersion
+
+    with SessionLocal() as db:
+        row = db.get(CatalogVersion, name)
+        return row.version if row is not None else 0
+
+
+@pytest.fixture
+def names(client):
+    """A food and a store name no other test uses."""
+    suffix = uuid.uuid4().hex[:8]
+    return f"Feed Tofu {suffix}", f"Feed Market {suffix}"
+
+
+def test_csv_feed_creates_missing_and_last_price_wins(names):
+    food, store = names
+    feed = (
+        "store,store_address,latitude,longitude,food,protein_per_100g,category,is_vegan,price,unit\n"
+        f'{store},"1 Main St, Springfield",37.79,-122.42,{food},17.3,Soy,true,2.99,per lb\n'
+        f'  {store.upper()} ,"1 Main St,  Springfield",,,{food.lower()},,,,3.49,per kg\n'
+    )
+    foods, stores = _catalog_version("foods"), _catalog_version("stores")
+    report = _import(feed, create_missing=True)
+    assert (report.read, report.upserted, report.rejected) == (2, 1, 0)
+    assert (report.created_foods, report.created_stores) == (1, 1)
+    # Names match regardless of case and spacing, and the later line wins
+    assert tuple(_price(food, store)) == (3.49, "per kg")
+    assert (_catalog_version("foods"), _catalog_version("stores")) == (foods + 1, stores + 1)
+
+    # Without create_missing nothing new is made, and known names still resolve
+    report = _import(f"store,food,price\n{store},{food},1.99\n{store},Unknown Bean,1.00\n")
+    assert (report.upserted, report.rejected, report.created_foods) == (1, 1, 0)
+    assert report.rejections == [(3, "unknown food 'Unknown Bean'")]
+    assert _price(food, store).price == 1.99
+
+
+def test_jsonl_feed_rejections(names):
+    food, store = names
+    _import(f'{{"store": "{store}", "food": "{food}", "protein_per_100g": 20, "price": 2}}\n', "jsonl", create_missing=True)
+    feed = "\n".join([
+        f'{{"store": "{store}", "food": "{food}", "price": 2.5, "unit": "per 100g"}}',
+        "not json",
+        "[1, 2]",
+        "",
+        f'{{"store": "{store}", "food": "{food}"}}',
+        f'{{"store": "{store}", "food": "{food}", "price": "cheap"}}',
+        f'{{"store": "{store}", "food": "{food}", "price": -1}}',
+        f'{{"store": "{store}", "price": 1}}',
+        f'{{"store": "Elsewhere", "food": "{food}", "price": 1, "latitude": 91}}',
+        f'{{"store": "Nowhere", "food": "New Bean", "price": 1}}',
+    ]) + "\n"
+    report = _import(feed, "jsonl", create_missing=True)
+    assert (report.read, report.upserted, report.rejected) == (9, 1, 8)
+    assert report.rejections == [
+        (2, "line is not a valid record"),
+        (3, "line is not a valid record"),
+        (5, "price must be a positive number"),
+        (6, "price is not a number"),
+        (7, "price must be a positive number"),
+        (8, "food and store are required"),
+        (9, "latitude or longitude out of range"),
+        (10, "unknown food 'New Bean'"),  # a new food needs protein_per_100g
+    ]
+    assert tuple(_price(food, store)) == (2.5, "per 100g")
+
+
+def test_catalog_bump_commits_with_each_batch(names):
+    food, store = names
+    foods = _catalog_version("foods")
+
+    def feed():
+        yield f'{{"store": "{store}", "food": "{food}", "protein_per_100g": 20, "price": 2}}\n'
+        raise OSError("connection reset")
+
+    from app.database import SessionLocal
+
+    with SessionLocal() as db, pytest.raises(OSError):
+        import_prices(db, feed(), "jsonl", batch_size=1, create_missing=True)
+    # The first batch and its new food were committed, so readers see the new version
+    assert _price(food, store).price == 2.0
+    assert _catalog_version("foods") == foods + 1
+
+
+def test_admin_import_of_a_gzipped_feed(client, names, monkeypatch):
+    from app.config import settings
+
+    food, store = names
+    monkeypatch.setattr(settings, "ADMIN_API_KEY", "admin-secret")
+    feed = gzip.compress(f"store,food,protein_per_100g,price\n{store},{food},25,4.5\n".encode())
+
+    def upload(**headers):
+        return client.post(
+            "/api/admin/import/prices", params={"create_missing": "true"}, headers=headers,
+            files={"feed": ("prices.csv.gz", feed, "application/gzip")},
+        )
+
+    assert upload().status_code == 403
+    assert upload(**{"X-Admin-Key": "wrong"}).status_code == 403
+    assert _price(food, store) is None
+
+    response = upload(**{"X-Admin-Key": "admin-secret"})
+    assert response.status_code == 200
+    report = response.json()
+    assert (report["read"], report["upserted"], report["created_foods"], report["created_stores"]) == (1, 1, 1, 1)
+    assert food in [f["name"] for f in client.get("/api/foods/", params={"search": food}).json()["items"]]
+
+    monkeypatch.setattr(settings, "ADMIN_API_KEY", "")
+    assert upload(**{"X-Admin-Key": "admin-secret"}).status_code == 404
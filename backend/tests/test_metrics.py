@@ -0,0 +1,87 @@
+import logging
+import re
+
+
+def _samples(client) -> dict:
+    """``/metrics`` as ``{'name{labels}': value}``."""
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    samples = {}
+    for line in response.text.splitlines():
+        if line and not line.startswith("#"):
+            key, _, value = line.rpartition(" ")
+            samples[key] = float(value)
+    return samples
+
+
+def test_requests_are_counted_by_route_template(client):
+    client.post("/api/foods/seed").raise_for_status()
+    food_id = client.get("/api/foods/", params={"limit": 1}).json()["items"][0]["id"]
+    route = 'method="GET",route="/api/foods/{food_id}"'
+    before = _samples(client)
+
+    assert client.get(f"/api/foods/{food_id}").status_code == 200
+    assert client.get("/api/foods/999999").status_code == 404
+    assert client.get("/api/no-such-thing").status_code == 404
+    after = _samples(client)
+
+    def delta(key):
+        return after.get(key, 0) - before.get(key, 0)
+
+    assert delta(f'vegprotein_http_requests_total{{{route},status="200"}}') == 1
+    assert delta(f'vegprotein_http_requests_total{{{route},status="404"}}') == 1
+    assert delta('vegprotein_http_requests_total{method="GET",route="unmatched",status="404"}') == 1
+    assert delta(f"vegprotein_http_request_seconds_count{{{route}}}") == 2
+    assert delta(f'vegprotein_http_request_seconds_bucket{{{route},le="+Inf"}}') == 2
+    assert after[f"vegprotein_http_request_seconds_sum{{{route}}}"] > before.get(
+        f"vegprotein_http_request_seconds_sum{{{route}}}", 0
+    )
+    assert delta(f"vegprotein_http_db_queries_count{{{route}}}") == 2
+    # Raw paths never become labels
+    assert not any(f"/api/foods/{food_id}" in key or "no-such-thing" in key for key in after)
+
+    # A 304 answered before routing still gets its route's label
+    etag = client.get("/api/foods/categories").headers["etag"]
+    key = 'vegprotein_http_requests_total{method="GET",route="/api/foods/categories",status="304"}'
+    count = _samples(client).get(key, 0)
+    assert client.get("/api/foods/categories", headers={"If-None-Match": etag}).status_code == 304
+    assert _samples(client)[key] == count + 1
+
+
+def test_server_timing_header(client, auth, monkeypatch):
+    from app.config import settings
+
+    response = client.get("/api/protein-logs/", headers=auth["headers"])
+    timing = response.headers["server-timing"]
+    assert re.fullmatch(
+        r'app;dur=\d+\.\d, db;dur=\d+\.\d;desc="\d+ quer(y|ies)", serialize;dur=\d+\.\d', timing
+    ), timing
+    assert int(re.search(r'desc="(\d+)', timing).group(1)) >= 1
+
+    monkeypatch.setattr(settings, "SERVER_TIMING", False)
+    assert "server-timing" not in client.get("/api/protein-logs/", headers=auth["headers"]).headers
+
+
+def test_slow_queries_are_logged(client, auth, monkeypatch, caplog):
+    from app.config import settings
+    from app.instrumentation import slow_queries
+
+    monkeypatch.setattr(settings, "SLOW_QUERY_MS", 0)
+    count = slow_queries.value
+    with caplog.at_level(logging.WARNING, logger="vegprotein.sql"):
+        client.get("/api/protein-logs/", headers=auth["headers"], params={"limit": 7}).raise_for_status()
+    records = [record for record in caplog.records if record.name == "vegprotein.sql"]
+    assert records
+    assert slow_queries.value == count + len(records)
+    message = records[-1].getMessage()
+    assert re.match(r"slow query: \d+\.\d ms \(/api/protein-logs/\): SELECT ", message), message
+    # Statement text only, never the bound values
+    assert "\n" not in message
+    assert all(auth["email"] not in record.getMessage() for record in records)
+
+    caplog.clear()
+    monkeypatch.setattr(settings, "SLOW_QUERY_MS", 60_000)
+    with caplog.at_level(logging.WARNING, logger="vegprotein.sql"):
+        client.get("/api/protein-logs/", headers=auth["headers"]).raise_for_status()
+    assert not [record for record in caplog.records if record.name == "vegprotein.sql"]
@@ -0,0 +1,82 @@
+import os
+import subprocess
+import sys
+
+from sqlalchemy import create_engine, text
+
+from .conftest import BACKEND_DIR
+
+
+def _alembic(database_url: str, *args: str) -> None:
+    subprocess.run(
+        [sys.executable, "-m", "alembic", *args],
+        cwd=BACKEND_DIR, env={**os.environ, "DATABASE_URL": database_url}, check=True, capture_output=True,
+    )
+
+
+def test_database_from_before_migrations_upgrades(tmp_path):
+    """A database made by the app's old create_all, upgraded like a deploy does (no stamp)."""
+    database_url = f"sqlite:///{tmp_path / 'old.db'}"
+    # 0001 is the old create_all schema; build it, then forget the revision
+    _alembic(database_url, "upgrade", "0001")
+    engine = create_engine(database_url)
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE alembic_version"))
+        conn.execute(text(
+            "INSERT INTO users (email, hashed_password, protein_goal, is_active) "
+            "VALUES ('old@example.com', 'x', 100, 1)"
+        ))
+        conn.execute(text(
+            "INSERT INTO protein_logs (user_id, food_name, protein_amount, logged_at) VALUES "
+            "(1, 'Tofu', 20, '2026-10-01 10:00:00'), (1, 'Seitan', 25, '2026-10-01 23:00:00'), "
+            "(1, 'Lentils', 9, '2026-10-02 08:00:00')"
+        ))
+
+    _alembic(database_url, "upgrade", "head")
+    _alembic(database_url, "check")
+
+    with engine.connect() as conn:
+        totals = conn.execute(text("SELECT day, total, count FROM daily_protein_totals ORDER BY day")).all()
+    engine.dispose()
+    assert [tuple(row) for row in totals] == [("2026-10-01", 45.0, 2), ("2026-10-02", 9.0, 1)]
+
+
+def test_legacy_log_timestamps_page_and_bucket(tmp_path):
+    """Logs stamped by SQLite's CURRENT_TIMESTAMP (no microseconds) before the upgrade."""
+    from datetime import date, datetime
+
+    from app.models import ProteinLog
+    from app.pagination import decode_cursor, encode_cursor
+    from app.summaries import logs_before, logs_between, user_logs
+
+    database_url = f"sqlite:///{tmp_path / 'legacy.db'}"
+    _alembic(database_url, "upgrade", "0002")
+    engine = create_engine(database_url)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO users (email, hashed_password, is_active) VALUES ('old@example.com', 'x', 1)"))
+        conn.execute(text(
+            "INSERT INTO protein_logs (user_id, food_name, protein_amount, logged_at) VALUES "
+            "(1, 'Tofu', 20, '2026-10-01 00:00:00'), (1, 'Seitan', 25, '2026-10-01 12:00:00'), "
+            "(1, 'Lentils', 9, '2026-10-01 12:00:00')"
+        ))
+    _alembic(database_url, "upgrade", "head")
+
+    # Page one row at a time, round-tripping the cursor like GET /protein-logs
+    query = user_logs(1).with_only_columns(ProteinLog.id, ProteinLog.logged_at)
+    seen, cursor = [], None
+    with engine.connect() as conn:
+        for _ in range(5):
+            page = query
+            if cursor:
+                page = logs_before(page, *decode_cursor(cursor, datetime.fromisoformat, int))
+            rows = conn.execute(page.limit(2)).all()
+            seen.append(rows[0].id)
+            if len(rows) < 2:
+                break
+            cursor = encode_cursor(rows[0].logged_at, rows[0].id)
+        midnight_day = conn.execute(
+            logs_between(1, date(2026, 10, 1), date(2026, 10, 1), "UTC").with_only_columns(ProteinLog.id)
+        ).scalars().all()
+    engine.dispose()
+    assert seen == [3, 2, 1]
+    assert midnight_day == [3, 2, 1]
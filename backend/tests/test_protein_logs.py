@@ -0,0 +1,102 @@
+from datetime import datetime, timezone
+
+
+def _utc(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed.replace(tzinfo=timezone.utc) if parsed.tzinfo is None else parsed.astimezone(timezone.utc)
+
+
+def test_batch_converts_offset_timestamps_to_utc(client, auth):
+    response = client.post("/api/protein-logs/batch", headers=auth["headers"], json={"entries": [
+        {"food_name": "Tempeh", "protein_amount": 19.0, "logged_at": "2026-01-17T23:30:00-07:00"},
+    ]})
+    assert response.status_code == 201
+    assert _utc(response.json()["created"][0]["logged_at"]) == datetime(2026, 1, 18, 6, 30, tzinfo=timezone.utc)
+
+    logs = client.get("/api/protein-logs/", headers=auth["headers"]).json()["items"]
+    assert _utc(logs[0]["logged_at"]) == datetime(2026, 1, 18, 6, 30, tzinfo=timezone.utc)
+
+    # The rollup day is the UTC day, not the day of the wall time sent
+    days = client.get(
+        "/api/protein-logs/range", headers=auth["headers"], params={"start": "2026-01-17", "end": "2026-01-18"}
+    ).json()["buckets"]
+    assert [(day["start"], day["protein"]) for day in days] == [("2026-01-17", 0.0), ("2026-01-18", 19.0)]
+
+
+def _rollup(client, auth) -> dict:
+    from sqlalchemy import select
+
+    from app.database import engine
+    from app.models import DailyProteinTotal
+
+    user_id = client.get("/api/users/me", headers=auth["headers"]).json()["id"]
+    with engine.connect() as conn:
+        rows = conn.execute(
+            select(DailyProteinTotal.day, DailyProteinTotal.total, DailyProteinTotal.count)
+            .where(DailyProteinTotal.user_id == user_id)
+        ).all()
+    return {str(day): (round(total, 1), count) for day, total, count in rows}
+
+
+def test_rollup_follows_create_batch_and_delete(client, auth):
+    headers = auth["headers"]
+    created = client.post("/api/protein-logs/", headers=headers, json={"food_name": "Tofu", "protein_amount": 20.0})
+    today = created.json()["logged_at"][:10]
+    assert _rollup(client, auth) == {today: (20.0, 1)}
+
+    batch = client.post("/api/protein-logs/batch", headers=headers, json={"entries": [
+        {"food_name": "Lentils", "protein_amount": 9.0, "logged_at": "2026-01-05T12:00:00Z"},
+        {"food_name": "Seitan", "protein_amount": 25.0, "logged_at": "2026-01-05T18:00:00Z"},
+        {"food_name": "Edamame", "protein_amount": 11.0, "logged_at": "2026-01-06T08:00:00Z"},
+    ]}).json()
+    assert _rollup(client, auth) == {today: (20.0, 1), "2026-01-05": (34.0, 2), "2026-01-06": (11.0, 1)}
+
+    client.delete(f"/api/protein-logs/{batch['created'][0]['id']}", headers=headers).raise_for_status()
+    client.delete(f"/api/protein-logs/{batch['created'][2]['id']}", headers=headers).raise_for_status()
+    # A day whose last log is deleted loses its row
+    assert _rollup(client, auth) == {today: (20.0, 1), "2026-01-05": (25.0, 1)}
+
+    stats = client.get("/api/users/me/stats", headers=headers).json()
+    assert stats["total_logs"] == 2
+
+
+def test_cursor_pages_cover_every_log_once(client, auth):
+    headers = auth["headers"]
+    client.post("/api/protein-logs/batch", headers=headers, json={"entries": [
+        # Pairs share a timestamp, so the id breaks the tie
+        {"food_name": f"Food {i}", "protein_amount": 5.0, "logged_at": f"2026-02-{1 + i // 2:02d}T12:00:00Z"}
+        for i in range(23)
+    ]}).raise_for_status()
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 10, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/api/protein-logs/", headers=headers, params=params).json()
+        seen.extend((log["logged_at"], log["id"]) for log in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert len(seen) == 23
+    assert len(set(seen)) == 23
+    assert seen == sorted(seen, reverse=True)
+
+
+def test_batch_client_keys_are_idempotent(client, auth):
+    headers = auth["headers"]
+    entries = [
+        {"food_name": "Tofu", "protein_amount": 20.0, "client_key": "k1"},
+        {"food_name": "Tofu", "protein_amount": 20.0, "client_key": "k1"},
+        {"food_name": "Tempeh", "protein_amount": 19.0, "client_key": "k2"},
+    ]
+    first = client.post("/api/protein-logs/batch", headers=headers, json={"entries": entries}).json()
+    assert sorted(log["client_key"] for log in first["created"]) == ["k1", "k2"]
+    assert first["existing"] == []
+
+    retry = client.post("/api/protein-logs/batch", headers=headers, json={"entries": entries}).json()
+    assert retry["created"] == []
+    assert sorted((log["client_key"], log["id"]) for log in retry["existing"]) == sorted(
+        (log["client_key"], log["id"]) for log in first["created"]
+    )
+    assert len(client.get("/api/protein-logs/", headers=headers).json()["items"]) == 2
+    assert client.get("/api/users/me/stats", headers=headers).json()["total_logs"] == 2
@@ -0,0 +1,36 @@
+"""The protein log range queries use the (user_id, logged_at) index.
+
+Same statements and check as ``benchmarks.explain_protein_logs``.
+"""
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from benchmarks.explain_protein_logs import INDEX_NAME, Explain
+
+
+def _statements():
+    from app.summaries import logs_before, logs_between, user_logs
+
+    day = date(2026, 3, 10)
+    return {
+        "history listing": user_logs(1).limit(50),
+        "history cursor page": logs_before(user_logs(1), datetime(2026, 3, 5), 100).limit(50),
+        "day (UTC)": logs_between(1, day, day, "UTC"),
+        "day (America/Los_Angeles)": logs_between(1, day, day, "America/Los_Angeles"),
+        "week (Asia/Kolkata)": logs_between(1, day - timedelta(days=6), day, "Asia/Kolkata"),
+    }
+
+
+@pytest.mark.parametrize("label", list(_statements()))
+def test_log_queries_use_the_composite_index(client, auth, label):
+    from app.database import engine
+
+    client.post("/api/protein-logs/batch", headers=auth["headers"], json={"entries": [
+        {"food_name": "Tofu", "protein_amount": 20.0, "logged_at": f"2026-03-{1 + i % 28:02d}T12:00:00Z"}
+        for i in range(50)
+    ]}).raise_for_status()
+    with engine.connect() as conn:
+        conn.exec_driver_sql("ANALYZE")
+        plan = " ".join(str(col) for row in conn.execute(Explain(_statements()[label], "EXPLAIN QUERY PLAN")) for col in row)
+    assert INDEX_NAME in plan
@@ -0,0 +1,134 @@
+import asyncio
+import threading
+
+from app.ratelimit import RateLimiter, SQLiteBuckets, parse_rate, parse_route_budgets
+
+
+class RecordingBuckets(SQLiteBuckets):
+    def __init__(self, path: str):
+        super().__init__(path)
+        self.threads = set()
+
+    def take(self, key, rate, now):
+        self.threads.add(threading.current_thread().name)
+        return super().take(key, rate, now)
+
+
+def test_shared_buckets_limit_off_the_event_loop(tmp_path):
+    buckets = RecordingBuckets(str(tmp_path / "buckets.db"))
+    limiter = RateLimiter(
+        buckets, per_ip=parse_rate("100/minute"), per_user=None,
+        routes=parse_route_budgets("POST /api/auth/login=2/minute"),
+    )
+    scope = {"type": "http", "method": "POST", "path": "/api/auth/login", "headers": [], "client": ("10.0.0.1", 1)}
+
+    async def checks():
+        return [await limiter.check(scope) for _ in range(3)]
+
+    try:
+        first, second, third = asyncio.run(checks())
+    finally:
+        buckets.close()
+    assert first is None and second is None
+    assert third[0] == "POST /api/auth/login" and third[1] > 0
+    assert threading.current_thread().name not in buckets.threads
+
+
+def _limited_app(limiter, monitor):
+    from starlette.applications import Starlette
+    from starlette.responses import PlainTextResponse
+    from starlette.routing import Route
+
+    from app.ratelimit import RateLimitMiddleware
+
+    async def ok(request):
+        return PlainTextResponse(str(monitor.in_flight))
+
+    app = Starlette(routes=[Route("/api/ping", ok), Route("/health", ok)])
+    return RateLimitMiddleware(app, limiter=limiter, monitor=monitor)
+
+
+def test_empty_bucket_gets_429_with_retry_after(monkeypatch):
+    from starlette.testclient import TestClient
+
+    from app.config import settings
+    from app.ratelimit import LoadMonitor, MemoryBuckets, rate_limited
+
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+    limiter = RateLimiter(MemoryBuckets(), per_ip=parse_rate("2/minute"), per_user=None, routes=[])
+    client = TestClient(_limited_app(limiter, LoadMonitor()))
+    before = rate_limited.labels("ip").value
+
+    assert [client.get("/api/ping").status_code for _ in range(2)] == [200, 200]
+    response = client.get("/api/ping")
+    assert response.status_code == 429
+    # The bucket refills one token every 30 seconds
+    assert 1 <= int(response.headers["retry-after"]) <= 30
+    assert rate_limited.labels("ip").value == before + 1
+    assert client.get("/health").status_code == 200
+
+
+def test_proxy_headers_give_each_client_its_own_bucket(monkeypatch):
+    from starlette.testclient import TestClient
+    from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
+
+    from app.config import settings
+    from app.ratelimit import LoadMonitor, MemoryBuckets
+
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+    limiter = RateLimiter(MemoryBuckets(), per_ip=parse_rate("1/minute"), per_user=None, routes=[])
+    # What --proxy-headers --forwarded-allow-ips='*' installs in front of the app
+    client = TestClient(ProxyHeadersMiddleware(_limited_app(limiter, LoadMonitor()), trusted_hosts="*"))
+
+    def ping(ip):
+        return client.get("/api/ping", headers={"X-Forwarded-For": ip}).status_code
+
+    assert [ping("203.0.113.1"), ping("203.0.113.2"), ping("203.0.113.1")] == [200, 200, 429]
+
+
+def test_login_budget_through_the_app(client, monkeypatch):
+    from app.config import settings
+    from app.ratelimit import MemoryBuckets, rate_limiter
+
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(rate_limiter, "buckets", MemoryBuckets())
+    monkeypatch.setattr(rate_limiter, "routes", parse_route_budgets("POST /api/auth/login=2/minute"))
+
+    def login():
+        return client.post("/api/auth/login", json={"email": "nobody@example.com", "password": "wrong-password"})
+
+    assert [login().status_code for _ in range(2)] == [401, 401]
+    response = login()
+    assert response.status_code == 429
+    assert response.json() == {"detail": "Too many requests, please retry later"}
+    assert int(response.headers["retry-after"]) >= 1
+    assert client.get("/api/foods/categories").status_code == 200
+
+
+def test_load_shedding(client, monkeypatch):
+    from starlette.testclient import TestClient
+
+    from app.config import settings
+    from app.ratelimit import LoadMonitor, MemoryBuckets, load_monitor, load_shed
+
+    monkeypatch.setattr(settings, "SHED_MAX_IN_FLIGHT", 2)
+    # A request counts itself while it is handled
+    monitor = LoadMonitor()
+    limiter = RateLimiter(MemoryBuckets(), per_ip=None, per_user=None, routes=[])
+    assert TestClient(_limited_app(limiter, monitor)).get("/api/ping").text == "1"
+    assert monitor.in_flight == 0
+
+    # At the limit, new requests are turned away before routing; /health still answers
+    before = load_shed.labels("in_flight").value
+    monkeypatch.setattr(load_monitor, "in_flight", 2)
+    response = client.get("/api/foods/categories")
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    assert load_shed.labels("in_flight").value == before + 1
+    assert client.get("/health").status_code == 200
+
+    monkeypatch.setattr(settings, "SHED_LOOP_LAG_MS", 500)
+    monitor.lag = 0.6
+    assert monitor.overloaded() == "loop_lag"
+    monitor.lag = 0.1
+    assert monitor.overloaded() is None
@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple, Optional
+
+import orjson
+
+
+class LogRow(NamedTuple):
+    id: int
+    food_name: str
+    protein_amount: float
+    logged_at: datetime
+    client_key: Optional[str]
+
+
+def test_timestamps_and_floats_render_like_pydantic():
+    from app.responses import APIJSONResponse
+
+    body = APIJSONResponse({
+        "naive": datetime(2026, 3, 1, 8, 0),  # SQLite's stored UTC
+        "utc": datetime(2026, 3, 1, 8, 0, 0, 250000, tzinfo=timezone.utc),
+        "offset": datetime(2026, 3, 1, 10, 0, tzinfo=timezone(timedelta(hours=2))),
+        "floats": [20.0, 17.3, 0.1, 1e-7],
+        1: "int keys",
+    }).body
+    assert body == (
+        b'{"naive":"2026-03-01T08:00:00Z","utc":"2026-03-01T08:00:00.250000Z",'
+        b'"offset":"2026-03-01T10:00:00+02:00","floats":[20.0,17.3,0.1,1e-7],"1":"int keys"}'
+    )
+
+
+def test_rows_page_shape():
+    from app.pagination import decode_cursor
+    from app.responses import rows_page
+
+    rows = [LogRow(3, "Tofu", 20.0, datetime(2026, 3, 2, 9, 30), None), LogRow(2, "Seitan", 25.5, datetime(2026, 3, 1), "k")]
+    page = orjson.loads(rows_page(rows, 1, key=lambda row: (row.logged_at, row.id)).body)
+    assert page["items"] == [
+        {"id": 3, "food_name": "Tofu", "protein_amount": 20.0, "logged_at": "2026-03-02T09:30:00Z", "client_key": None}
+    ]
+    assert decode_cursor(page["next_cursor"], datetime.fromisoformat, int) == (datetime(2026, 3, 2, 9, 30), 3)
+
+    # The last page (no extra row) and an empty one still carry next_cursor
+    assert orjson.loads(rows_page(rows, 2, key=lambda row: (row.id,)).body)["next_cursor"] is None
+    assert orjson.loads(rows_page([], 2, key=lambda row: (row.id,)).body) == {"items": [], "next_cursor": None}
+
+
+def test_log_list_keeps_the_response_model_shape(client, auth):
+    from app.schemas import Page, ProteinLogOut
+
+    headers = auth["headers"]
+    client.post("/api/protein-logs/batch", headers=headers, json={"entries": [
+        {"food_name": "Tofu", "protein_amount": 20, "logged_at": "2026-03-01T10:00:00+02:00", "client_key": "t"},
+        {"food_name": "Lentils", "protein_amount": 9.1, "logged_at": "2026-03-02T12:30:15.5Z"},
+        {"food_name": "Seitan", "protein_amount": 25.0, "logged_at": "2026-03-03T00:00:00Z"},
+    ]}).raise_for_status()
+
+    pages, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/api/protein-logs/", headers=headers, params=params)
+        body = response.json()
+        # Exactly what FastAPI would have produced through the response model
+        assert body == Page[ProteinLogOut].model_validate(body).model_dump(mode="json")
+        pages.append(response.content)
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert len(pages) == 2
+    assert pages[1].endswith(b'"next_cursor":null}')
+
+    items = [item for page in pages for item in orjson.loads(page)["items"]]
+    assert [(item["food_name"], item["logged_at"]) for item in items] == [
+        ("Seitan", "2026-03-03T00:00:00Z"), ("Lentils", "2026-03-02T12:30:15.500000Z"), ("Tofu", "2026-03-01T08:00:00Z"),
+    ]
+    assert b'"protein_amount":20.0' in pages[1] and b'"protein_amount":9.1' in pages[0]
+    assert items[-1]["client_key"] == "t" and items[0]["client_key"] is None
+
+
+def test_catalog_lists_keep_the_response_model_shape(client):
+    from app.schemas import FoodOut, Page
+
+    client.post("/api/foods/seed").raise_for_status()
+    first = client.get("/api/foods/", params={"limit": 3}).json()
+    assert first == Page[FoodOut].model_validate(first).model_dump(mode="json")
+    assert all(isinstance(food["protein_per_100g"], float) for food in first["items"])
+    second = client.get("/api/foods/", params={"limit": 3, "cursor": first["next_cursor"]}).json()
+    assert {food["id"] for food in first["items"]}.isdisjoint(food["id"] for food in second["items"])
+
+    top = client.get("/api/foods/top-protein", params={"limit": 3}).json()
+    assert top == [FoodOut.model_validate(food).model_dump(mode="json") for food in top]
+
+
+def test_model_responses_send_utc_timestamps(client, auth):
+    headers = auth["headers"]
+    assert client.get("/api/users/me", headers=headers).json()["created_at"].endswith("Z")
+    created = client.post("/api/protein-logs/", headers=headers, json={"food_name": "Tofu", "protein_amount": 20.0})
+    assert created.json()["logged_at"].endswith("Z")
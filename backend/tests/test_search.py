@@ -0,0 +1,111 @@
+import uuid
+
+import pytest
+
+from app.search import FoodSearchIndex, normalize
+
+# (id, name, protein_per_100g, category, is_vegan)
+ROWS = [
+    (1, "Tofu", 8.0, "Soy", True),
+    (2, "Tofu, Firm", 17.0, "Soy", True),
+    (3, "Silken Tofu", 5.0, "Soy", True),
+    (4, "Smoked Tofu Slices", 20.0, "Soy", True),
+    (5, "Tempeh", 19.0, "Soy", True),
+    (6, "Tofurky Roast", 20.0, "Mock Meat", True),
+    (7, "Crème Fraîche", 2.0, "Dairy", False),
+    (8, "Baked tofu", 15.0, "Soy", True),
+    (9, "Tofu B", 9.0, "Soy", True),
+    (10, "Tofu A", 5.0, "Soy", True),
+]
+
+
+@pytest.fixture(scope="module")
+def index():
+    return FoodSearchIndex(ROWS)
+
+
+def test_normalize():
+    assert normalize("  Crème  Fraîche!") == "creme fraiche"
+    assert normalize("Tofu, Firm (14oz)") == "tofu firm 14oz"
+
+
+def test_prefix_matches_rank_first(index):
+    # Names starting with the query, shortest first and higher protein among
+    # equal lengths; then names with a word starting with it, by the same order
+    assert index.search("tof", 20) == [1, 9, 10, 2, 6, 8, 3, 4]
+    assert index.search("TOFU", 20) == index.search("tof", 20)
+    assert index.search("tofu f", 20) == [2]
+    assert index.search("tempeh", 20) == [5]
+    assert index.search("seitan", 20) == []
+    assert index.search("  ", 20) == []
+
+
+def test_multi_word_queries(index):
+    # Every word must start a word of the name, in any order
+    assert index.search("tofu sl", 20) == [4]
+    assert index.search("firm tofu", 20) == [2]
+    assert index.search("sil tof", 20) == [3]
+    assert index.search("tofu roast", 20) == [6]
+    assert index.search("tofu tempeh", 20) == []
+    assert index.search("crème", 20) == index.search("creme fraiche", 20) == [7]
+
+
+def test_filters(index):
+    assert index.search("tof", 20, category="Mock Meat") == [6]
+    assert index.search("fraiche", 20, vegan_only=True) == []
+
+
+@pytest.mark.parametrize("query", ["tof", "tofu", "tofu s", "t"])
+def test_pages_cover_every_match_once(index, query):
+    everything = index.search(query, 100)
+    paged = []
+    for offset in range(0, len(everything) + 2, 3):
+        paged.extend(index.search(query, 3, offset=offset))
+    assert paged == everything
+
+
+@pytest.fixture(scope="module")
+def named(client):
+    """A word no other food has, and the ids of the foods named with it in rank order."""
+    from app.catalog import bump_catalog_version_sync, food_catalog
+    from app.database import SessionLocal
+    from app.models import Food
+
+    word = f"qz{uuid.uuid4().hex[:8]}"
+    names = [
+        (f"{word}", 10.0), (f"{word} Bites", 30.0), (f"{word} Balls", 12.0), (f"{word} Strips Smoky", 25.0),
+        (f"Baked {word}", 40.0), (f"Spicy {word} Crumble", 18.0), (f"Sweet {word} Crumble", 19.0),
+    ]
+    with SessionLocal() as db:
+        foods = [Food(name=name, protein_per_100g=protein, category="Search", is_vegan=True) for name, protein in names]
+        db.add_all(foods)
+        bump_catalog_version_sync(db, "foods")
+        db.commit()
+        ids = [food.id for food in foods]
+    food_catalog.expire()
+    # Starting with the word: shortest first, then protein; then the rest the same way
+    return word, [ids[0], ids[1], ids[2], ids[3], ids[4], ids[6], ids[5]]
+
+
+def test_api_search_ranking_and_paging(client, named):
+    word, ranked = named
+    response = client.get("/api/foods/", params={"search": word, "limit": 100})
+    assert response.status_code == 200
+    assert [food["id"] for food in response.json()["items"]] == ranked
+    assert response.json()["next_cursor"] is None
+
+    seen, cursor = [], None
+    while True:
+        params = {"search": word.upper(), "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        page = client.get("/api/foods/", params=params).json()
+        assert len(page["items"]) <= 2
+        seen.extend(food["id"] for food in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == ranked
+
+    crumbles = client.get("/api/foods/", params={"search": f"crum {word[:6]}"}).json()["items"]
+    assert [food["id"] for food in crumbles] == ranked[-2:]
@@ -0,0 +1,165 @@
+import math
+import random
+
+import pytest
+
+# A grid of stores far from the seed data, so these tests see only their own
+CLUSTER = (10.0, 10.0)
+
+
+def _brute_force(points, latitude, longitude, max_miles=None):
+    from app.geo import haversine_miles
+
+    distances = sorted(
+        (haversine_miles(latitude, longitude, lat, lon), store_id) for store_id, lat, lon in points
+    )
+    return [(store_id, miles) for miles, store_id in distances if max_miles is None or miles <= max_miles]
+
+
+@pytest.mark.parametrize("latitude, longitude", [(37.77, -122.42), (89.9, 0.0), (0.0, 179.99), (-45.0, -179.9)])
+def test_kd_tree_matches_brute_force_haversine(latitude, longitude):
+    from app.geo import StoreIndex
+
+    rng = random.Random(7)
+    points = [(i, rng.uniform(-90, 90), rng.uniform(-180, 180)) for i in range(2000)]
+    # Dense around the query point too, across the pole and antimeridian
+    for i in range(500):
+        lat = latitude + rng.uniform(-1, 1)
+        if abs(lat) > 90:
+            lat = math.copysign(180, lat) - lat
+        points.append((2000 + i, lat, (longitude + rng.uniform(-2, 2) + 180) % 360 - 180))
+    points.append((9999, None, None))
+    index = StoreIndex(1, points)
+    assert len(index) == 2500
+
+    expected = _brute_force(points[:-1], latitude, longitude)
+    for k in (1, 10, 100):
+        found = index.nearest(latitude, longitude, k)
+        assert [store_id for store_id, _ in found] == [store_id for store_id, _ in expected[:k]]
+        assert [round(miles, 6) for _, miles in found] == [round(miles, 6) for _, miles in expected[:k]]
+
+    within = _brute_force(points[:-1], latitude, longitude, max_miles=50)
+    assert [store_id for store_id, _ in index.nearest(latitude, longitude, None, 50)] == [s for s, _ in within]
+    assert index.nearest(latitude, longitude, 3, 50) == index.nearest(latitude, longitude, None, 50)[:3]
+
+
+def test_empty_kd_tree():
+    from app.geo import StoreIndex
+
+    assert StoreIndex(1, []).nearest(0.0, 0.0, 5) == []
+    assert StoreIndex(1, [(1, None, 3.0)]).nearest(0.0, 0.0, None, 10) == []
+
+
+@pytest.fixture(scope="module")
+def cluster(client):
+    """150 stores on a 0.01 degree grid around ``CLUSTER``; their ids, nearest first."""
+    from app.catalog import bump_catalog_version_sync, store_index
+    from app.database import SessionLocal
+    from app.models import Store
+
+    with SessionLocal() as db:
+        stores = [
+            Store(name=f"Grid {row}-{col}", latitude=CLUSTER[0] + row * 0.01, longitude=CLUSTER[1] + col * 0.01)
+            for row in range(10) for col in range(15)
+        ]
+        db.add_all(stores)
+        bump_catalog_version_sync(db, "stores")
+        db.commit()
+        points = [(store.id, store.latitude, store.longitude) for store in stores]
+    store_index.expire()
+    return [store_id for store_id, _ in _brute_force(points, *CLUSTER)]
+
+
+def _nearby(client, **params):
+    response = client.get(
+        "/api/stores/nearby", params={"latitude": CLUSTER[0], "longitude": CLUSTER[1], **params}
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_nearby_radius_returns_every_store_inside(client, cluster):
+    stores = _nearby(client, radius_miles=100)
+    assert len(stores) == 150
+    assert [store["id"] for store in stores] == cluster
+    assert stores[0]["distance_miles"] == 0.0
+    assert [store["distance_miles"] for store in stores] == sorted(store["distance_miles"] for store in stores)
+
+    # Only the grid's first row and column lie within about 0.7 miles
+    assert all(store["distance_miles"] <= 0.7 for store in _nearby(client, radius_miles=0.7))
+
+
+def test_nearby_limit_is_k_nearest(client, cluster):
+    assert [store["id"] for store in _nearby(client, limit=7)] == cluster[:7]
+    assert [store["id"] for store in _nearby(client, limit=100, radius_miles=0.7)] == [
+        store["id"] for store in _nearby(client, radius_miles=0.7)
+    ]
+    assert client.get("/api/stores/nearby", params={"latitude": 0, "longitude": 0, "limit": 101}).status_code == 422
+
+
+def _add_prices(food_name: str, protein_per_100g: float, prices) -> int:
+    """A new food priced at ``(store_id, price, unit)``; its id."""
+    from app.database import SessionLocal
+    from app.models import Food, FoodPrice
+
+    with SessionLocal() as db:
+        food = Food(name=food_name, protein_per_100g=protein_per_100g, category="Test", is_vegan=True)
+        db.add(food)
+        db.flush()
+        db.add_all(FoodPrice(food_id=food.id, store_id=store_id, price=price, unit=unit) for store_id, price, unit in prices)
+        db.commit()
+        return food.id
+
+
+def test_store_prices_normalize_units(client, cluster):
+    store_id = cluster[1]
+    # One food per price (a food has one price per store), all 10 g of protein per 100 g
+    for name, price, unit in [
+        ("lb", 2.0, "per lb"), ("kg", 5.0, " Per KG "), ("100g", 1.0, "per 100g"),
+        ("oz", 0.5, "per oz"), ("none", 2.0, None), ("bunch", 3.0, "per bunch"),
+    ]:
+        _add_prices(f"Unit Tofu {name}", 10.0, [(store_id, price, unit)])
+    prices = client.get(f"/api/stores/{store_id}/prices").json()
+    ranked = [(price["food_name"], price["unit"], price["protein_per_dollar"]) for price in prices]
+    assert [(food, unit, ppd and round(ppd, 2)) for food, unit, ppd in ranked] == [
+        ("Unit Tofu lb", "per lb", 22.68),      # 10 g per 100 g * 453.592 g / $2
+        ("Unit Tofu none", "per lb", 22.68),    # a missing unit means per lb
+        ("Unit Tofu kg", " Per KG ", 20.0),
+        ("Unit Tofu 100g", "per 100g", 10.0),
+        ("Unit Tofu oz", "per oz", 5.67),
+        ("Unit Tofu bunch", "per bunch", None),  # unknown units sort last
+    ]
+
+
+def test_cheapest_protein_covers_every_store_in_the_radius(client, cluster):
+    # The best deal is at the farthest of the 150 stores, well past the 100th
+    food_id = _add_prices("Radius Seitan", 75.0, [
+        (cluster[0], 9.0, "per lb"), (cluster[50], 6.0, "per lb"), (cluster[-1], 3.0, "per lb"),
+        (cluster[-2], 1.0, "per bunch"),
+    ])
+    params = {"latitude": CLUSTER[0], "longitude": CLUSTER[1], "radius_miles": 100, "limit": 100}
+    ranked = [
+        price for price in client.get("/api/stores/cheapest-protein", params=params).json()
+        if price["food_id"] == food_id
+    ]
+    assert [price["store_id"] for price in ranked] == [cluster[-1], cluster[50], cluster[0]]
+    assert ranked[0]["distance_miles"] > ranked[1]["distance_miles"] > ranked[2]["distance_miles"] == 0.0
+    assert ranked[0]["protein_per_dollar"] == pytest.approx(75.0 * 453.592 / 300)
+
+    # A radius that excludes the far stores
+    params["radius_miles"] = 0.1
+    assert {price["store_id"] for price in client.get("/api/stores/cheapest-protein", params=params).json()} == {
+        cluster[0]
+    }
+
+
+def test_radius_includes_stores_on_the_boundary():
+    from app.geo import StoreIndex, haversine_miles
+
+    index = StoreIndex(1, [(1, 1.0, 0.0), (2, 0.0, 2.0), (3, 0.5, 0.5)])
+    radius = haversine_miles(0.0, 0.0, 1.0, 0.0)
+    assert [store_id for store_id, _ in index.nearest(0.0, 0.0, None, radius)] == [3, 1]
+    assert [store_id for store_id, _ in index.nearest(0.0, 0.0, 1, radius)] == [3]
+    assert [store_id for store_id, _ in index.nearest(0.0, 0.0, None, radius * 0.999)] == [3]
+    # A zero radius still finds a store at the query point
+    assert index.nearest(0.5, 0.5, None, 0.0) == [(3, 0.0)]
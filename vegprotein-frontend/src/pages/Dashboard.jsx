@@ -3,6 +3,7 @@ import { useNavigate, Link } from "react-router-dom";
 import { motion, AnimatePresence } from "framer-motion";
 import { MapPin, LogOut, Plus, X, Check, Minus } from "lucide-react";
 import { FuturisticNav } from "../components/ui/futuristic-nav";
+import { logout as endSession } from "../utils/api";
 
 export default function Dashboard() {
   const [goal, setGoal] = useState(120);
@@ -32,7 +33,7 @@ export default function Dashboard() {
   const remaining = Math.max(goal - consumed, 0);
 
   function logout() {
-    localStorage.removeItem("token");
+    endSession();
     nav("/login");
   }
 
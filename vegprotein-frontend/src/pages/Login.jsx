@@ -1,7 +1,7 @@
 import React, { useState } from "react";
 import { useNavigate } from "react-router-dom";
 import { SignUp } from "../components/ui/sign-up";
-import { register, login, setAuth } from "../utils/api";
+import { register, login, saveTokens } from "../utils/api";
 
 export default function Login() {
   const navigate = useNavigate();
@@ -19,16 +19,14 @@ export default function Login() {
       if (isLogin) {
         // Login flow
         const data = await login(email, password);
-        localStorage.setItem("token", data.access_token);
-        setAuth(data.access_token);
+        saveTokens(data);
         return { success: true };
       } else {
         // Register flow
         await register(email, password);
         // After registration, login to get the token
         const data = await login(email, password);
-        localStorage.setItem("token", data.access_token);
-        setAuth(data.access_token);
+        saveTokens(data);
         return { success: true };
       }
     } catch (error) {
@@ -7,6 +7,7 @@ import {
   Moon, Smartphone, HelpCircle, MessageSquare
 } from "lucide-react";
 import { FuturisticNav } from "../components/ui/futuristic-nav";
+import { logout as endSession } from "../utils/api";
 
 export default function Profile() {
   const nav = useNavigate();
@@ -55,7 +56,7 @@ export default function Profile() {
   ];
 
   function logout() {
-    localStorage.removeItem("token");
+    endSession();
     nav("/login");
   }
 
@@ -12,6 +12,43 @@ export function clearAuth() {
   delete API.defaults.headers.common['Authorization'];
 }
 
+// Keep the session's tokens; the refresh token is single-use and rotates
+export function saveTokens(data) {
+  localStorage.setItem('token', data.access_token);
+  localStorage.setItem('refreshToken', data.refresh_token);
+  setAuth(data.access_token);
+}
+
+export function clearTokens() {
+  localStorage.removeItem('token');
+  localStorage.removeItem('refreshToken');
+  clearAuth();
+}
+
+// Concurrent 401s share one refresh: the first exchange uses up the token
+let refreshing = null;
+
+API.interceptors.response.use(undefined, async (error) => {
+  const original = error.config;
+  const refreshToken = localStorage.getItem('refreshToken');
+  if (error.response?.status !== 401 || !refreshToken || original._retried || original.url.startsWith('/api/auth/')) {
+    throw error;
+  }
+  original._retried = true;
+  refreshing = refreshing || API.post('/api/auth/refresh', { refresh_token: refreshToken })
+    .then((response) => saveTokens(response.data))
+    .catch((refreshError) => {
+      clearTokens();
+      throw refreshError;
+    })
+    .finally(() => {
+      refreshing = null;
+    });
+  await refreshing;
+  original.headers['Authorization'] = API.defaults.headers.common['Authorization'];
+  return API(original);
+});
+
 // Auth endpoints
 export async function register(email, password, fullName = null) {
   const response = await API.post('/api/auth/register', {
@@ -30,10 +67,24 @@ export async function login(email, password) {
   return response.data;
 }
 
+export async function logout() {
+  const refreshToken = localStorage.getItem('refreshToken');
+  clearTokens();
+  if (refreshToken) {
+    await API.post('/api/auth/logout', { refresh_token: refreshToken }).catch(() => {});
+  }
+}
+
 export async function getCurrentUser() {
   const response = await API.get('/api/auth/me');
   return response.data;
 }
 
+// Profile, today, weekly and stats in one round trip
+export async function getDashboard() {
+  const response = await API.get('/api/dashboard');
+  return response.data;
+}
+
 export default API;
 